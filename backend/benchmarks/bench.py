@@ -0,0 +1,398 @@
+# benchmarks/bench.py
+"""
+Бенчмарки горячих путей backend.
+
+Каждая стадия измеряется отдельно: пропускная способность (операций/сек)
+и задержка одной операции (p50/p95, мс). Входные видео генерируются
+локально (benchmarks/synthetic.py). Стадии, которым нужен MediaPipe,
+пропускаются, если он не установлен.
+
+Результаты сравниваются с JSON-базой для этой машины
+(benchmarks/baselines/<hostname>.json); --check завершает процесс с кодом 1,
+если стадия стала медленнее базы больше чем на threshold, или если базы нет
+(база пишется только явно, --update-baseline).
+
+    python -m backend.benchmarks.bench                   # измерить и показать
+    python -m backend.benchmarks.bench --check           # сравнить с базой (так делает run_tests.py --bench)
+    python -m backend.benchmarks.bench --update-baseline # записать новую базу
+"""
+import argparse
+import importlib.util
+import json
+import os
+import platform
+import shutil
+import socket
+import sys
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+
+import cv2
+import numpy as np
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from backend.benchmarks.synthetic import make_video  # noqa: E402
+from backend.core.frame_encoder import FrameEncoder  # noqa: E402
+from backend.core.geometry import DEFAULT_ANGLE_TABLE, calculate_angles_batch  # noqa: E402
+from backend.core.pattern_index import PatternTimeline  # noqa: E402
+from backend.core.scoring import StreamingScorer  # noqa: E402
+from backend.core.timeline_index import TimelineIndex  # noqa: E402
+
+BASELINE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baselines")
+DEFAULT_THRESHOLD = 0.2
+# Стадии быстрее этого (мс на операцию) шумят сильнее: для них порог не меньше NOISY_THRESHOLD,
+# этого хватает, чтобы поймать алгоритмическую регрессию, но не дрожание планировщика
+NOISY_LATENCY_MS = 1.0
+NOISY_THRESHOLD = 0.5
+# Каждая стадия прогоняется несколько раз, в зачет идет лучший прогон
+DEFAULT_REPEATS = 3
+
+MEDIAPIPE_AVAILABLE = importlib.util.find_spec("mediapipe") is not None
+
+STAGES = OrderedDict()
+
+
+def stage(name, needs_mediapipe=False):
+    def register(fn):
+        STAGES[name] = (fn, needs_mediapipe)
+        return fn
+    return register
+
+
+class BenchContext:
+    def __init__(self, workdir, quick=False):
+        self.workdir = workdir
+        self.frames = 60 if quick else 300
+        self.ref_video = make_video(os.path.join(workdir, "ref.mp4"), self.frames, 1280, 720)
+        self.user_video = make_video(os.path.join(workdir, "user.mp4"), self.frames, 640, 480, phase=0.3)
+        self.ref_frames = read_frames(self.ref_video)
+        self.user_frames = read_frames(self.user_video)
+
+
+def read_frames(path):
+    cap = cv2.VideoCapture(path)
+    frames = []
+    while True:
+        ok, frame = cap.read()
+        if not ok:
+            break
+        frames.append(frame)
+    cap.release()
+    return frames
+
+
+def timed(fn, items):
+    """Вызывает fn(item) для каждого элемента, возвращает задержки (мс)"""
+    latencies = []
+    for item in items:
+        started = time.perf_counter()
+        fn(item)
+        latencies.append((time.perf_counter() - started) * 1000.0)
+    return latencies
+
+
+def summarize(latencies, units=1):
+    """units: сколько кадров обрабатывает одна операция (для fps)"""
+    values = np.asarray(latencies, dtype=np.float64)
+    total = values.sum() / 1000.0
+    return {
+        "iterations": int(len(values)),
+        "fps": round(len(values) * units / total, 1) if total > 0 else None,
+        "mean_ms": round(float(values.mean()), 3),
+        "p50_ms": round(float(np.percentile(values, 50)), 3),
+        "p95_ms": round(float(np.percentile(values, 95)), 3),
+    }
+
+
+# --- СТАДИИ ---
+
+@stage("decode")
+def bench_decode(ctx):
+    cap = cv2.VideoCapture(ctx.ref_video)
+    latencies = timed(lambda _: cap.read(), range(ctx.frames))
+    cap.release()
+    return summarize(latencies)
+
+
+@stage("pose", needs_mediapipe=True)
+def bench_pose(ctx):
+    from backend.core.pose_engine import PoseEngine
+
+    engine = PoseEngine()
+    engine.process_frame(ctx.user_frames[0])  # загрузка модели не входит в замер
+    return summarize(timed(engine.process_frame, ctx.user_frames))
+
+
+@stage("angles")
+def bench_angles(ctx):
+    rng = np.random.default_rng(0)
+    poses = rng.normal(size=(ctx.frames, 33, 3)).astype(np.float32)
+    return summarize(timed(lambda lms: calculate_angles_batch(lms, DEFAULT_ANGLE_TABLE), poses))
+
+
+@stage("scoring")
+def bench_scoring(ctx):
+    rng = np.random.default_rng(1)
+    joints = DEFAULT_ANGLE_TABLE.names
+    n = 30 * 180  # трехминутный уровень
+    timestamps = np.arange(n, dtype=np.float32) / 30.0
+    patterns = PatternTimeline(timestamps, rng.uniform(0, 180, size=(n, len(joints))), joints)
+    scorer = StreamingScorer(patterns, joints)
+    user = rng.uniform(0, 180, size=(ctx.frames, len(joints)))
+    ticks = iter(range(ctx.frames))
+    return summarize(timed(lambda angles: scorer.update(next(ticks) / 30.0 + 30.0, angles), user))
+
+
+@stage("overlays")
+def bench_overlays(ctx):
+    rng = np.random.default_rng(2)
+    events = [{"id": i, "type": "image", "time": float(t), "duration": float(d)}
+              for i, (t, d) in enumerate(zip(rng.uniform(0, 180, 500), rng.uniform(0.5, 5, 500)))]
+    index = TimelineIndex(events)
+    times = np.arange(ctx.frames * 10) / 30.0
+    return summarize(timed(index.active_json, times))
+
+
+@stage("encode")
+def bench_encode(ctx):
+    encoder = FrameEncoder(quality=50)
+    pairs = list(zip(ctx.ref_frames, ctx.user_frames))
+    latencies = timed(lambda pair: encoder.encode_pair(pair[0], pair[1], pair[0].shape[0]), pairs)
+    encoder.close()
+    return summarize(latencies)
+
+
+def _publisher():
+    """PUB + SUB на loopback, подписчик вычитывает сообщения в отдельном потоке"""
+    import zmq
+
+    context = zmq.Context()
+    pub = context.socket(zmq.PUB)
+    port = pub.bind_to_random_port("tcp://127.0.0.1")
+    sub = context.socket(zmq.SUB)
+    sub.connect(f"tcp://127.0.0.1:{port}")
+    sub.setsockopt(zmq.SUBSCRIBE, b"video")
+    sub.RCVTIMEO = 200
+    time.sleep(0.2)  # slow joiner
+
+    stop = threading.Event()
+
+    def drain():
+        while not stop.is_set():
+            try:
+                sub.recv_multipart()
+            except zmq.Again:
+                pass
+
+    thread = threading.Thread(target=drain, daemon=True)
+    thread.start()
+
+    def close():
+        stop.set()
+        thread.join()
+        sub.close()
+        pub.close()
+        context.term()
+
+    return pub, close
+
+
+def _meta_bytes(i):
+    return json.dumps({"state": "PLAYING", "score": i, "time": i / 30.0, "status": "GOOD",
+                       "progress": 0, "overlays": []}).encode("utf-8")
+
+
+@stage("publish")
+def bench_publish(ctx):
+    encoder = FrameEncoder(quality=50)
+    payloads = [encoder.encode_pair(r, u) for r, u in zip(ctx.ref_frames, ctx.user_frames)]
+    encoder.close()
+    pub, close = _publisher()
+    ticks = iter(range(len(payloads)))
+    latencies = timed(lambda p: pub.send_multipart([b"video", _meta_bytes(next(ticks)), p[0], p[1]]), payloads)
+    close()
+    return summarize(latencies)
+
+
+class _NullSocket:
+    """Вместо PUB-сокета движка: стоимость самой публикации меряет стадия publish"""
+
+    def send_multipart(self, parts):
+        pass
+
+    def close(self):
+        pass
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _playing_engine(ctx):
+    """Настоящий GameEngine в состоянии PLAYING: паттерн, скоринг и таймлайн трехминутного уровня"""
+    from backend.core.game_engine import GameEngine, GameState
+
+    engine = GameEngine(zmq_port=_free_port(), cmd_port=_free_port(), pose_worker=False, user_source="synthetic",
+                        level_cache_dir=os.path.join(ctx.workdir, "cache"))
+    engine._warm_up.exception()  # прогрев в фоне не должен попадать в замер
+    rng = np.random.default_rng(3)
+    joints = DEFAULT_ANGLE_TABLE.names
+    n = 30 * 180
+    engine.patterns = PatternTimeline(np.arange(n, dtype=np.float32) / 30.0,
+                                      rng.uniform(0, 180, size=(n, len(joints))), joints)
+    engine._create_scorers()
+    engine.timeline_index = TimelineIndex(
+        [{"id": i, "type": "text", "time": float(t), "duration": 2.0} for i, t in enumerate(rng.uniform(0, 180, 200))])
+    engine.state = GameState.PLAYING
+    real_socket, engine.pub_socket = engine.pub_socket, _NullSocket()
+
+    def close():
+        engine.pub_socket = real_socket
+        engine._cleanup()
+
+    return engine, close
+
+
+@stage("send_frame")
+def bench_send_frame(ctx):
+    # GameEngine._send_frame целиком (meta, JPEG-пара, оверлеи), без сети
+    engine, close = _playing_engine(ctx)
+    pairs = list(zip(ctx.ref_frames, ctx.user_frames))
+    ticks = iter(range(len(pairs)))
+
+    def send(pair):
+        engine.current_time = 30.0 + next(ticks) / 30.0
+        engine._send_frame(pair[0], pair[1], "GOOD", pair[0].shape[0])
+
+    latencies = timed(send, pairs)
+    close()
+    return summarize(latencies)
+
+
+@stage("digitizer", needs_mediapipe=True)
+def bench_digitizer(ctx):
+    from backend.core.digitizer import VideoDigitizer
+
+    output = os.path.join(ctx.workdir, "level.mtp")
+    started = time.perf_counter()
+    VideoDigitizer().create_level_from_video(ctx.ref_video, output)
+    return summarize([(time.perf_counter() - started) * 1000.0], units=ctx.frames)
+
+
+# --- ЗАПУСК И СРАВНЕНИЕ ---
+
+def run(names=None, quick=False, repeats=DEFAULT_REPEATS):
+    workdir = tempfile.mkdtemp(prefix="motion_bench_")
+    try:
+        ctx = BenchContext(workdir, quick)
+        results = OrderedDict()
+        for name, (fn, needs_mediapipe) in STAGES.items():
+            if names and name not in names:
+                continue
+            if needs_mediapipe and not MEDIAPIPE_AVAILABLE:
+                results[name] = {"skipped": "mediapipe not installed"}
+                continue
+            runs = [fn(ctx) for _ in range(1 if name == "digitizer" else repeats)]
+            results[name] = max(runs, key=lambda r: r["fps"] or 0)
+        return results
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def compare(results, baseline, threshold=DEFAULT_THRESHOLD):
+    """Список регрессий: стадии, где fps упал или p95 вырос больше чем на threshold"""
+    regressions = []
+    for name, current in results.items():
+        base = baseline.get("stages", {}).get(name)
+        if not base or "skipped" in base or "skipped" in current:
+            continue
+        limit = threshold if base["mean_ms"] >= NOISY_LATENCY_MS else max(threshold, NOISY_THRESHOLD)
+        if base.get("fps") and current["fps"] < base["fps"] * (1.0 - limit):
+            regressions.append(f"{name}: {current['fps']} fps < baseline {base['fps']} fps")
+        # p95 быстрых стадий - это дрожание планировщика, по нему не падаем
+        if base["mean_ms"] >= NOISY_LATENCY_MS and current["p95_ms"] > base["p95_ms"] * (1.0 + limit):
+            regressions.append(f"{name}: p95 {current['p95_ms']} ms > baseline {base['p95_ms']} ms")
+    return regressions
+
+
+def default_baseline_path():
+    return os.path.join(BASELINE_DIR, f"{platform.node() or 'default'}.json")
+
+
+def save_baseline(path, results, quick):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    data = {
+        "machine": platform.node(),
+        "platform": platform.platform(),
+        "python": platform.python_version(),
+        "opencv": cv2.__version__,
+        "quick": quick,
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "stages": results,
+    }
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(data, f, indent=2)
+
+
+def print_table(results):
+    print(f"{'stage':<12} {'fps':>10} {'p50 ms':>10} {'p95 ms':>10}")
+    for name, r in results.items():
+        if "skipped" in r:
+            print(f"{name:<12} {'skipped: ' + r['skipped']}")
+        else:
+            print(f"{name:<12} {r['fps']:>10} {r['p50_ms']:>10} {r['p95_ms']:>10}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Motion backend benchmarks")
+    parser.add_argument("--stages", help="comma-separated stage names (default: all)")
+    parser.add_argument("--quick", action="store_true", help="fewer frames, for smoke runs")
+    parser.add_argument("--repeats", type=int, default=DEFAULT_REPEATS, help="runs per stage, best one counts")
+    parser.add_argument("--baseline", default=None, help="baseline JSON (default: baselines/<hostname>.json)")
+    parser.add_argument("--update-baseline", action="store_true", help="write results as the new baseline")
+    parser.add_argument("--check", action="store_true", help="exit 1 on regression against the baseline")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD, help="allowed slowdown (0.2 = 20%%)")
+    parser.add_argument("--output", help="also write results JSON here")
+    args = parser.parse_args(argv)
+
+    names = set(args.stages.split(",")) if args.stages else None
+    results = run(names, args.quick, args.repeats)
+    print_table(results)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+    path = args.baseline or default_baseline_path()
+    if args.update_baseline:
+        save_baseline(path, results, args.quick)
+        print(f"Baseline written: {path}")
+        return 0
+
+    if args.check:
+        if not os.path.exists(path):
+            print(f"ERROR: no baseline at {path}; nothing to check against. "
+                  f"Record one on this machine with --update-baseline")
+            return 1
+        with open(path, encoding="utf-8") as f:
+            baseline = json.load(f)
+        if baseline.get("quick", False) != args.quick:
+            print("Warning: baseline was recorded with a different --quick setting")
+        regressions = compare(results, baseline, args.threshold)
+        for line in regressions:
+            print(f"REGRESSION {line}")
+        if regressions:
+            return 1
+        print(f"No regressions beyond {args.threshold:.0%} against {path}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
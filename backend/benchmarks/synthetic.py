@@ -0,0 +1,23 @@
+# benchmarks/synthetic.py
+"""
+Синтетические видео для бенчмарков: "человечек" из линий, который машет
+руками и приседает (кадр рисует core/frame_source.stick_figure_frame).
+Файлы создаются локально через cv2.VideoWriter, поэтому бенчмарки
+не зависят от записанных роликов и вебки.
+"""
+import cv2
+
+from backend.core.frame_source import stick_figure_frame
+
+
+def make_video(path, frames=90, width=640, height=480, fps=30.0, phase=0.0):
+    """Пишет синтетическое видео (mp4v) и возвращает путь"""
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*'mp4v'), fps, (width, height))
+    if not writer.isOpened():
+        raise RuntimeError(f"Cannot write video: {path}")
+    try:
+        for i in range(frames):
+            writer.write(stick_figure_frame(i, fps, width, height, phase))
+    finally:
+        writer.release()
+    return path
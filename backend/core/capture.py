@@ -0,0 +1,325 @@
+# core/capture.py
+"""
+Чтение кадров в фоновых потоках, чтобы главный цикл не ждал устройство.
+
+- LatestFrameReader: вебка. Поток читает камеру непрерывно, в кольцевом буфере
+  остается только самый свежий кадр ("последний побеждает").
+- PrefetchReader: референсное видео. Поток декодирует кадры наперед в
+  ограниченную очередь; seek сбрасывает очередь и переставляет позицию.
+  С индексом кадров (core/seek_index.py) seek_time попадает точно в кадр,
+  а DecodedFrameCache держит декодированные кадры вокруг playhead.
+
+Каждый кадр несет время захвата (time.monotonic()) и позицию в видео.
+"""
+import queue
+import threading
+import time
+from collections import deque
+
+import cv2
+
+
+class CapturedFrame:
+    __slots__ = ('frame', 'captured_at', 'pos_msec', 'seq')
+
+    def __init__(self, frame, captured_at, pos_msec, seq):
+        self.frame = frame
+        self.captured_at = captured_at  # time.monotonic() сразу после read()
+        self.pos_msec = pos_msec  # позиция в источнике (для видео)
+        self.seq = seq  # порядковый номер кадра от начала чтения/последнего seek
+
+
+def open_camera(index=0, width=640, height=480, fps=30):
+    """Открывает вебку с профилем низкой задержки (MJPG, размер, fps, минимальный буфер)"""
+    cap = cv2.VideoCapture(index)
+    # FOURCC выставляем до размера: часть драйверов (V4L2) иначе откатывается на YUYV
+    cap.set(cv2.CAP_PROP_FOURCC, cv2.VideoWriter_fourcc(*'MJPG'))
+    cap.set(cv2.CAP_PROP_FRAME_WIDTH, width)
+    cap.set(cv2.CAP_PROP_FRAME_HEIGHT, height)
+    cap.set(cv2.CAP_PROP_FPS, fps)
+    # Не все бэкенды поддерживают, но где поддерживают - убирает "старые" кадры
+    cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+    return cap
+
+
+class LatestFrameReader:
+    """Фоновое чтение живого источника, отдает последний кадр без ожидания"""
+
+    def __init__(self, cap, ring_size=2):
+        self.cap = cap
+        self._ring = deque(maxlen=ring_size)
+        self._stop = threading.Event()
+        self._thread = None
+        self._seq = 0
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="LatestFrameReader", daemon=True)
+            self._thread.start()
+        return self
+
+    def _run(self):
+        while not self._stop.is_set():
+            ret, frame = self.cap.read()
+            if not ret:
+                # Камера отвалилась или еще не готова - не крутим CPU впустую
+                time.sleep(0.01)
+                continue
+            self._seq += 1
+            self._ring.append(CapturedFrame(frame, time.monotonic(), 0.0, self._seq))
+
+    def read_frame(self):
+        """Последний захваченный кадр (CapturedFrame) или None"""
+        try:
+            return self._ring[-1]
+        except IndexError:
+            return None
+
+    def read(self):
+        """Совместимо с cv2.VideoCapture.read(): (ret, frame)"""
+        item = self.read_frame()
+        if item is None:
+            return False, None
+        return True, item.frame
+
+    def release(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=1.0)
+        self.cap.release()
+
+
+class DecodedFrameCache:
+    """
+    Декодированные кадры референса вокруг позиции воспроизведения (номер кадра -> кадр).
+    Размер ограничен в байтах; при переполнении вытесняются кадры, дальше всего
+    отстоящие от playhead, поэтому скраббинг туда-обратно у текущего места не декодирует.
+    """
+
+    def __init__(self, max_bytes=192 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.playhead = 0
+        self.hits = 0
+        self.misses = 0
+        self._frames = {}
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._frames)
+
+    def get(self, index):
+        with self._lock:
+            frame = self._frames.get(index)
+            if frame is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+            return frame
+
+    def put(self, index, frame):
+        with self._lock:
+            if index in self._frames:
+                return
+            self._frames[index] = frame
+            self._bytes += frame.nbytes
+            while self._bytes > self.max_bytes and len(self._frames) > 1:
+                far = max(self._frames, key=lambda i: abs(i - self.playhead))
+                self._bytes -= self._frames.pop(far).nbytes
+
+    def clear(self):
+        with self._lock:
+            self._frames.clear()
+            self._bytes = 0
+
+
+class PrefetchReader:
+    """Фоновое декодирование видеофайла наперед с поддержкой seek"""
+
+    _EOF = object()
+    # Без индекса ключевых кадров: насколько вперед декодировать подряд вместо seek
+    MAX_FORWARD_DECODE = 48
+
+    def __init__(self, cap, prefetch=8, seek_index=None, frame_cache=None):
+        """
+        seek_index: SeekIndex видео (core/seek_index.py) - точный seek_time и время кадров
+        frame_cache: DecodedFrameCache - кадры, декодированные при чтении и seek
+        """
+        self.cap = cap
+        self.fps = cap.get(cv2.CAP_PROP_FPS)
+        self.frame_count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        self.frame_size = (int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)), int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT)))
+        self.seek_index = seek_index
+        self.frame_cache = frame_cache
+        self.eof = False
+        self._queue = queue.Queue(maxsize=prefetch)
+        self._lock = threading.Lock()  # защищает cap между потоком и seek
+        self._stop = threading.Event()
+        self._thread = None
+        self._seq = 0
+        self._next_index = 0  # номер кадра, который вернет следующий cap.read()
+        self._resume_index = None  # куда встать декодеру перед чтением (после seek из кеша)
+
+    def start(self):
+        if self._thread is None:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="PrefetchReader", daemon=True)
+            self._thread.start()
+        return self
+
+    def _run(self):
+        while not self._stop.is_set():
+            with self._lock:
+                if self._resume_index is not None:
+                    if not self._position(self._resume_index):
+                        continue  # прервано новым seek
+                    self._resume_index = None
+                index = self._next_index
+                ret, frame = self.cap.read()
+                if ret:
+                    self._next_index += 1
+                pos_msec = self._pos_msec(index)
+            item = self._EOF
+            if ret:
+                self._seq += 1
+                item = CapturedFrame(frame, time.monotonic(), pos_msec, self._seq)
+                if self.frame_cache is not None:
+                    self.frame_cache.playhead = index
+                    self.frame_cache.put(index, frame)
+
+            while not self._stop.is_set():
+                try:
+                    self._queue.put(item, timeout=0.1)
+                    break
+                except queue.Full:
+                    pass
+            if item is self._EOF:
+                return
+
+    def _pos_msec(self, index):
+        if self.seek_index is not None and index < len(self.seek_index):
+            return self.seek_index.time_of(index) * 1000.0
+        return self.cap.get(cv2.CAP_PROP_POS_MSEC)
+
+    def _position(self, target):
+        """
+        Ставит декодер так, чтобы следующий read() вернул кадр target (вызывать под _lock).
+        Если между текущей позицией и target нет ключевого кадра - декодирует вперед
+        (промежуточные кадры идут в кеш), иначе seek по номеру кадра: FFmpeg сам
+        декодирует от ключевого кадра, не конвертируя промежуточные кадры в BGR.
+        Возвращает False, если прервано остановкой потока.
+        """
+        key = self.seek_index.keyframe_before(target) if self.seek_index is not None else None
+        ahead = self._next_index <= target
+        if key is not None:
+            forward = ahead and key <= self._next_index
+        else:
+            forward = ahead and target - self._next_index <= self.MAX_FORWARD_DECODE
+        if not forward:
+            self.cap.set(cv2.CAP_PROP_POS_FRAMES, target)
+            self._next_index = target
+
+        while self._next_index < target:
+            if self._stop.is_set() and threading.current_thread() is self._thread:
+                return False
+            ret, frame = self.cap.read()
+            if not ret:
+                break
+            if self.frame_cache is not None:
+                self.frame_cache.put(self._next_index, frame)
+            self._next_index += 1
+        return True
+
+    def read_frame(self, timeout=None):
+        """
+        Следующий кадр (CapturedFrame). None - если конец видео (тогда eof=True)
+        или кадр не успел декодироваться за timeout.
+        """
+        if self.eof:
+            return None
+        self.start()  # после seek_time поток запускается только когда кадры снова нужны
+        try:
+            item = self._queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+        if item is self._EOF:
+            self.eof = True
+            return None
+        return item
+
+    def read(self):
+        """Совместимо с cv2.VideoCapture.read(): (ret, frame)"""
+        item = self.read_frame(timeout=1.0)
+        if item is None:
+            return False, None
+        return True, item.frame
+
+    def _halt(self):
+        """Останавливает поток и выбрасывает предзагруженные кадры"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        while True:
+            try:
+                self._queue.get_nowait()
+            except queue.Empty:
+                break
+        self.eof = False
+        self._seq = 0
+
+    def _reposition(self, prop, value, index):
+        self._halt()
+        with self._lock:
+            self.cap.set(prop, value)
+            self._next_index = index
+            self._resume_index = None
+        self.start()
+
+    def seek_msec(self, msec):
+        """Сбрасывает предзагруженные кадры и продолжает чтение с msec"""
+        if self.seek_index is not None and len(self.seek_index):
+            index = self.seek_index.frame_at(msec / 1000.0)
+        else:
+            index = int(round(msec * (self.fps or 30.0) / 1000.0))
+        self._reposition(cv2.CAP_PROP_POS_MSEC, msec, index)
+
+    def seek_frame(self, index):
+        self._reposition(cv2.CAP_PROP_POS_FRAMES, index, index)
+
+    def seek_time(self, t):
+        """
+        Точный seek: кадр, который показывается в момент t (CapturedFrame или None).
+        Из кеша - без декодирования (декодер переставится в фоне, когда чтение
+        продолжится), иначе декодирование от ключевого кадра. Дальше чтение идет
+        со следующего кадра. Без индекса - как seek_msec + первый кадр.
+        """
+        if self.seek_index is None or not len(self.seek_index):
+            self.seek_msec(t * 1000.0)
+            return self.read_frame(timeout=1.0)
+
+        index = self.seek_index.frame_at(t)
+        self._halt()
+        frame = self.frame_cache.get(index) if self.frame_cache is not None else None
+        with self._lock:
+            if frame is None:
+                self._position(index)
+                ret, frame = self.cap.read()
+                if not ret:
+                    self._resume_index = None
+                    return None
+                self._next_index += 1
+                self._resume_index = None
+                if self.frame_cache is not None:
+                    self.frame_cache.put(index, frame)
+            else:
+                self._resume_index = index + 1
+        if self.frame_cache is not None:
+            self.frame_cache.playhead = index
+        return CapturedFrame(frame, time.monotonic(), self.seek_index.time_of(index) * 1000.0, 0)
+
+    def release(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=1.0)
+        self.cap.release()
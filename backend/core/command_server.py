@@ -0,0 +1,68 @@
+# core/command_server.py
+"""
+Канал команд на ZeroMQ ROUTER + Poller.
+
+ROUTER совместим по проводу с REQ-клиентами frontend, но, в отличие от REP,
+не требует строгого чередования recv/send: несколько клиентов обслуживаются
+вперемешку, а ответ можно отправить позже (например, когда закончится
+долгая операция). Главный цикл вместо time.sleep ждет команды в poll(),
+поэтому команда обрабатывается сразу, а не через тик.
+"""
+import json
+
+import zmq
+
+
+class CommandRequest:
+    __slots__ = ('envelope', 'command')
+
+    def __init__(self, envelope, command):
+        self.envelope = envelope  # [identity, ..., b""] - маршрут для ответа
+        self.command = command
+
+
+class CommandServer:
+    def __init__(self, context, endpoint):
+        self.socket = context.socket(zmq.ROUTER)
+        self.socket.setsockopt(zmq.LINGER, 0)
+        self.socket.bind(endpoint)
+        self.poller = zmq.Poller()
+        self.poller.register(self.socket, zmq.POLLIN)
+
+    def poll(self, timeout=0.0):
+        """
+        Ждет команды не дольше timeout (сек). Возвращает список CommandRequest.
+        Некорректный JSON получает ответ с ошибкой сразу здесь.
+        """
+        requests = []
+        events = dict(self.poller.poll(max(0, int(timeout * 1000))))
+        if self.socket not in events:
+            return requests
+
+        while True:
+            try:
+                frames = self.socket.recv_multipart(flags=zmq.NOBLOCK)
+            except zmq.Again:
+                break
+
+            # REQ-клиент присылает [identity, b"", payload]
+            split = frames.index(b"") + 1 if b"" in frames else len(frames) - 1
+            envelope, payload = frames[:split], frames[split:]
+            try:
+                command = json.loads(payload[0].decode('utf-8'))
+                if not isinstance(command, dict):
+                    raise ValueError("command must be a JSON object")
+            except (IndexError, ValueError, UnicodeDecodeError) as e:
+                self._send(envelope, {"status": "error", "msg": f"Bad command: {e}"})
+                continue
+            requests.append(CommandRequest(envelope, command))
+        return requests
+
+    def reply(self, request, response):
+        self._send(request.envelope, response)
+
+    def _send(self, envelope, response):
+        self.socket.send_multipart(envelope + [json.dumps(response).encode('utf-8')])
+
+    def close(self):
+        self.socket.close()
@@ -1,20 +1,148 @@
 import cv2
-import json
 import os
-import zipfile
-from backend.core.pose_engine import PoseEngine
-from backend.core.geometry import calculate_angle_3d
+import queue
+import multiprocessing
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+from backend.core.model_pool import pose_pool
+from backend.core.geometry import DEFAULT_ANGLE_TABLE
+from backend.core.landmark_store import LANDMARKS_BIN_NAME
+from backend.core.mtp_writer import DigitizeWorkspace, LandmarkSpool, write_mtp
+from backend.core.pattern_store import PATTERNS_BIN_NAME
+from backend.core.seek_index import SEEK_INDEX_NAME, build_seek_index
 
+# Сколько кадров перед началом сегмента прогоняем для прогрева трекера MediaPipe
+# (их позы при упаковке смешиваются с хвостом предыдущего сегмента)
+DEFAULT_OVERLAP_FRAMES = 30
+
+# Сегмент - кадры, которые трекер проходит от одного старта. Трекер начинает
+# заново на каждом сегменте при любом числе воркеров и при возобновлении, поэтому
+# паттерн зависит только от видео. Цена - прогрев (DEFAULT_OVERLAP_FRAMES кадров,
+# около 10%) на каждый сегмент. Сегмент - и единица контрольной точки
+SEGMENT_FRAMES = 300
+
+# Как часто (с) родитель параллельного режима проверяет прогресс и отмену
+POLL_INTERVAL = 0.2
+
+# Порядок колонок в patterns.bin (= таблица углов geometry.JOINT_ANGLES)
+PATTERN_JOINTS = DEFAULT_ANGLE_TABLE.names
+
+
+def plan_segments(total_frames, segment_frames, overlap_frames=DEFAULT_OVERLAP_FRAMES):
+    """
+    Делит [0, total_frames) на сегменты по segment_frames кадров.
+    Возвращает список (warmup_start, start, end): кадры [warmup_start, start)
+    прогревают трекер сегмента. У последнего сегмента end=None:
+    CAP_PROP_FRAME_COUNT - лишь оценка, и он читает до конца файла.
+    """
+    segment_frames = max(1, segment_frames)
+    segments = []
+    for start in range(0, max(1, total_frames), segment_frames):
+        end = start + segment_frames if start + segment_frames < total_frames else None
+        segments.append((max(0, start - overlap_frames), start, end))
+    return segments
+
+
+class DigitizeCancelled(Exception):
+    """Оцифровка остановлена через cancel_event (недописанный сегмент не помечается готовым)"""
+
+
+def _iter_landmarks(engine, cap, first_frame, end=None, cancel_event=None):
+    """
+    Читает кадры [first_frame, end) (end=None - до конца файла).
+    Отдает (номер кадра, landmarks (33, 4) или None).
+    Перед каждым кадром проверяет cancel_event: если он выставлен - DigitizeCancelled.
+    """
+    frame_idx = first_frame
+    while end is None or frame_idx < end:
+        if cancel_event is not None and cancel_event.is_set():
+            raise DigitizeCancelled()
+        ret, frame = cap.read()
+        if not ret:
+            break
+
+        yield frame_idx, engine.get_landmark_tensor(engine.process_frame(frame))
+        frame_idx += 1
+
+
+def _fill_spool(engine, source_video_path, spool, on_progress=None, cancel_event=None):
+    """
+    Обрабатывает сегмент спула с его прогревом и помечает готовым (контрольная точка).
+    Трекер engine сбрасывается: строки сегмента не зависят от того, что engine считал до него.
+    on_progress(сколько кадров сегмента обработано, без прогрева).
+    cancel_event - см. _iter_landmarks; отмененный сегмент при возобновлении начнется сначала.
+    """
+    if spool.done:
+        return
+    engine.reset()
+    cap = cv2.VideoCapture(source_video_path)
+    if spool.warmup_start > 0:
+        cap.set(cv2.CAP_PROP_POS_FRAMES, spool.warmup_start)
+
+    frame_indices, landmarks = [], []
+    next_frame = spool.start
+    try:
+        for frame_idx, lms in _iter_landmarks(engine, cap, spool.warmup_start, spool.end, cancel_event):
+            if lms is not None:
+                frame_indices.append(frame_idx)
+                landmarks.append(lms)
+            if frame_idx >= spool.start:
+                next_frame = frame_idx + 1
+                if on_progress:
+                    on_progress(next_frame - spool.start)
+        if frame_indices:
+            spool.append(frame_indices, np.stack(landmarks))
+        spool.checkpoint(next_frame, done=True)
+    finally:
+        cap.release()
+        spool.close()
 
-class VideoDigitizer:
-    def __init__(self):
-        self.pose_engine = PoseEngine()
 
-    def create_level_from_video(self, source_video_path, output_mtp_path, progress_callback=None):
+def _digitize_range(source_video_path, work_dir, warmup_start, start, end, progress_queue=None,
+                    cancel_event=None):
+    """
+    Воркер пула: обрабатывает сегмент [start, end) (end=None - до конца файла) своим PoseEngine
+    (граф из пула процесса переиспользуется следующими сегментами) в спул
+    рабочей папки. Прогресс шлет в очередь приращениями (кол-во обработанных кадров).
+    cancel_event - Event менеджера, который родитель выставляет при отмене.
+    """
+    spool = LandmarkSpool(work_dir, start, end, warmup_start)
+    reported = [0]
+
+    def on_progress(done):
+        if progress_queue is not None and done - reported[0] >= 10:
+            progress_queue.put(done - reported[0])
+            reported[0] = done
+
+    with pose_pool().lease() as engine:
+        _fill_spool(engine, source_video_path, spool, on_progress, cancel_event)
+    if progress_queue is not None:
+        # Досылаем остаток, включая кадры, которых не оказалось в файле
+        last = end if end is not None else spool.next_frame
+        progress_queue.put((last - start) - reported[0])
+    return spool.rows
+
+
+class VideoDigitizer:
+    def create_level_from_video(self, source_video_path, output_mtp_path, progress_callback=None,
+                                workers=1, overlap_frames=DEFAULT_OVERLAP_FRAMES, resume=True, keyframe_error=None,
+                                cancel_event=None):
         """
         source_video_path: Путь к исходному видео (например, MP4)
         output_mtp_path: Куда сохранить готовый .mtp
         progress_callback: Функция f(percent), которую будем дергать
+        workers: Число процессов. Видео делится на сегменты по SEGMENT_FRAMES кадров
+                 (трекер каждого начинает заново после прогрева); при workers > 1
+                 сегменты обрабатываются пулом процессов. Паттерн от workers не зависит
+        overlap_frames: Сколько кадров прогрева трекера перед каждым сегментом
+        resume: Продолжить прерванный запуск с тем же output (рабочая папка <output>.work,
+                см. core/mtp_writer.py): готовые сегменты не пересчитываются, и паттерн
+                тот же, что у непрерванного запуска
+        keyframe_error: Сжать паттерн до ключевых строк с ошибкой интерполяции не больше
+                        стольких градусов (core/pattern_keyframes.py); None - строка на каждый кадр
+        cancel_event: multiprocessing.Event; когда он выставлен, обработка (и пул воркеров)
+                      останавливается и поднимается DigitizeCancelled
+        Возвращает отчет сжатия паттерна (None без keyframe_error).
         """
         if not os.path.exists(source_video_path):
             raise FileNotFoundError(f"Video not found: {source_video_path}")
@@ -22,59 +150,26 @@ class VideoDigitizer:
         cap = cv2.VideoCapture(source_video_path)
         total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
         fps = cap.get(cv2.CAP_PROP_FPS)
+        cap.release()
         if fps == 0:
             fps = 30
 
         if total_frames == 0:
             total_frames = 1
 
-        patterns = []
-        frame_idx = 0
-
         print(f"[Digitizer] Starting processing: {source_video_path}")
 
-        while True:
-            ret, frame = cap.read()
-            if not ret:
-                break
-
-            results = self.pose_engine.process_frame(frame)
-            lms = self.pose_engine.get_3d_landmarks(results)
-
-            if lms:
-                idx = self.pose_engine.JOINTS
-
-                angles = {}
-                try:
-                    angles['left_elbow'] = calculate_angle_3d(
-                        lms[idx['LEFT_SHOULDER']], lms[idx['LEFT_ELBOW']], lms[idx['LEFT_WRIST']]
-                    )
-                    angles['right_elbow'] = calculate_angle_3d(
-                        lms[idx['RIGHT_SHOULDER']], lms[idx['RIGHT_ELBOW']], lms[idx['RIGHT_WRIST']]
-                    )
-                    angles['left_shoulder'] = calculate_angle_3d(
-                        lms[idx['LEFT_HIP']], lms[idx['LEFT_SHOULDER']], lms[idx['LEFT_ELBOW']]
-                    )
-                    angles['right_shoulder'] = calculate_angle_3d(
-                        lms[idx['RIGHT_HIP']], lms[idx['RIGHT_SHOULDER']], lms[idx['RIGHT_ELBOW']]
-                    )
-                except Exception:
-                    pass
-
-                timestamp = frame_idx / fps
-                record = {
-                    "timestamp": round(timestamp, 3),
-                    "angles": angles
-                }
-                patterns.append(record)
-
-            frame_idx += 1
-
-            if frame_idx % 10 == 0 and progress_callback:
-                percent = int((frame_idx / total_frames) * 100)
-                progress_callback(percent)
+        workspace = DigitizeWorkspace(output_mtp_path, source_video_path, fps, PATTERN_JOINTS, resume)
+        workspace.plan(plan_segments(total_frames, SEGMENT_FRAMES, overlap_frames))
+        if workspace.resumed:
+            print(f"[Digitizer] Resuming from checkpoints in {workspace.dir}")
 
-        cap.release()
+        spools = workspace.spools()
+        if workers > 1 and sum(not spool.done for spool in spools) > 1:
+            self._process_parallel(source_video_path, workspace, workers, total_frames, progress_callback,
+                                   cancel_event)
+        else:
+            self._process_sequential(source_video_path, workspace, total_frames, progress_callback, cancel_event)
 
         print(f"[Digitizer] Packing v2 to {output_mtp_path}...")
 
@@ -85,15 +180,78 @@ class VideoDigitizer:
             "duration": total_frames / fps,
             "files": {
                 "video": "video.mp4",
-                "patterns": "patterns.json"
+                "patterns": "patterns.json",
+                "patterns_bin": PATTERNS_BIN_NAME,
+                "seek_index": SEEK_INDEX_NAME,
+                "landmarks": LANDMARKS_BIN_NAME
             }
         }
 
-        with zipfile.ZipFile(output_mtp_path, 'w', zipfile.ZIP_DEFLATED) as zf:
-            zf.writestr("manifest.json", json.dumps(manifest, indent=2))
-            zf.writestr("patterns.json", json.dumps(patterns))
-            zf.write(source_video_path, "video.mp4")
+        report = write_mtp(output_mtp_path, manifest, workspace.spools(), fps, source_video_path,
+                           build_seek_index(source_video_path), DEFAULT_ANGLE_TABLE, keyframe_error)
+        workspace.discard()
+        if report is not None:
+            print(f"[Digitizer] Keyframes: {report['keyframes']} of {report['frames']} frames "
+                  f"({report['ratio']}x, max error {keyframe_error} deg)")
 
         print("[Digitizer] Done.")
         if progress_callback:
             progress_callback(100)
+        return report
+
+    def _process_sequential(self, source_video_path, workspace, total_frames, progress_callback,
+                            cancel_event=None):
+        with pose_pool().lease() as engine:
+            for spool in workspace.spools():
+                def on_progress(done):
+                    if done % 10 == 0 and progress_callback:
+                        percent = min(99, int(((spool.start + done) / total_frames) * 100))
+                        progress_callback(percent)
+
+                _fill_spool(engine, source_video_path, spool, on_progress, cancel_event)
+
+    def _process_parallel(self, source_video_path, workspace, workers, total_frames, progress_callback,
+                          cancel_event=None):
+        spools = workspace.spools()
+        todo = [(spool.warmup_start, spool.start, spool.end) for spool in spools if not spool.done]
+        workers = min(workers, len(todo))
+        print(f"[Digitizer] Parallel mode: {workers} workers, {len(spools)} segments ({len(todo)} to do)")
+        done_frames = sum(spool.next_frame - spool.start for spool in spools)
+
+        # Manager().Queue/Event можно передавать в процессы пула (в т.ч. при spawn на Windows).
+        # Отмена доходит до воркеров через общий Event, и пул закрывается своим with -
+        # ни один воркер не переживает этот процесс.
+        # spawn: после fork воркер унаследовал бы графы MediaPipe из пула этого процесса
+        # вместе с их остановленными потоками и завис бы на первом кадре
+        context = multiprocessing.get_context("spawn")
+        with context.Manager() as manager, ProcessPoolExecutor(max_workers=workers, mp_context=context) as pool:
+            progress_queue = manager.Queue()
+            stop = manager.Event()
+            futures = [
+                pool.submit(_digitize_range, source_video_path, workspace.dir, warm, start, end,
+                            progress_queue, stop)
+                for warm, start, end in todo
+            ]
+
+            last_percent = -1
+            pending = set(futures)
+            while pending:
+                _, pending = wait(pending, timeout=POLL_INTERVAL, return_when=FIRST_COMPLETED)
+                if cancel_event is not None and cancel_event.is_set():
+                    stop.set()
+                    for future in pending:
+                        future.cancel()  # сегменты, которые еще не начались
+                while True:
+                    try:
+                        done_frames += progress_queue.get_nowait()
+                    except queue.Empty:
+                        break
+                percent = min(99, int(done_frames / total_frames * 100))
+                if progress_callback and percent != last_percent:
+                    progress_callback(percent)
+                    last_percent = percent
+
+            if stop.is_set():
+                raise DigitizeCancelled()
+            for future in futures:
+                future.result()  # ошибка воркера - наружу; готовые сегменты остаются в контрольных точках
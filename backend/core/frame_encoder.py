@@ -0,0 +1,83 @@
+# core/frame_encoder.py
+"""
+JPEG-кодирование кадров для PUB-потока.
+
+- Оба кадра (референс + пользователь) кодируются параллельно в небольшом
+  пуле потоков: cv2.imencode отпускает GIL.
+- Результат кешируется по идентичности кадра: статичные кадры (blank_frame,
+  last_ref_frame на паузе) кодируются один раз, а не каждый тик.
+  Кадры, которые рисуются "на месте", в кеш не попадают: каждый тик это
+  новый массив, а старые ссылки вытесняются из кеша.
+- Масштабирование под высоту отображения (fit_height) выполняется тут же,
+  в потоке кодирования, и только если размер действительно отличается.
+"""
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+
+
+def fit_height(frame, height):
+    """Кадр, масштабированный до высоты height с сохранением пропорций (без копии, если не нужно)"""
+    h, w = frame.shape[:2]
+    if not height or h == height or h == 0:
+        return frame
+    interpolation = cv2.INTER_AREA if height < h else cv2.INTER_LINEAR
+    return cv2.resize(frame, (max(1, int(w * height / h)), height), interpolation=interpolation)
+
+
+class FrameEncoder:
+    def __init__(self, quality=50, workers=2, cache_size=4):
+        self.params = [int(cv2.IMWRITE_JPEG_QUALITY), quality]
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="jpeg")
+        # id(frame) -> (frame, height, bytes); ссылка на кадр держит id уникальным
+        self._cache = OrderedDict()
+        self.cache_size = cache_size
+        self.hits = 0
+        self.misses = 0
+
+    def _cached(self, frame, height):
+        entry = self._cache.get(id(frame))
+        if entry is not None and entry[0] is frame and entry[1] == height:
+            self._cache.move_to_end(id(frame))
+            self.hits += 1
+            return entry[2]
+        return None
+
+    def _store(self, frame, height, data):
+        self._cache[id(frame)] = (frame, height, data)
+        self._cache.move_to_end(id(frame))
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+
+    def _encode(self, frame, height=None):
+        ok, buf = cv2.imencode('.jpg', fit_height(frame, height), self.params)
+        return buf.tobytes() if ok else b""
+
+    def encode_pair(self, ref, user, user_height=None):
+        """
+        Кодирует два кадра параллельно, возвращает (ref_bytes, user_bytes).
+        user_height: высота, до которой масштабировать кадр пользователя перед кодированием.
+        """
+        frames = (ref, user)
+        heights = (None, user_height)
+        results = [self._cached(f, h) for f, h in zip(frames, heights)]
+
+        pending = {}
+        for i, frame in enumerate(frames):
+            if results[i] is None:
+                if frame is ref and i == 1 and not user_height:
+                    continue  # один и тот же кадр дважды - кодируем один раз
+                self.misses += 1
+                pending[i] = self._pool.submit(self._encode, frame, heights[i])
+
+        for i, future in pending.items():
+            results[i] = future.result()
+            self._store(frames[i], heights[i], results[i])
+        if results[1] is None:
+            results[1] = results[0]
+        return results[0], results[1]
+
+    def close(self):
+        self._pool.shutdown(wait=False)
+        self._cache.clear()
@@ -0,0 +1,184 @@
+# core/frame_source.py
+"""
+Источники кадров пользователя (Ports & Adapters, см. docs/architecture.md).
+
+Ядро работает с любым объектом, у которого есть read_frame() -> CapturedFrame | None
+и release(). Адаптеры:
+
+- вебка: LatestFrameReader(open_camera(...)) из core/capture.py;
+- VideoFileSource: записанное видео. realtime=True - ведет себя как камера
+  (кадры идут с частотой файла, отдается последний), realtime=False - каждый
+  вызов отдает следующий кадр по порядку, без ожидания (offline replay);
+- SyntheticSource: генерирует "человечка" на лету (нагрузочные тесты без камеры);
+- NullFrameSource: кадров нет (пока источник открывается в фоне или не открылся).
+
+open_frame_source("webcam:0" | "synthetic" | "<путь к видео>") выбирает адаптер по строке.
+"""
+import math
+import threading
+import time
+
+import cv2
+import numpy as np
+
+from backend.core.capture import CapturedFrame, LatestFrameReader, open_camera
+
+
+def stick_figure_frame(index, fps, width, height, phase=0.0):
+    """Кадр с фигурой в позе, зависящей от времени index / fps"""
+    t = index / float(fps) + phase
+    frame = np.full((height, width, 3), 40, dtype=np.uint8)
+    # Немного шума, чтобы JPEG/декодер работали не с идеально плоской картинкой
+    cv2.randn(frame, 40, 8)
+
+    s = height / 480.0
+    cx = width // 2
+    squat = int(40 * s * (0.5 + 0.5 * math.sin(t * 2.0)))
+    hip = (cx, int(270 * s) + squat)
+    neck = (cx, int(140 * s) + squat)
+    head = (cx, int(100 * s) + squat)
+    color = (230, 220, 210)
+    thick = max(2, int(10 * s))
+
+    cv2.circle(frame, head, int(30 * s), color, -1)
+    cv2.line(frame, neck, hip, color, thick)
+    for side in (-1, 1):
+        arm = math.sin(t * 3.0) * side * 1.2
+        elbow = (neck[0] + side * int(60 * s), neck[1] + int(50 * s * math.cos(arm)))
+        wrist = (elbow[0] + side * int(50 * s), elbow[1] - int(60 * s * math.sin(arm)))
+        knee = (hip[0] + side * int(35 * s), hip[1] + int(90 * s) - squat // 2)
+        ankle = (knee[0] + side * int(5 * s), int(450 * s))
+        cv2.line(frame, neck, elbow, color, thick)
+        cv2.line(frame, elbow, wrist, color, thick)
+        cv2.line(frame, hip, knee, color, thick)
+        cv2.line(frame, knee, ankle, color, thick)
+    return frame
+
+
+class _PacedCapture:
+    """Обертка над cv2.VideoCapture файла: read() отдает кадры не быстрее fps файла"""
+
+    def __init__(self, cap, loop):
+        self.cap = cap
+        self.loop = loop
+        self.interval = 1.0 / (cap.get(cv2.CAP_PROP_FPS) or 30.0)
+        self._next = time.monotonic()
+
+    def read(self):
+        delay = self._next - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+        self._next = max(self._next + self.interval, time.monotonic() - self.interval)
+        ret, frame = self.cap.read()
+        if not ret and self.loop:
+            self.cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+            ret, frame = self.cap.read()
+        return ret, frame
+
+    def release(self):
+        self.cap.release()
+
+
+class VideoFileSource:
+    def __init__(self, path, realtime=True, loop=False):
+        cap = cv2.VideoCapture(path)
+        if not cap.isOpened():
+            raise ValueError(f"Cannot open video: {path}")
+        self.path = path
+        self.realtime = realtime
+        self.fps = cap.get(cv2.CAP_PROP_FPS) or 30.0
+        self.frame_count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        self.eof = False
+        self._seq = 0
+        if realtime:
+            self._reader = LatestFrameReader(_PacedCapture(cap, loop)).start()
+            self._cap = None
+        else:
+            self._reader = None
+            self._cap = cap
+
+    def read_frame(self):
+        if self._reader is not None:
+            return self._reader.read_frame()
+        ret, frame = self._cap.read()
+        if not ret:
+            self.eof = True
+            return None
+        self._seq += 1
+        # Время захвата - по позиции в записи, а не по часам: replay быстрее реального времени
+        pos = (self._seq - 1) / self.fps
+        return CapturedFrame(frame, pos, pos * 1000.0, self._seq)
+
+    def read(self):
+        item = self.read_frame()
+        return (False, None) if item is None else (True, item.frame)
+
+    def release(self):
+        if self._reader is not None:
+            self._reader.release()
+        if self._cap is not None:
+            self._cap.release()
+
+
+class SyntheticSource:
+    def __init__(self, width=640, height=480, fps=30.0, realtime=True):
+        self.width = width
+        self.height = height
+        self.fps = fps
+        self.realtime = realtime
+        self.eof = False
+        self._next_index = 0
+        self._started = time.monotonic()
+        self._last = None  # (index, CapturedFrame)
+        self._lock = threading.Lock()
+
+    def read_frame(self):
+        with self._lock:
+            if self.realtime:
+                index = int((time.monotonic() - self._started) * self.fps)
+            else:
+                index = self._next_index
+                self._next_index += 1
+            if self._last is not None and self._last[0] == index:
+                return self._last[1]  # новый кадр "камеры" еще не готов
+
+            pos = index / self.fps
+            captured_at = time.monotonic() if self.realtime else pos
+            item = CapturedFrame(stick_figure_frame(index, self.fps, self.width, self.height),
+                                 captured_at, pos * 1000.0, index + 1)
+            self._last = (index, item)
+            return item
+
+    def read(self):
+        return True, self.read_frame().frame
+
+    def release(self):
+        pass
+
+
+class NullFrameSource:
+    eof = False
+
+    def read_frame(self):
+        return None
+
+    def read(self):
+        return False, None
+
+    def release(self):
+        pass
+
+
+def open_frame_source(spec, width=640, height=480, fps=30, realtime=True):
+    """
+    spec: "webcam" / "webcam:<index>" / "synthetic" / путь к видеофайлу,
+    либо готовый источник (возвращается как есть).
+    """
+    if not isinstance(spec, str):
+        return spec
+    if spec == "synthetic":
+        return SyntheticSource(width, height, fps, realtime)
+    if spec == "webcam" or spec.startswith("webcam:"):
+        index = int(spec.split(":", 1)[1]) if ":" in spec else 0
+        return LatestFrameReader(open_camera(index, width, height, fps)).start()
+    return VideoFileSource(spec, realtime=realtime, loop=realtime)
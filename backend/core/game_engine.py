@@ -1,24 +1,55 @@
-import os
 import cv2
+import functools
 import json
+import os
 import time
 import numpy as np
 import zmq
-import threading
+from concurrent.futures import ThreadPoolExecutor
 from enum import Enum
 
-from backend.core.pose_engine import PoseEngine
-from backend.core.geometry import calculate_angle_3d
-from backend.core.digitizer import VideoDigitizer  # <--- Убедись, что создал digitizer.py!
-
-# Проверка звука
-try:
-    from ffpyplayer.player import MediaPlayer
-
-    SOUND_AVAILABLE = True
-except ImportError:
-    print("Warning: ffpyplayer not found. Sound disabled.")
-    SOUND_AVAILABLE = False
+from backend.core.geometry import DEFAULT_ANGLE_TABLE
+from backend.core.jobs import DigitizeJobManager
+from backend.core.level_cache import DEFAULT_MAX_BYTES, LevelCache, open_video_capture
+from backend.core.model_pool import pose_pool
+from backend.core.pattern_store import load_patterns
+from backend.core.pattern_index import PatternTimeline
+from backend.core.playback import SPEED_MAX, SPEED_MIN, AudioTrack, FrameScheduler, PlaybackClock
+from backend.core.pose_tracking import InferenceGovernor, LandmarkTracker
+from backend.core.pose_worker import DEFAULT_INFERENCE_HEIGHT, InlinePoseBackend, PosePipeline, ProcessPoseBackend
+from backend.core.multiplayer import Player, PlayerRegions, PersonDetector, draw_players, play_frame
+from backend.core.scoring import StreamingScorer
+from backend.core.seek_index import build_seek_index, find_seek_index, load_seek_index
+from backend.core.timeline_index import TimelineIndex, load_timeline_events
+from backend.core.capture import DecodedFrameCache, PrefetchReader
+from backend.core.frame_source import NullFrameSource, open_frame_source
+from backend.core.frame_encoder import FrameEncoder, fit_height
+from backend.core.shm_transport import SharedFrameRing
+from backend.core.command_server import CommandServer
+from backend.core.metrics import Metrics, NullMetrics
+
+@functools.lru_cache(maxsize=None)
+def load_media_player():
+    """
+    Класс ffpyplayer MediaPlayer или None, если звука нет.
+    Импорт тянет FFmpeg, поэтому выполняется в фоновом прогреве, а не при старте.
+    """
+    try:
+        from ffpyplayer.player import MediaPlayer
+    except ImportError:
+        print("Warning: ffpyplayer not found. Sound disabled.")
+        return None
+    return MediaPlayer
+
+
+def encode_meta(meta, overlays_json):
+    """JSON метаданных кадра; overlays вклеивается готовым фрагментом (последним полем)"""
+    body = json.dumps(meta)
+    return (body[:-1] + ', "overlays": ' + overlays_json + '}').encode('utf-8')
+
+
+# Каждому игроку - свой процесс инференса
+MAX_PLAYERS = 4
 
 
 # --- СОСТОЯНИЯ ---
@@ -28,59 +59,138 @@ class GameState(Enum):
     PAUSED = "PAUSED"  # Пауза
     FINISHED = "FINISHED"  # Уровень кончился
     PROCESSING = "PROCESSING"  # Оцифровка видео
+    LOADING = "LOADING"  # Уровень готовится в фоне (команда load)
 
 
 class GameEngine:
     # УБРАЛИ json_path и video_path из аргументов!
-    def __init__(self, zmq_port=5555, cmd_port=5556):
+    def __init__(self, zmq_port=5555, cmd_port=5556, camera_index=0, camera_size=(640, 480), camera_fps=30,
+                 inference_height=DEFAULT_INFERENCE_HEIGHT, pose_worker=True, pipeline_depth=2,
+                 players=1, person_detector=False, metrics=True, perf_meta=False, user_source=None,
+                 level_cache_dir=None, level_cache_bytes=DEFAULT_MAX_BYTES,
+                 frame_cache_bytes=192 * 1024 * 1024, shm_transport=False):
         # 1. Инфраструктура
-        self.engine = PoseEngine()
-        self.digitizer = VideoDigitizer()  # <--- Оцифровщик
-
-        # ZMQ
+        # Сокеты поднимаются первыми: команды обслуживаются сразу, а камера, звук и
+        # модели готовятся в фоновом прогреве (пока он идет, в meta ready=false)
         self.context = zmq.Context()
         self.pub_socket = self.context.socket(zmq.PUB)
         self.pub_socket.bind(f"tcp://127.0.0.1:{zmq_port}")
 
-        self.cmd_socket = self.context.socket(zmq.REP)
-        self.cmd_socket.bind(f"tcp://127.0.0.1:{cmd_port}")
+        # ROUTER + Poller: совместим с REQ-клиентами, команды обрабатываются сразу
+        self.commands = CommandServer(self.context, f"tcp://127.0.0.1:{cmd_port}")
+
+        # Тайминги стадий цикла (get_metrics); NullMetrics ничего не стоит
+        self.metrics = Metrics() if metrics else NullMetrics()
+        self.perf_meta = perf_meta  # компактный блок perf в каждом meta
+        self._last_user_seq = None
+        self._last_command_poll = time.perf_counter()
+        self.ready = False
+        # Граф MediaPipe из общего пула процесса; создается при первом кадре или в прогреве
+        self.engine = pose_pool().acquire()
+        self.inference_height = inference_height
+        self.pose_worker = pose_worker
+        self.pipeline_depth = pipeline_depth
+        # Конвейер позы на каждого игрока: инференс в отдельном процессе (глубина pipeline_depth)
+        # или в главном потоке; под нагрузкой governor пропускает кадры, их заполняет трекер
+        self.players = []
+        self.player_regions = None  # PlayerRegions, если игроков больше одного
+        # Оцифровка идет в отдельных процессах с пониженным приоритетом
+        self.jobs = DigitizeJobManager()
+        self.encoder = FrameEncoder(quality=50)  # JPEG в 2 потока + кеш статичных кадров
+        # Транспорт "shm" выключен, пока frontend не читает кольцо: иначе память выделяется впустую
+        self.shm_transport = shm_transport
+        self.shm_ring = None  # SharedFrameRing, если frontend выбрал транспорт "shm"
+        self.camera_size = camera_size
+        # load с mtp_path: распакованные и разобранные уровни по хешу содержимого (LRU по размеру)
+        self.level_cache = LevelCache(level_cache_dir, level_cache_bytes)
+        # Декодированные кадры референса вокруг playhead (скраббинг без повторного декодирования)
+        self.frame_cache_bytes = frame_cache_bytes
+
+        self._command_handlers = {
+            'get_state': self._cmd_get_state,
+            'load': self._cmd_load,
+            'digitize': self._cmd_digitize,
+            'digitize_status': self._cmd_digitize_status,
+            'digitize_cancel': self._cmd_digitize_cancel,
+            'list_jobs': self._cmd_list_jobs,
+            'pause': self._cmd_pause,
+            'resume': self._cmd_resume,
+            'restart': self._cmd_restart,
+            'seek': self._cmd_seek,
+            'speed': self._cmd_speed,
+            'transport': self._cmd_transport,
+            'players': self._cmd_players,
+            'get_metrics': self._cmd_get_metrics,
+            'metrics': self._cmd_metrics,
+            'stop': self._cmd_stop,
+        }
+        # Долгие операции (прогрев, load) выполняются вне главного цикла
+        self._background = ThreadPoolExecutor(max_workers=1, thread_name_prefix="engine-bg")
+        self._loads = []  # futures подготовки уровней
+        self._pending_load = None  # последний запрошенный load
+        # seek применяется один раз за опрос команд: из пачки seek (скраббинг) выполняется последний
+        self._pending_seek = None
+        self._running = False
 
         print(f"[GameEngine] Service Started. IDLE mode.")
 
         # 2. Состояние
         self.state = GameState.IDLE
         self.processing_progress = 0
+        self.last_error = ""
 
         # 3. Ресурсы
         self.cap_ref = None
-        self.cap_user = cv2.VideoCapture(0)  # Вебка всегда активна
-        self.audio_player = None
-        self.pattern_map = {}
+        # Источник пользователя всегда активен (по умолчанию вебка: читается в своем потоке,
+        # берем самый свежий кадр); user_source - видеофайл или "synthetic" для тестов без камеры.
+        # Открывается в фоновом прогреве, до этого кадров пользователя нет
+        self.cap_user = NullFrameSource()
+        self.audio_player = None  # AudioTrack уровня (звук через ffpyplayer)
+        # Главные часы (звук, если есть) и выбор кадра референса под них
+        self.clock = None
+        self.scheduler = None
+        self.patterns = None  # PatternTimeline эталона
+        self.scorer = None  # StreamingScorer по паттерну уровня
+        self.user_angles = None  # углы пользователя (порядок DEFAULT_ANGLE_TABLE)
         self.timeline = []
+        self.timeline_index = TimelineIndex()
         self.current_level_info = {}
 
         # Параметры
         self.score = 0
         self.tolerance = 25
-        self.speed = 1.0
+        self.speed = 1.0  # темп уровня (команда speed), сохраняется между уровнями
         self.current_time = 0.0
         self.target_delay = 0.033
         self.blank_frame = np.zeros((480, 640, 3), dtype=np.uint8)
         self.last_ref_frame = self.blank_frame
 
+        self._configure_players(players, person_detector)
+        # Воркеры позы (если есть) уже стартовали и грузят модели сами; здесь - то, что живет в этом процессе
+        inline_engines = [player.pipeline.backend.engine for player in self.players
+                          if not player.pipeline.backend.parallel]
+        self._warm_up = self._background.submit(self._prepare_warm_up, user_source or f"webcam:{camera_index}",
+                                                camera_size, camera_fps, inline_engines)
+
     def run(self):
         """Главный цикл"""
+        self._running = True
         try:
-            while True:
+            while self._running:
                 loop_start = time.time()
+                tick_started = self.metrics.now()
 
                 self._handle_commands()
+                self._poll_background()
+                self._poll_jobs()
 
                 # Роутер состояний
                 if self.state == GameState.IDLE:
                     self._loop_idle()
                 elif self.state == GameState.PROCESSING:
                     self._loop_processing()
+                elif self.state == GameState.LOADING:
+                    self._loop_loading()
                 elif self.state == GameState.PLAYING:
                     self._loop_playing()
                 elif self.state == GameState.PAUSED:
@@ -88,123 +198,241 @@ class GameEngine:
                 elif self.state == GameState.FINISHED:
                     self._loop_finished()
 
-                # FPS Limit
+                # FPS Limit: остаток тика ждем команды, а не спим
                 delay = 0.1 if self.state in [GameState.IDLE, GameState.FINISHED] else self.target_delay
-                process_time = time.time() - loop_start
-                sleep_time = delay - process_time
-                if sleep_time > 0:
-                    time.sleep(sleep_time)
+                self.metrics.record("loop", tick_started)
+                if time.time() - loop_start > delay:
+                    self.metrics.count("late_frames")
+                while self._running:
+                    remaining = delay - (time.time() - loop_start)
+                    if remaining <= 0:
+                        break
+                    self._handle_commands(timeout=remaining)
+                self.metrics.record("tick", tick_started)
 
         except KeyboardInterrupt:
             print("Stopping...")
         finally:
             self._cleanup()
 
-    def _handle_commands(self):
-        try:
-            cmd_bytes = self.cmd_socket.recv(flags=zmq.NOBLOCK)
-            command = json.loads(cmd_bytes.decode('utf-8'))
+    def _handle_commands(self, timeout=0.0):
+        requests = self.commands.poll(timeout)
+        polled_at = time.perf_counter()
+        if requests and self.metrics.enabled:
+            # Без ожидания команда могла пролежать в сокете с прошлого опроса (оценка сверху);
+            # при ожидании Poller просыпается сразу по приходу команды
+            self.metrics.observe("command_queue", 0.0 if timeout > 0 else (polled_at - self._last_command_poll) * 1000.0)
+        for request in requests:
+            command = request.command
             print(f"CMD received: {command}")
 
-            ctype = command.get('type')
-            response = {"status": "ok"}
-
-            if ctype == 'get_state':
-                response = {
-                    "status": "ok",
-                    "state": self.state.value,
-                    "level": self.current_level_info
-                }
-
-            elif ctype == 'load':
-                self._load_level(command)
-
-            elif ctype == 'digitize':
-                # Запуск оцифровки в потоке
-                source = command.get('source_path')
-                target = command.get('output_path')
-                threading.Thread(target=self._run_digitization, args=(source, target)).start()
-
-            elif ctype == 'pause':
-                if self.state == GameState.PLAYING:
-                    self.state = GameState.PAUSED
-                    if self.audio_player: self.audio_player.set_pause(True)
-            elif ctype == 'resume':
-                if self.state == GameState.PAUSED:
-                    self.state = GameState.PLAYING
-                    if self.audio_player: self.audio_player.set_pause(False)
-            elif ctype == 'restart':
-                if self.cap_ref:
-                    self.cap_ref.set(cv2.CAP_PROP_POS_FRAMES, 0)
-                    if self.audio_player:
-                        self.audio_player.seek(0)
-                        self.audio_player.set_pause(False)
-                    self.score = 0
-                    self.state = GameState.PLAYING
-            elif ctype == 'seek':
-                    target_time = command.get('time', 0.0)
-                    print(f"[Seek] Target: {target_time}s")
-                    if self.cap_ref:
-                        # 1. Сдвигаем позицию
-                        self.cap_ref.set(cv2.CAP_PROP_POS_MSEC, target_time * 1000.0)
-
-                        # 2. ВАЖНО: Сразу читаем кадр, чтобы применить seek и очистить буфер
-                        # Если этого не сделать, следующий read() может вернуть старый кадр
-                        ret, frame = self.cap_ref.read()
-
-                        if ret:
-                            # Корректируем время на то, куда РЕАЛЬНО попали (из-за ключевых кадров)
-                            real_time = self.cap_ref.get(cv2.CAP_PROP_POS_MSEC) / 1000.0
-                            self.current_time = real_time
-
-                            self.last_ref_frame = frame
-
-                            # Синхрон аудио
-                            if self.audio_player:
-                                self.audio_player.seek(real_time)
-
-                            # 3. Если мы на ПАУЗЕ, нужно принудительно обновить картинку в UI
-                            if self.state == GameState.PAUSED or self.state == GameState.IDLE:
-                                # Берем текущий кадр с вебки (чтобы юзер не замер)
-                                _, user_frame = self.cap_user.read()
-                                if user_frame is None: user_frame = self.blank_frame
-                                user_frame = cv2.flip(user_frame, 1)
-
-                                # Отправляем обновление
-                                self._send_frame(frame, user_frame, "SEEK")
-                        else:
-                            print("[Seek] Failed to read frame at target time")
-
-                    # Если референсного видео нет, просто двигаем время
-                    else:
-                        self.current_time = target_time
-            elif ctype == 'stop':
-                raise KeyboardInterrupt
-
-            self.cmd_socket.send_json(response)
-        except zmq.Again:
-            pass
-        except Exception as e:
-            print(f"Cmd Error: {e}")
+            handler = self._command_handlers.get(command.get('type'))
             try:
-                self.cmd_socket.send_json({"status": "error", "msg": str(e)})
-            except:
-                pass
-
-    # --- ЛОГИКА ОЦИФРОВКИ ---
-    def _run_digitization(self, source, target):
-        self.state = GameState.PROCESSING
-        self.processing_progress = 0
+                response = handler(command) if handler else None
+            except Exception as e:
+                print(f"Cmd Error: {e}")
+                response = {"status": "error", "msg": str(e)}
+            self.commands.reply(request, response or {"status": "ok"})
+            self.metrics.record("command", polled_at)
+        if self._pending_seek is not None:
+            self._apply_seek(self._pending_seek)
+            self._pending_seek = None
+        self._last_command_poll = time.perf_counter()
+
+    # --- КОМАНДЫ ---
+    def _cmd_get_state(self, cmd):
+        return {
+            "status": "ok",
+            "state": self.state.value,
+            "ready": self.ready,
+            "speed": self.speed,
+            "clock": self.clock.master if self.clock else None,
+            "level": self.current_level_info
+        }
 
-        def update_p(p):
-            self.processing_progress = p
+    def _cmd_load(self, cmd):
+        # Открытие видео, разбор паттерна/таймлайна и запуск аудио - в фоне,
+        # чтобы не останавливать публикацию кадров. Готовность видна по state.
+        future = self._background.submit(self._prepare_level, cmd)
+        self._loads.append(future)
+        self._pending_load = future
+        self.state = GameState.LOADING
+
+    def _cmd_digitize(self, cmd):
+        # Задача встает в очередь и выполняется в отдельном процессе
+        options = {}
+        if cmd.get('workers'):
+            options['workers'] = int(cmd['workers'])
+        if cmd.get('keyframe_error') is not None:
+            options['keyframe_error'] = float(cmd['keyframe_error'])
+        job = self.jobs.submit(cmd.get('source_path'), cmd.get('output_path'), **options)
+
+        # Экран оцифровки показываем только если ничего не играет
+        if self.state in [GameState.IDLE, GameState.FINISHED]:
+            self.state = GameState.PROCESSING
+        return {"status": "ok", "job_id": job.id}
+
+    def _find_job(self, cmd):
+        job_id = cmd.get('job_id')
+        job = self.jobs.get(job_id) if job_id else self.jobs.active
+        if job is None:
+            raise ValueError(f"Unknown job: {job_id}" if job_id else "No active job")
+        return job
+
+    def _cmd_digitize_status(self, cmd):
+        return {"status": "ok", "job": self._find_job(cmd).to_dict()}
+
+    def _cmd_digitize_cancel(self, cmd):
+        job = self.jobs.cancel(self._find_job(cmd).id)
+        return {"status": "ok", "job": job.to_dict()}
+
+    def _cmd_list_jobs(self, cmd):
+        return {"status": "ok", "jobs": self.jobs.list()}
+
+    def _cmd_pause(self, cmd):
+        if self.state == GameState.PLAYING:
+            self.state = GameState.PAUSED
+            self.clock.pause()
+
+    def _cmd_resume(self, cmd):
+        if self.state == GameState.PAUSED:
+            self.state = GameState.PLAYING
+            self.clock.start()
+
+    def _cmd_restart(self, cmd):
+        if self.cap_ref:
+            self.cap_ref.seek_frame(0)
+            self.scheduler.reset()
+            self.clock.seek(0.0)
+            self.clock.start()
+            self.score = 0
+            for player in self.players:
+                if player.scorer: player.scorer.reset()
+            self.state = GameState.PLAYING
+
+    def _cmd_seek(self, cmd):
+        # Ответ сразу, сам seek - после разбора всех пришедших команд
+        if self._pending_seek is not None:
+            self.metrics.count("coalesced_seeks")
+        self._pending_seek = cmd
+
+    def _apply_seek(self, cmd):
+        target_time = cmd.get('time', 0.0)
+        print(f"[Seek] Target: {target_time}s")
+        started = self.metrics.now()
+        if self.cap_ref:
+            # 1. Кадр, который показывается в target_time (из кеша или от ключевого кадра);
+            #    чтение дальше продолжится со следующего кадра
+            item = self.cap_ref.seek_time(target_time)
+
+            if item is not None:
+                frame = item.frame
+                # Время кадра, в который попали (без индекса - ближайший после seek)
+                real_time = item.pos_msec / 1000.0
+                self.current_time = real_time
+
+                self.last_ref_frame = frame
+                for player in self.players:
+                    if player.scorer: player.scorer.seek()
+
+                # Часы (и звук) - на время показанного кадра, дальше кадры по ним
+                self.scheduler.reset()
+                self.clock.seek(real_time)
+
+                # 3. Если мы на ПАУЗЕ, нужно принудительно обновить картинку в UI
+                if self.state == GameState.PAUSED or self.state == GameState.IDLE:
+                    # Берем текущий кадр с вебки (чтобы юзер не замер)
+                    _, user_frame = self.cap_user.read()
+                    if user_frame is None: user_frame = self.blank_frame
+                    user_frame = cv2.flip(user_frame, 1)
+
+                    # Отправляем обновление
+                    self._send_frame(frame, user_frame, "SEEK")
+            else:
+                print("[Seek] Failed to read frame at target time")
+
+        # Если референсного видео нет, просто двигаем время
+        else:
+            self.current_time = target_time
+        self.metrics.record("seek", started)
+
+    def _cmd_transport(self, cmd):
+        return self._set_transport(cmd.get('mode', 'jpeg'))
+
+    def _cmd_players(self, cmd):
+        count = int(cmd.get('count', 1))
+        if not 1 <= count <= MAX_PLAYERS:
+            raise ValueError(f"Player count must be 1..{MAX_PLAYERS}")
+        self._configure_players(count, bool(cmd.get('detector', False)))
+        return {"status": "ok", "players": [player.id for player in self.players]}
+
+    def _cmd_get_metrics(self, cmd):
+        report = self.metrics.snapshot()
+        cache = self.cap_ref.frame_cache if self.cap_ref else None
+        if cache is not None:
+            report["frame_cache"] = {"frames": len(cache), "hits": cache.hits, "misses": cache.misses}
+        if cmd.get('reset'):
+            self.metrics.reset()
+        return {"status": "ok", "metrics": report}
+
+    def _cmd_metrics(self, cmd):
+        """Включение/выключение сбора метрик и блока perf в meta"""
+        if 'enabled' in cmd and bool(cmd['enabled']) != self.metrics.enabled:
+            self.metrics = Metrics() if cmd['enabled'] else NullMetrics()
+        if 'meta' in cmd:
+            self.perf_meta = bool(cmd['meta'])
+        return {"status": "ok", "enabled": self.metrics.enabled, "meta": self.perf_meta}
+
+    def _cmd_speed(self, cmd):
+        """Темп воспроизведения (0.5, 0.75 - для разучивания): видео и звук вместе, без смены тона"""
+        speed = float(cmd.get('value', 1.0))
+        if not SPEED_MIN <= speed <= SPEED_MAX:
+            raise ValueError(f"Speed must be {SPEED_MIN}..{SPEED_MAX}")
+        self.speed = speed
+        if self.clock:
+            self.clock.set_speed(speed)
+        return {"status": "ok", "speed": speed}
+
+    def _cmd_stop(self, cmd):
+        # Штатное завершение: ответ уходит клиенту, цикл выходит и чистит ресурсы
+        self._running = False
+
+    def _shm_frame_size(self):
+        """
+        Слот кольца под самый большой кадр сообщения: кадр захвата, кадр уровня и кадр
+        захвата, приведенный к высоте уровня (так его шлет _loop_playing)
+        """
+        sizes = [tuple(self.camera_size)]
+        if self.cap_ref is not None and all(self.cap_ref.frame_size):
+            ref_w, ref_h = self.cap_ref.frame_size
+            cam_w, cam_h = self.camera_size
+            sizes += [(ref_w, ref_h), (round(cam_w * ref_h / cam_h), ref_h)]
+        return max(sizes, key=lambda size: size[0] * size[1])
+
+    def _set_transport(self, mode):
+        """Handshake транспорта кадров: "jpeg" (по умолчанию) или "shm" (общая память)"""
+        if mode == 'shm':
+            if not self.shm_transport:
+                return {"status": "error", "msg": "Shared-memory transport is disabled (shm_transport=False)"}
+            # Повторный handshake (например, после load) пересоздает кольцо под текущие кадры
+            if self.shm_ring is not None:
+                self.shm_ring.close()
+            width, height = self._shm_frame_size()
+            self.shm_ring = SharedFrameRing(max_width=width, max_height=height)
+            return {"status": "ok", "mode": "shm", "shm": self.shm_ring.describe()}
+        if mode == 'jpeg':
+            if self.shm_ring is not None:
+                self.shm_ring.close()
+                self.shm_ring = None
+            return {"status": "ok", "mode": "jpeg"}
+        return {"status": "error", "msg": f"Unknown transport mode: {mode}"}
 
-        try:
-            self.digitizer.create_level_from_video(source, target, update_p)
-            self.state = GameState.IDLE
-            print("Digitization complete.")
-        except Exception as e:
-            print(f"Digitization failed: {e}")
+    # --- ЛОГИКА ОЦИФРОВКИ ---
+    def _poll_jobs(self):
+        self.jobs.poll()
+        active = self.jobs.active
+        self.processing_progress = active.progress if active else 0
+        if self.state == GameState.PROCESSING and not self.jobs.busy:
             self.state = GameState.IDLE
 
     def _loop_processing(self):
@@ -213,94 +441,246 @@ class GameEngine:
 
     # ------------------------
 
-    def _load_level(self, cmd):
-        self.current_level_info = {
-            "video_path": cmd.get('video_path'),
-            "timeline_path": cmd.get('timeline_path'),
-            "json_path": cmd.get('json_path')
-        }
-
+    def _prepare_level(self, cmd):
+        """
+        Фоновая часть load: открывает ресурсы уровня, не трогая состояние движка.
+        Результат применяет главный цикл в _poll_background.
+        """
         video_path = cmd.get('video_path')
         json_path = cmd.get('json_path')
+        timeline_path = cmd.get('timeline_path')
+        patterns_bin_path = cmd.get('patterns_bin_path')
+        mtp_path = cmd.get('mtp_path')
+
+        level = {
+            "info": {
+                "video_path": video_path,
+                "timeline_path": timeline_path,
+                "json_path": json_path
+            }
+        }
 
-        if self.cap_ref: self.cap_ref.release()
-        if self.audio_player: self.audio_player.close_player()
-
-        self.cap_ref = cv2.VideoCapture(video_path)
-        fps = self.cap_ref.get(cv2.CAP_PROP_FPS)
-        if fps == 0: fps = 30
-        self.target_delay = 1.0 / fps
-
-        if json_path and os.path.exists(json_path):
-            with open(json_path, 'r') as f:
-                pat = json.load(f)
-                self.pattern_map = {f"{d['timestamp']:.1f}": d['angles'] for d in pat}
+        timeline = None
+        if mtp_path:
+            # Архив напрямую: паттерн и таймлайн уже разобраны в кеше, видео читается из архива
+            cached = self.level_cache.open(mtp_path)
+            video_path, json_path, patterns_bin_path = cached.video, None, cached.patterns_bin
+            timeline = cached.timeline_events
+            seek_index = load_seek_index(cached.seek_index) if cached.seek_index else None
+            # Прежние ключи остаются (frontend читает timeline_path): пути внутри записи кеша;
+            # паттерн там - только patterns.bin, поэтому json_path = None
+            level["info"] = {"video_path": video_path, "timeline_path": cached.timeline, "json_path": None,
+                             "mtp_path": mtp_path, "cache_hit": cached.hit}
         else:
-            self.pattern_map = {}
-
-        timeline_path = cmd.get('timeline_path')
-        self.timeline = []
-        if timeline_path and os.path.exists(timeline_path):
+            # Распакованный уровень: индекс из manifest, для старых уровней - по таблицам MP4
+            level_dir = os.path.dirname(json_path or video_path or "")
+            seek_index = find_seek_index(level_dir) if level_dir else None
+            if seek_index is None and video_path:
+                seek_index = build_seek_index(video_path)
+        if not video_path:
+            raise ValueError(f"Level has no video: {mtp_path or json_path or timeline_path}")
+
+        # Референс декодируется наперед в фоновом потоке
+        level["cap_ref"] = PrefetchReader(open_video_capture(video_path), seek_index=seek_index,
+                                          frame_cache=DecodedFrameCache(self.frame_cache_bytes)).start()
+        level["fps"] = level["cap_ref"].fps or 30
+
+        # patterns.bin (если есть в manifest) читается через mmap, иначе patterns.json
+        track = load_patterns(json_path, patterns_bin_path)
+        level["patterns"] = PatternTimeline.from_track(track) if track is not None else None
+
+        if timeline is None:
+            timeline = load_timeline_events(timeline_path)
+        level["timeline"] = timeline
+        level["timeline_index"] = TimelineIndex(timeline)
+
+        media_player = load_media_player()
+        level["audio_player"] = AudioTrack(media_player, video_path, self.speed) if media_player else None
+        return level
+
+    def _prepare_warm_up(self, source_spec, camera_size, camera_fps, engines):
+        """
+        Фоновая часть старта: открывает источник пользователя, импортирует ffpyplayer
+        и mediapipe и прогревает графы, которые будут считать в этом процессе.
+        Результат применяет главный цикл в _poll_background.
+        """
+        started = time.perf_counter()
+        cap_user = open_frame_source(source_spec, *camera_size, camera_fps)
+        load_media_player()
+        self.engine.connections  # импорт mediapipe (нужен для отрисовки скелета)
+        for engine in engines:
+            engine.warm_up()
+        print(f"[GameEngine] Warm-up done in {time.perf_counter() - started:.1f}s")
+        return cap_user
+
+    def _poll_background(self):
+        """Применяет завершившиеся фоновые задачи: прогрев и загрузки уровней"""
+        # Прогрев стоит в очереди фоновых задач первым, поэтому применяется раньше любого load
+        if self._warm_up is not None and self._warm_up.done():
+            future, self._warm_up = self._warm_up, None
             try:
-                with open(timeline_path, 'r') as f:
-                    data = json.load(f)
-                    for track in data.get('tracks', []):
-                        for evt in track.get('events', []):
-                            self.timeline.append(evt)
-                    self.timeline.sort(key=lambda x: x['time'])
-                print(f"Timeline loaded: {len(self.timeline)} events")
+                self.cap_user = future.result()
             except Exception as e:
-                print(f"Error loading timeline: {e}")
-
-        if SOUND_AVAILABLE:
-            self.audio_player = MediaPlayer(video_path)
+                print(f"Warm-up failed: {e}")
+                self.last_error = f"User source unavailable: {e}"
+            self.ready = True
+
+        for future in [f for f in self._loads if f.done()]:
+            self._loads.remove(future)
+            latest = future is self._pending_load
+            if latest:
+                self._pending_load = None
+            try:
+                level = future.result()
+            except Exception as e:
+                print(f"Load failed: {e}")
+                if latest:
+                    self.last_error = f"Load failed: {e}"
+                    self.state = GameState.IDLE
+                continue
+
+            if latest:
+                self._apply_level(level)
+            else:
+                # Пока готовился этот уровень, пришел новый load
+                self._release_level(level)
+
+    def _apply_level(self, level):
+        if self.cap_ref: self.cap_ref.release()
+        if self.clock: self.clock.close()
 
+        self.current_level_info = level["info"]
+        self.cap_ref = level["cap_ref"]
+        # Кадр прошлого уровня не должен мелькнуть, пока планировщик не выдал первый кадр нового
+        self.last_ref_frame = self.blank_frame
+        self.target_delay = 1.0 / level["fps"]
+        for player in self.players:
+            player.pipeline.set_frame_time(self.target_delay * 1000.0)
+        self.patterns = level["patterns"]
+        self._create_scorers()
+        self.timeline = level["timeline"]
+        self.timeline_index = level["timeline_index"]
+        self.audio_player = level["audio_player"]
+        self.clock = PlaybackClock(self.audio_player, self.speed)
+        self.scheduler = FrameScheduler(self.cap_ref, self.target_delay)
+        self.clock.start()
+
+        self.last_error = ""
         self.score = 0
         self.state = GameState.PLAYING
 
-    def _loop_idle(self):
-        self._send_frame(self.blank_frame, self.blank_frame, "Ready")
-
-    def _loop_playing(self):
-        ret_ref, frame_ref = self.cap_ref.read()
-        ret_user, frame_user = self.cap_user.read()
+    @staticmethod
+    def _release_level(level):
+        level["cap_ref"].release()
+        if level["audio_player"]: level["audio_player"].close()
 
-        if not ret_ref:
-            self.state = GameState.FINISHED
-            return
+    def _loop_loading(self):
+        self._send_frame(self.blank_frame, self.blank_frame, "Loading level...")
 
-        self.last_ref_frame = frame_ref
-
-        if not ret_user:
-            frame_user = self.blank_frame
+    def _loop_idle(self):
+        self._send_frame(self.blank_frame, self.blank_frame, self.last_error or ("Ready" if self.ready else "Starting..."))
 
-        if self.audio_player:
-            _, val = self.audio_player.get_frame()
-            if val == 'eof':
+    def _loop_playing(self):
+        # Кадры уже прочитаны фоновыми потоками - здесь нет ожидания устройства
+        metrics = self.metrics
+        started = metrics.now()
+        # Какой кадр референса должен быть на экране - решают главные часы, а не число тиков
+        position = self.clock.position()
+        ref_item, skipped, late = self.scheduler.advance(position, timeout=self.target_delay)
+        user_item = self.cap_user.read_frame()
+        metrics.record("capture", started)
+
+        if ref_item is None:
+            if self.cap_ref.eof:
                 self.state = GameState.FINISHED
                 return
+            # Прежний кадр остается на экране: декодер не успел или (при speed < 1) следующий еще не наступил
+            metrics.count("dropped_frames" if late else "held_frames")
+        else:
+            if skipped:
+                metrics.count("skipped_frames", skipped)  # отставали от часов
+            metrics.observe("drift", (ref_item.pos_msec / 1000.0 - position) * 1000.0)
+            self.last_ref_frame = ref_item.frame
 
-        frame_user = cv2.flip(frame_user, 1)
-        h_ref, w_ref = frame_ref.shape[:2]
-        h_user, w_user = frame_user.shape[:2]
-        if h_user > 0:
-            scale = h_ref / h_user
-            frame_user = cv2.resize(frame_user, (int(w_user * scale), h_ref))
+        if user_item is not None:
+            if user_item.seq == self._last_user_seq:
+                metrics.count("stale_user_frames")  # камера не дала новый кадр с прошлого тика
+            self._last_user_seq = user_item.seq
 
-        self.current_time = self.cap_ref.get(cv2.CAP_PROP_POS_MSEC) / 1000.0
+        frame_ref = self.last_ref_frame
+        frame_user = user_item.frame if user_item is not None else self.blank_frame
 
-        results = self.engine.process_frame(frame_user)
-        lms = self.engine.get_3d_landmarks(results)
+        # Кадр пользователя остается в разрешении камеры: MediaPipe получает уменьшенную
+        # копию (inference_height), а до высоты референса его растягивает уже encoder
+        frame_user = cv2.flip(frame_user, 1)
+        display_height = frame_ref.shape[0]
+        display_scale = display_height / frame_user.shape[0]
 
-        status_text = ""
-        # Сюда можно вернуть логику сравнения углов, когда будем готовы
+        self.current_time = max(position, 0.0)
 
-        if results.pose_landmarks:
-            self.engine.mp_draw.draw_landmarks(
-                frame_user, results.pose_landmarks, self.engine.mp_pose.POSE_CONNECTIONS
-            )
+        # Каждый игрок - в своей области кадра, инференс в своем воркере (параллельно);
+        # сравнение с эталоном - окно DTW по индексу паттерна
+        captured_at = user_item.captured_at if user_item else time.monotonic()
+        regions = self.player_regions.regions(frame_user) if self.player_regions else None
+        scored = play_frame(self.players, frame_user, captured_at, self.current_time, self.timeline_index,
+                            metrics, regions)
+        self.user_angles = self.players[0].angles
 
-        self._send_frame(frame_ref, frame_user, status_text)
+        status_text = ""
+        if scored and self.scorer is not None:
+            self.score = self.scorer.score
+            if self.scorer.last:
+                status_text = self.scorer.last["rating"]
+
+        draw_players(self.engine, frame_user, self.players, display_scale, metrics)
+
+        self._send_frame(frame_ref, frame_user, status_text, user_height=display_height)
+
+    def _configure_players(self, count, person_detector=False):
+        """Пересоздает игроков: конвейер позы (свой воркер и PoseEngine) и скоринг на каждого"""
+        detector = None
+        if count > 1 and person_detector:
+            if PersonDetector.available():
+                detector = PersonDetector()
+            else:
+                print("[GameEngine] Person detector unavailable in this OpenCV build, using lanes")
+
+        for player in self.players:
+            player.close()
+        if self.player_regions is not None:
+            self.player_regions.close()
+        self.players = [Player(i + 1, self._create_pipeline(i)) for i in range(count)]
+        self.player_regions = PlayerRegions(count, detector) if count > 1 else None
+        self._create_scorers()
+
+    def _create_pipeline(self, index):
+        complexity = self.engine.model_complexity
+
+        def inline():
+            # У первого игрока общий PoseEngine, остальным нужен свой (трекинг MediaPipe хранит состояние)
+            if index == 0:
+                return InlinePoseBackend(self.engine, self.inference_height)
+            pool = pose_pool()
+            return InlinePoseBackend(pool.acquire(model_complexity=complexity), self.inference_height, pool=pool)
+
+        backend = None
+        if self.pose_worker:
+            try:
+                backend = ProcessPoseBackend(self.inference_height, complexity, self.pipeline_depth)
+            except Exception as e:
+                print(f"[GameEngine] Pose worker unavailable, inference stays inline: {e}")
+        pipeline = PosePipeline(backend or inline(), InferenceGovernor(complexity=complexity),
+                                LandmarkTracker(), fallback=inline)
+        pipeline.set_frame_time(self.target_delay * 1000.0)
+        return pipeline
+
+    def _create_scorers(self):
+        for player in self.players:
+            player.scorer = None
+            if self.patterns is not None:
+                player.scorer = StreamingScorer(self.patterns, DEFAULT_ANGLE_TABLE.names, tolerance=self.tolerance)
+        # Счет и статус в meta - по первому игроку (совместимость с одиночным режимом)
+        self.scorer = self.players[0].scorer if self.players else None
 
     def _loop_paused(self):
         # 1. Читаем камеру (чтобы пользователь оставался "живым")
@@ -316,37 +696,79 @@ class GameEngine:
     def _loop_finished(self):
         self._send_frame(self.blank_frame, self.blank_frame, "LEVEL COMPLETE")
 
-    def _send_frame(self, ref, user, status):
-        ret1, buf_ref = cv2.imencode('.jpg', ref, [int(cv2.IMWRITE_JPEG_QUALITY), 50])
-        ret2, buf_user = cv2.imencode('.jpg', user, [int(cv2.IMWRITE_JPEG_QUALITY), 50])
-
-        active_overlays = []
-        for evt in getattr(self, 'timeline', []):
-            t_start = evt.get('time', 0)
-            t_end = t_start + evt.get('duration', 0)
-            if t_start <= self.current_time < t_end:
-                active_overlays.append(evt)
-
+    def _send_frame(self, ref, user, status, user_height=None):
         meta = {
             "state": self.state.value,
+            "ready": self.ready,
             "score": self.score,
             "time": self.current_time,
             "status": status,
             "progress": self.processing_progress,
-            "overlays": active_overlays
+            "speed": self.speed,
         }
+        if self.scorer is not None:
+            meta["scoring"] = self.scorer.summary()
+        if self.state == GameState.PLAYING:
+            meta["inference"] = self.players[0].pipeline.governor.meta()
+            if len(self.players) > 1:
+                meta["players"] = [player.to_meta() for player in self.players]
+        if self.perf_meta and self.metrics.enabled:
+            meta["perf"] = self.metrics.compact()
+
+        started = self.metrics.now()
+        if self.shm_ring is not None:
+            # Сырые кадры в общую память, в сообщении только номера слотов
+            buf_ref, buf_user = self._write_shm(ref, fit_height(user, user_height), meta)
+        else:
+            buf_ref, buf_user = self.encoder.encode_pair(ref, user, user_height)
+        self.metrics.record("encode", started)
 
+        # Оверлеи берем из скомпилированного таймлайна уже сериализованными
+        overlays_json = self.timeline_index.active_json(self.current_time)
+
+        started = self.metrics.now()
         self.pub_socket.send_multipart([
             b"video",
-            json.dumps(meta).encode('utf-8'),
-            buf_ref.tobytes(),
-            buf_user.tobytes()
+            encode_meta(meta, overlays_json),
+            buf_ref,
+            buf_user
         ])
+        self.metrics.record("publish", started)
+
+    def _write_shm(self, ref, user, meta):
+        desc_ref = self.shm_ring.write(ref)
+        desc_user = self.shm_ring.write(user)
+        meta["shm"] = {"ref": desc_ref, "user": desc_user}
+
+        # Кадр, не влезший в слот (дескриптор None), уходит обычным JPEG
+        buf_ref = buf_user = b""
+        if desc_ref is None or desc_user is None:
+            jpg_ref, jpg_user = self.encoder.encode_pair(ref, user)
+            buf_ref = jpg_ref if desc_ref is None else b""
+            buf_user = jpg_user if desc_user is None else b""
+        return buf_ref, buf_user
 
     def _cleanup(self):
+        # Дожидаемся фоновых загрузок и освобождаем то, что не успели применить
+        self._background.shutdown(wait=True)
+        if self._warm_up is not None and self._warm_up.exception() is None:
+            self._warm_up.result().release()
+        for future in self._loads:
+            if future.exception() is None:
+                self._release_level(future.result())
+        self._loads = []
         if self.cap_ref: self.cap_ref.release()
         self.cap_user.release()
-        if self.audio_player: self.audio_player.close_player()
+        if self.clock: self.clock.close()
+        self.encoder.close()
+        self.jobs.close()
+        for player in self.players:
+            player.close()
+        if self.player_regions is not None:
+            self.player_regions.close()
+        pose_pool().release(self.engine)
+        pose_pool().close()
+        if self.shm_ring: self.shm_ring.close()
         self.pub_socket.close()
-        self.cmd_socket.close()
+        self.commands.close()
         self.context.term()
@@ -31,4 +31,85 @@ def calculate_distance(p1: list, p2: list) -> float:
     """
     a = np.array(p1)
     b = np.array(p2)
-    return np.linalg.norm(a - b)
\ No newline at end of file
+    return np.linalg.norm(a - b)
+
+# --- ПАКЕТНЫЙ РАСЧЕТ УГЛОВ ---
+
+# Индексы MediaPipe Pose (33 точки)
+LEFT_SHOULDER, RIGHT_SHOULDER = 11, 12
+LEFT_ELBOW, RIGHT_ELBOW = 13, 14
+LEFT_WRIST, RIGHT_WRIST = 15, 16
+LEFT_HIP, RIGHT_HIP = 23, 24
+LEFT_KNEE, RIGHT_KNEE = 25, 26
+LEFT_ANKLE, RIGHT_ANKLE = 27, 28
+
+# Виртуальные точки (середины пар), дописываются после 33 реальных
+NUM_LANDMARKS = 33
+VIRTUAL_POINTS = {
+    'MID_SHOULDER': (LEFT_SHOULDER, RIGHT_SHOULDER),
+    'MID_HIP': (LEFT_HIP, RIGHT_HIP),
+    'MID_KNEE': (LEFT_KNEE, RIGHT_KNEE),
+}
+MID_SHOULDER, MID_HIP, MID_KNEE = range(NUM_LANDMARKS, NUM_LANDMARKS + len(VIRTUAL_POINTS))
+
+# Таблица углов: имя -> (a, b, c), b - вершина угла.
+# Новый сустав = новая строка здесь, без изменений в циклах.
+JOINT_ANGLES = {
+    'left_elbow': (LEFT_SHOULDER, LEFT_ELBOW, LEFT_WRIST),
+    'right_elbow': (RIGHT_SHOULDER, RIGHT_ELBOW, RIGHT_WRIST),
+    'left_shoulder': (LEFT_HIP, LEFT_SHOULDER, LEFT_ELBOW),
+    'right_shoulder': (RIGHT_HIP, RIGHT_SHOULDER, RIGHT_ELBOW),
+    'left_hip': (LEFT_SHOULDER, LEFT_HIP, LEFT_KNEE),
+    'right_hip': (RIGHT_SHOULDER, RIGHT_HIP, RIGHT_KNEE),
+    'left_knee': (LEFT_HIP, LEFT_KNEE, LEFT_ANKLE),
+    'right_knee': (RIGHT_HIP, RIGHT_KNEE, RIGHT_ANKLE),
+    'torso': (MID_SHOULDER, MID_HIP, MID_KNEE),
+}
+
+
+class AngleTable:
+    """Таблица троек, один раз превращенная в массивы индексов"""
+
+    def __init__(self, joints=None):
+        joints = JOINT_ANGLES if joints is None else joints
+        self.names = list(joints)
+        triples = np.array([joints[name] for name in self.names], dtype=np.intp).reshape(-1, 3)
+        self.a, self.b, self.c = triples[:, 0], triples[:, 1], triples[:, 2]
+        self.needs_virtual = bool(triples.size) and int(triples.max()) >= NUM_LANDMARKS
+
+    def __len__(self):
+        return len(self.names)
+
+    def to_dict(self, angles):
+        """Строка углов (J,) -> {сустав: угол}, NaN пропускаются"""
+        return {name: v for name, v in zip(self.names, np.asarray(angles).tolist()) if v == v}
+
+
+DEFAULT_ANGLE_TABLE = AngleTable()
+
+
+def add_virtual_points(landmarks):
+    """(..., 33, 3) -> (..., 33 + V, 3) с серединами пар из VIRTUAL_POINTS"""
+    mids = [(landmarks[..., i, :] + landmarks[..., j, :]) * 0.5 for i, j in VIRTUAL_POINTS.values()]
+    return np.concatenate([landmarks, np.stack(mids, axis=-2)], axis=-2)
+
+
+def calculate_angles_batch(landmarks, table=DEFAULT_ANGLE_TABLE):
+    """
+    Все углы таблицы за один векторный проход.
+    landmarks: (frames, 33, 3) или (33, 3) - координаты [x, y, z]
+    Возвращает (frames, J) или (J,) в градусах; NaN для вырожденных векторов.
+    """
+    pts = np.asarray(landmarks, dtype=np.float64)
+    if table.needs_virtual:
+        pts = add_virtual_points(pts)
+
+    b = pts[..., table.b, :]
+    ba = pts[..., table.a, :] - b
+    bc = pts[..., table.c, :] - b
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        cosine = np.einsum('...k,...k->...', ba, bc) / (
+            np.linalg.norm(ba, axis=-1) * np.linalg.norm(bc, axis=-1)
+        )
+    return np.degrees(np.arccos(np.clip(cosine, -1.0, 1.0)))
@@ -0,0 +1,265 @@
+# core/jobs.py
+"""
+Менеджер задач оцифровки.
+
+Каждая задача выполняется в отдельном процессе с пониженным приоритетом,
+поэтому MediaPipe digitizer'а не конкурирует с игровым циклом за GIL.
+Задачи стоят в ограниченной очереди и выполняются по одной; у каждой есть
+id, прогресс и статус. Главный цикл вызывает poll() каждый тик.
+
+Отмена кооперативная и не блокирует вызывающего (главный цикл игры): cancel()
+выставляет cancel-Event задачи и переводит ее в cancelling, digitizer проверяет
+Event на каждом кадре (и в воркерах пула) и закрывает пул процессов штатно.
+Завершает отмену poll(): когда процесс вышел - или, если он не вышел за
+cancel_timeout (например, еще импортирует MediaPipe), после того как он убит
+вместе со всем деревом (у каждой задачи своя группа процессов).
+
+Отмена удаляет и недописанный архив, и контрольные точки digitizer'а; после
+сбоя контрольные точки остаются, и повторный digitize в тот же output_path
+продолжает с них (см. core/mtp_writer.py).
+"""
+import multiprocessing
+import os
+import queue
+import signal
+import subprocess
+import time
+import uuid
+from collections import OrderedDict
+
+from backend.core.mtp_writer import discard_partial
+
+QUEUED = "queued"
+RUNNING = "running"
+CANCELLING = "cancelling"
+DONE = "done"
+FAILED = "failed"
+CANCELLED = "cancelled"
+
+FINISHED_STATES = (DONE, FAILED, CANCELLED)
+
+
+def _lower_priority():
+    """Понижает приоритет текущего процесса (Linux/macOS: nice, Windows: BELOW_NORMAL)"""
+    try:
+        if hasattr(os, 'nice'):
+            os.nice(10)
+        else:
+            import ctypes
+            BELOW_NORMAL_PRIORITY_CLASS = 0x4000
+            kernel32 = ctypes.windll.kernel32
+            kernel32.SetPriorityClass(kernel32.GetCurrentProcess(), BELOW_NORMAL_PRIORITY_CLASS)
+    except Exception as e:
+        print(f"[Jobs] Could not lower priority: {e}")
+
+
+def _job_main(target, *args):
+    """Точка входа дочернего процесса: своя группа процессов, затем сама задача"""
+    if hasattr(os, 'setpgrp'):
+        # Пул и Manager digitizer'а наследуют группу - _kill_tree убивает их вместе с задачей
+        os.setpgrp()
+    target(*args)
+
+
+def _kill_tree(process):
+    """Убивает процесс задачи и всех его потомков (пул воркеров, Manager)"""
+    try:
+        if hasattr(os, 'killpg'):
+            os.killpg(process.pid, signal.SIGKILL)
+        else:
+            subprocess.run(["taskkill", "/F", "/T", "/PID", str(process.pid)], capture_output=True)
+    except OSError:
+        pass  # группы уже нет (или процесс не успел ее создать)
+    if process.is_alive():
+        process.kill()
+
+
+def _run_digitize_job(job_id, source, output, options, events, cancel):
+    """Задача оцифровки (target менеджера по умолчанию)"""
+    _lower_priority()
+    try:
+        from backend.core.digitizer import DigitizeCancelled, VideoDigitizer
+
+        def on_progress(percent):
+            events.put((job_id, "progress", percent))
+
+        report = VideoDigitizer().create_level_from_video(source, output, on_progress, cancel_event=cancel,
+                                                          **options)
+        events.put((job_id, DONE, report))
+    except DigitizeCancelled:
+        pass  # задачу уже завершил cancel() в родителе
+    except Exception as e:
+        events.put((job_id, FAILED, str(e)))
+
+
+class DigitizeJob:
+    def __init__(self, source, output, options=None):
+        self.id = uuid.uuid4().hex[:8]
+        self.source = source
+        self.output = output
+        self.options = options or {}
+        self.status = QUEUED
+        self.progress = 0
+        self.error = None
+        self.result = None  # отчет сжатия паттерна (digitize с keyframe_error)
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.process = None
+        self.cancel_event = None
+        self.cancel_deadline = None  # time.monotonic(), после которого процесс убивается
+        self.killed = False
+
+    def to_dict(self):
+        return {
+            "job_id": self.id,
+            "source_path": self.source,
+            "output_path": self.output,
+            "status": self.status,
+            "progress": self.progress,
+            "error": self.error,
+            "result": self.result,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+        }
+
+
+class DigitizeJobManager:
+    def __init__(self, max_queued=4, keep_finished=20, target=_run_digitize_job, cancel_timeout=5.0):
+        """target(job_id, source, output, options, events, cancel) - тело задачи в дочернем процессе"""
+        self.max_queued = max_queued
+        self.keep_finished = keep_finished
+        self.cancel_timeout = cancel_timeout
+        self._target = target
+        # spawn: в родителе работают потоки и сокеты ZMQ, fork их небезопасно копирует
+        self._mp = multiprocessing.get_context("spawn")
+        self._events = self._mp.Queue()
+        self._jobs = OrderedDict()
+        self._queue = []
+        self.active = None
+
+    @property
+    def busy(self):
+        return self.active is not None or bool(self._queue)
+
+    def submit(self, source, output, **options):
+        if not source or not output:
+            raise ValueError("source_path and output_path are required")
+        if len(self._queue) >= self.max_queued:
+            raise RuntimeError(f"Digitize queue is full ({self.max_queued} jobs)")
+        job = DigitizeJob(source, output, options)
+        self._jobs[job.id] = job
+        self._queue.append(job)
+        self._start_next()
+        return job
+
+    def get(self, job_id):
+        return self._jobs.get(job_id)
+
+    def list(self):
+        return [job.to_dict() for job in self._jobs.values()]
+
+    def cancel(self, job_id):
+        job = self._jobs.get(job_id)
+        if job is None:
+            raise ValueError(f"Unknown job: {job_id}")
+        if job.status == QUEUED:
+            self._queue.remove(job)
+            self._finish(job, CANCELLED)
+        elif job.status == RUNNING:
+            # Не ждем процесс здесь: остановку и уборку доводит poll()
+            job.cancel_event.set()
+            job.cancel_deadline = time.monotonic() + self.cancel_timeout
+            job.status = CANCELLING
+        return job
+
+    def poll(self):
+        """Разбирает события дочерних процессов и запускает следующую задачу"""
+        # Снимок до чтения очереди: все, что процесс успел отправить перед выходом, уже в ней
+        exited = self.active is not None and not self.active.process.is_alive()
+        while True:
+            try:
+                job_id, kind, value = self._events.get_nowait()
+            except queue.Empty:
+                break
+            job = self._jobs.get(job_id)
+            if job is None or job.status not in (RUNNING, CANCELLING):
+                continue
+            if job.status == CANCELLING and kind != DONE:
+                continue  # отмена опоздала, только если задача успела закончиться
+            if kind == "progress":
+                job.progress = value
+            elif kind == DONE:
+                job.progress = 100
+                job.result = value
+                self._finish(job, DONE)
+            elif kind == FAILED:
+                job.error = value
+                self._finish(job, FAILED)
+
+        job = self.active
+        if exited and job.status == RUNNING:
+            # Процесс умер, не отчитавшись (например, упал MediaPipe)
+            self._finish(job, FAILED)
+            job.error = job.error or f"Worker exited with code {job.process.exitcode}"
+            _kill_tree(job.process)  # воркеры пула не должны дописывать контрольные точки
+            discard_partial(job.output, keep_checkpoints=True)
+
+        if job is not None and job.status == CANCELLING:
+            if job.process.is_alive() and not job.killed and time.monotonic() >= job.cancel_deadline:
+                _kill_tree(job.process)
+                job.killed = True
+                # Убитый процесс мог оборвать запись в очередь событий на середине
+                self._reset_events()
+            if not job.process.is_alive():
+                discard_partial(job.output)
+                self._finish(job, CANCELLED)
+
+        if self.active is not None and self.active.status in FINISHED_STATES:
+            self.active.process.join(timeout=1)
+            self.active = None
+        self._start_next()
+
+    def _start_next(self):
+        if self.active is not None or not self._queue:
+            return
+        job = self._queue.pop(0)
+        job.cancel_event = self._mp.Event()
+        job.process = self._mp.Process(
+            target=_job_main,
+            args=(self._target, job.id, job.source, job.output, job.options, self._events, job.cancel_event),
+            name=f"digitize-{job.id}",
+            # Не daemon: digitizer с workers > 1 сам запускает пул процессов
+            daemon=False,
+        )
+        job.status = RUNNING
+        job.started_at = time.time()
+        job.process.start()
+        self.active = job
+
+    def _reset_events(self):
+        self._events.close()
+        self._events = self._mp.Queue()
+
+    def _finish(self, job, status):
+        job.status = status
+        job.finished_at = time.time()
+        # Храним ограниченную историю завершенных задач
+        finished = [j for j in self._jobs.values() if j.status in FINISHED_STATES]
+        for old in finished[:max(0, len(finished) - self.keep_finished)]:
+            del self._jobs[old.id]
+
+    def close(self):
+        """Отменяет все задачи и дожидается остановки текущей (при выходе можно ждать)"""
+        for job in list(self._queue):
+            self.cancel(job.id)
+        if self.active is not None:
+            if self.active.status == RUNNING:
+                self.cancel(self.active.id)
+            self.active.cancel_deadline = min(self.active.cancel_deadline or 0.0,
+                                              time.monotonic() + self.cancel_timeout)
+            while self.active is not None:
+                self.poll()
+                time.sleep(0.02)
+        self._events.close()
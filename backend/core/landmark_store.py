@@ -0,0 +1,97 @@
+# core/landmark_store.py
+"""
+Сырые landmarks позы уровня - чтобы новые углы и признаки считались без
+повторного инференса MediaPipe по видео.
+
+Digitizer сохраняет в .mtp (член `landmarks.bin`) мировые координаты всех 33
+точек и их visibility на каждом кадре, где поза найдена. Углы паттерна из них
+восстанавливаются точно: world хранится в float32 - как его отдает MediaPipe.
+
+Формат члена `landmarks.bin` (little-endian):
+    magic      4s       b"MTLM"
+    version    uint16   1
+    reserved   uint16   0
+    n_frames   uint32   кадров с позой
+    n_points   uint32   33
+    fps        float64  fps видео (время кадра = frame / fps)
+    frames     uint32[n_frames]               номера кадров видео, по возрастанию
+    world      float32[n_frames][n_points][3] x, y, z в метрах (pose_world_landmarks)
+    visibility float16[n_frames][n_points]
+
+Массивы читаются без копирования (np.frombuffer поверх mmap/bytes).
+"""
+import mmap
+import struct
+
+import numpy as np
+
+from backend.core.geometry import DEFAULT_ANGLE_TABLE, calculate_angles_batch
+
+LANDMARKS_BIN_NAME = "landmarks.bin"
+MAGIC = b"MTLM"
+VERSION = 1
+_HEADER = struct.Struct("<4sHHIId")
+
+# Кадров за один шаг расчета углов (память не зависит от длины уровня)
+DERIVE_BLOCK_FRAMES = 4096
+
+
+class LandmarkTrack:
+    """frames (N,), world (N, P, 3), visibility (N, P) - кадры, где поза найдена"""
+
+    def __init__(self, frames, world, visibility, fps):
+        self.frames = frames
+        self.world = world
+        self.visibility = visibility
+        self.fps = fps
+
+    def __len__(self):
+        return len(self.frames)
+
+    @property
+    def n_points(self):
+        return self.world.shape[1]
+
+    def angle_blocks(self, table=DEFAULT_ANGLE_TABLE, rows=DERIVE_BLOCK_FRAMES):
+        """(frames, angles (k, J)) блоками по rows кадров: углы таблицы из world"""
+        for first in range(0, len(self.frames), rows):
+            yield (self.frames[first:first + rows],
+                   calculate_angles_batch(self.world[first:first + rows], table))
+
+
+def encode_landmark_header(n_frames, n_points, fps):
+    """Заголовок landmarks.bin; за ним идут массивы (так его пишет и потоковый writer .mtp)"""
+    return _HEADER.pack(MAGIC, VERSION, 0, n_frames, n_points, float(fps))
+
+
+def encode_landmark_track(track):
+    return b"".join((
+        encode_landmark_header(len(track), track.n_points, track.fps),
+        np.asarray(track.frames).astype('<u4').tobytes(),
+        np.asarray(track.world, dtype='<f4').tobytes(),
+        np.asarray(track.visibility).astype('<f2').tobytes(),
+    ))
+
+
+def decode_landmark_track(data, offset=0):
+    """LandmarkTrack поверх буфера (data[offset:] - член landmarks.bin), без копирования"""
+    magic, version, _, n_frames, n_points, fps = _HEADER.unpack_from(data, offset)
+    if magic != MAGIC:
+        raise ValueError("Not a landmark track")
+    if version != VERSION:
+        raise ValueError(f"Unsupported landmark track version: {version}")
+    offset += _HEADER.size
+    frames = np.frombuffer(data, dtype='<u4', count=n_frames, offset=offset)
+    offset += 4 * n_frames
+    world = np.frombuffer(data, dtype='<f4', count=n_frames * n_points * 3, offset=offset)
+    offset += 12 * n_frames * n_points
+    visibility = np.frombuffer(data, dtype='<f2', count=n_frames * n_points, offset=offset)
+    return LandmarkTrack(frames, world.reshape(n_frames, n_points, 3),
+                         visibility.reshape(n_frames, n_points), fps)
+
+
+def load_landmark_track(path, offset=0):
+    """Трек из файла через mmap; offset - начало члена (несжатый член прямо в .mtp)"""
+    with open(path, 'rb') as f:
+        data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    return decode_landmark_track(data, offset)
@@ -0,0 +1,260 @@
+# core/level_cache.py
+"""
+Загрузка .mtp напрямую (load с mtp_path) через дисковый кеш распакованных уровней.
+
+Ключ записи - хеш содержимого архива, посчитанный по центральному каталогу ZIP
+(имена, CRC32 и размеры членов): он не зависит от пути и времени файла и
+не требует читать видео целиком.
+
+Запись кеша root/<hash>/:
+- manifest.json, timeline.json и остальные файлы уровня (картинки оверлеев из
+  assets/ и т.п.) - как в архиве, по тем же относительным путям: frontend
+  разрешает пути таймлайна относительно timeline.json;
+- patterns.bin - декодированные массивы паттерна (из архива или собранные из
+  patterns.json при первой загрузке), читается через mmap;
+- timeline_events.json - таймлайн, уже сведенный в отсортированный список событий;
+- seek_index.bin - индекс кадров видео (из архива или построенный по MP4 при первой загрузке);
+- entry.json - служебное; его mtime - момент последнего использования (LRU).
+
+Видео: член, записанный без сжатия (ZIP_STORED), читается прямо из архива через
+протокол FFmpeg subfile по смещению данных; сжатое видео (старые уровни с
+DEFLATE) извлекается в запись один раз.
+
+Пути в manifest нормализуются ("./assets/video.mp4" - это член "assets/video.mp4").
+
+Суммарный размер кеша ограничен max_bytes: после добавления записи удаляются
+самые давно использованные (текущая - никогда).
+"""
+import hashlib
+import json
+import os
+import posixpath
+import shutil
+import struct
+import tempfile
+import threading
+import time
+import zipfile
+
+import cv2
+
+from backend.core.pattern_store import PATTERNS_BIN_NAME, PatternTrack, encode_pattern_track
+from backend.core.seek_index import SEEK_INDEX_NAME, SeekIndex, build_seek_index, encode_seek_index
+from backend.core.timeline_index import load_timeline_events
+
+DEFAULT_MAX_BYTES = 2 * 1024 ** 3
+ENTRY_NAME = "entry.json"
+TIMELINE_EVENTS_NAME = "timeline_events.json"
+# Версия раскладки записи: при изменении старые записи просто не находятся
+CACHE_LAYOUT = 3
+
+_LOCAL_HEADER = struct.Struct('<4s22xHH')  # сигнатура, ..., длина имени, длина extra
+
+
+def default_cache_dir():
+    return os.environ.get("MOTION_LEVEL_CACHE") or os.path.join(tempfile.gettempdir(), "motion_level_cache")
+
+
+def archive_hash(zf):
+    """Хеш содержимого архива по центральному каталогу (CRC32 уже посчитаны при упаковке)"""
+    digest = hashlib.sha1(f"layout{CACHE_LAYOUT}".encode())
+    for info in sorted(zf.infolist(), key=lambda i: i.filename):
+        digest.update(f"{info.filename}\0{info.CRC:08x}\0{info.file_size}\n".encode('utf-8'))
+    return digest.hexdigest()
+
+
+def member_name(path):
+    """Имя члена архива для пути из manifest ("./assets/a.png" -> "assets/a.png")"""
+    if not path:
+        return None
+    return posixpath.normpath(path.replace('\\', '/')).lstrip('/')
+
+
+def stored_member_span(path, info):
+    """(offset, size) данных несжатого члена внутри файла архива"""
+    with open(path, 'rb') as f:
+        f.seek(info.header_offset)
+        signature, name_len, extra_len = _LOCAL_HEADER.unpack(f.read(_LOCAL_HEADER.size))
+    if signature != b'PK\x03\x04':
+        raise ValueError(f"Bad local header for {info.filename}")
+    offset = info.header_offset + _LOCAL_HEADER.size + name_len + extra_len
+    return offset, info.file_size
+
+
+def subfile_url(path, offset, size):
+    """URL FFmpeg, читающий байты [offset, offset + size) файла как отдельный файл"""
+    return f"subfile,,start,{offset},end,{offset + size},,:{os.path.abspath(path)}"
+
+
+def open_video_capture(source):
+    """cv2.VideoCapture для пути или subfile-URL (его понимает только бэкенд FFmpeg)"""
+    if source.startswith("subfile,"):
+        return cv2.VideoCapture(source, cv2.CAP_FFMPEG)
+    return cv2.VideoCapture(source)
+
+
+class CachedLevel:
+    def __init__(self, key, directory, manifest, video, video_in_place, patterns_bin, timeline_events,
+                 seek_index, hit, timeline=None):
+        self.key = key
+        self.dir = directory
+        self.manifest = manifest
+        self.video = video  # путь или subfile-URL; None, если видео в архиве нет
+        self.video_in_place = video_in_place
+        self.patterns_bin = patterns_bin  # путь или None (у уровня нет паттерна)
+        self.timeline_events = timeline_events
+        self.timeline = timeline  # путь к timeline.json в записи или None
+        self.seek_index = seek_index  # путь к seek_index.bin или None
+        self.hit = hit
+
+
+class LevelCache:
+    def __init__(self, root=None, max_bytes=DEFAULT_MAX_BYTES):
+        self.root = root or default_cache_dir()
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def open(self, mtp_path):
+        """Уровень из кеша (при промахе - распаковывается и разбирается один раз)"""
+        with zipfile.ZipFile(mtp_path) as zf:
+            key = archive_hash(zf)
+            with self._lock:
+                directory = os.path.join(self.root, key)
+                hit = os.path.exists(os.path.join(directory, ENTRY_NAME))
+                if hit:
+                    self.hits += 1
+                else:
+                    self.misses += 1
+                    self._build(zf, directory)
+                    self.evict(keep=key)
+
+            with open(os.path.join(directory, ENTRY_NAME), 'r') as f:
+                entry = json.load(f)
+            os.utime(os.path.join(directory, ENTRY_NAME))  # отметка использования для LRU
+
+            video = None
+            video_name = entry.get("video")
+            if video_name and entry.get("video_in_place"):
+                video = subfile_url(mtp_path, *stored_member_span(mtp_path, zf.getinfo(video_name)))
+            elif video_name:
+                video = os.path.join(directory, video_name)
+
+        with open(os.path.join(directory, TIMELINE_EVENTS_NAME), 'r') as f:
+            timeline_events = json.load(f)
+        patterns_bin = os.path.join(directory, PATTERNS_BIN_NAME) if entry.get("patterns") else None
+        seek_index = os.path.join(directory, SEEK_INDEX_NAME) if entry.get("seek_index") else None
+        timeline = os.path.join(directory, entry["timeline"]) if entry.get("timeline") else None
+        return CachedLevel(key, directory, entry["manifest"], video, bool(entry.get("video_in_place")),
+                           patterns_bin, timeline_events, seek_index, hit, timeline)
+
+    def _build(self, zf, directory):
+        """Готовит запись во временной папке и переименовывает целиком (никто не увидит половину)"""
+        os.makedirs(self.root, exist_ok=True)
+        staging = tempfile.mkdtemp(prefix=".build-", dir=self.root)
+        try:
+            manifest = json.loads(zf.read("manifest.json"))
+            files = manifest.get('files', {})
+            members = {member_name(name): name for name in zf.namelist() if not name.endswith('/')}
+            video, patterns, patterns_bin, timeline, seek_index = (
+                members.get(member_name(files.get(key)))
+                for key in ('video', 'patterns', 'patterns_bin', 'timeline', 'seek_index'))
+            zf.extract("manifest.json", staging)
+
+            # Паттерн: бинарный член как есть, иначе собираем его из patterns.json
+            has_patterns = True
+            if patterns_bin is not None:
+                with open(os.path.join(staging, PATTERNS_BIN_NAME), 'wb') as f:
+                    f.write(zf.read(patterns_bin))
+            elif patterns is not None:
+                track = PatternTrack.from_records(json.loads(zf.read(patterns)))
+                track.keyframes = manifest.get('pattern_keyframes')
+                with open(os.path.join(staging, PATTERNS_BIN_NAME), 'wb') as f:
+                    f.write(encode_pattern_track(track))
+            else:
+                has_patterns = False
+
+            timeline_path = zf.extract(timeline, staging) if timeline is not None else None
+            with open(os.path.join(staging, TIMELINE_EVENTS_NAME), 'w') as f:
+                json.dump(load_timeline_events(timeline_path), f)
+
+            # Остальные файлы уровня (assets/ и т.п.) - по своим путям, чтобы работали
+            # ссылки таймлайна вида "./assets/logo.png"
+            known = {"manifest.json", video, patterns, patterns_bin, timeline, seek_index}
+            for name in members.values():
+                if name not in known:
+                    zf.extract(name, staging)
+
+            in_place = video is not None and zf.getinfo(video).compress_type == zipfile.ZIP_STORED
+            if video is not None and not in_place:
+                zf.extract(video, staging)
+
+            has_index = self._write_seek_index(zf, seek_index, staging, video, in_place)
+            entry = {"manifest": manifest, "patterns": has_patterns, "video": video,
+                     "video_in_place": in_place, "seek_index": has_index,
+                     "timeline": os.path.relpath(timeline_path, staging) if timeline_path else None,
+                     "created": time.time()}
+            with open(os.path.join(staging, ENTRY_NAME), 'w') as f:
+                json.dump(entry, f)
+
+            try:
+                os.rename(staging, directory)
+            except OSError:
+                # Ту же запись уже собрал другой процесс
+                shutil.rmtree(staging, ignore_errors=True)
+        except Exception:
+            shutil.rmtree(staging, ignore_errors=True)
+            raise
+
+    @staticmethod
+    def _write_seek_index(zf, seek_index, staging, video, in_place):
+        """Индекс кадров: из архива, иначе по таблицам MP4 видео (старые уровни)"""
+        target = os.path.join(staging, SEEK_INDEX_NAME)
+        if seek_index is not None:
+            with open(target, 'wb') as f:
+                f.write(zf.read(seek_index))
+            return True
+        if video is None:
+            return False
+
+        if in_place:
+            offset, size = stored_member_span(zf.filename, zf.getinfo(video))
+            index = build_seek_index(zf.filename, offset, size)
+            if index is None:
+                cap = open_video_capture(subfile_url(zf.filename, offset, size))
+                index = SeekIndex.from_fps(int(cap.get(cv2.CAP_PROP_FRAME_COUNT)), cap.get(cv2.CAP_PROP_FPS))
+                cap.release()
+        else:
+            index = build_seek_index(os.path.join(staging, video))
+        with open(target, 'wb') as f:
+            f.write(encode_seek_index(index))
+        return True
+
+    def entries(self):
+        """[(key, size_bytes, last_used)], самые давно использованные первыми"""
+        result = []
+        if not os.path.isdir(self.root):
+            return result
+        for key in os.listdir(self.root):
+            directory = os.path.join(self.root, key)
+            entry_path = os.path.join(directory, ENTRY_NAME)
+            if key.startswith('.') or not os.path.exists(entry_path):
+                continue
+            size = sum(os.path.getsize(os.path.join(dirpath, name))
+                       for dirpath, _, names in os.walk(directory) for name in names)
+            result.append((key, size, os.path.getmtime(entry_path)))
+        result.sort(key=lambda e: e[2])
+        return result
+
+    def evict(self, keep=None):
+        """Удаляет самые давно использованные записи, пока кеш больше max_bytes"""
+        entries = self.entries()
+        total = sum(size for _, size, _ in entries)
+        for key, size, _ in entries:
+            if total <= self.max_bytes:
+                break
+            if key == keep:
+                continue
+            shutil.rmtree(os.path.join(self.root, key), ignore_errors=True)
+            total -= size
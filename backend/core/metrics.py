@@ -0,0 +1,145 @@
+# core/metrics.py
+"""
+Метрики производительности игрового цикла.
+
+Для каждой стадии (capture, inference, draw, encode, publish, loop, ...)
+хранится кольцо последних N замеров (мс); перцентили считаются только при
+запросе (get_metrics) или не чаще раза в COMPACT_INTERVAL секунд для meta.
+Счетчики (late_frames, dropped_frames, ...) - просто целые числа.
+
+Отключенные метрики - NullMetrics с тем же API, где все методы пустые,
+а now() даже не обращается к часам.
+"""
+import time
+
+import numpy as np
+
+# Как часто пересчитывать компактный блок perf для meta
+COMPACT_INTERVAL = 0.5
+
+
+class RollingStats:
+    __slots__ = ('_values', '_next', '_count')
+
+    def __init__(self, window=600):
+        self._values = np.zeros(window, dtype=np.float64)
+        self._next = 0
+        self._count = 0
+
+    def add(self, value):
+        self._values[self._next] = value
+        self._next = (self._next + 1) % len(self._values)
+        if self._count < len(self._values):
+            self._count += 1
+
+    def __len__(self):
+        return self._count
+
+    def values(self):
+        return self._values[:self._count]
+
+    def summary(self):
+        if self._count == 0:
+            return {"count": 0}
+        p50, p95, p99 = np.percentile(self.values(), (50, 95, 99))
+        return {
+            "count": self._count,
+            "mean": round(float(self.values().mean()), 3),
+            "p50": round(float(p50), 3),
+            "p95": round(float(p95), 3),
+            "p99": round(float(p99), 3),
+            "max": round(float(self.values().max()), 3),
+        }
+
+
+class Metrics:
+    enabled = True
+
+    def __init__(self, window=600):
+        self.window = window
+        self.started_at = time.time()
+        self._stages = {}
+        self._counters = {}
+        self._compact = None
+        self._compact_at = 0.0
+
+    @staticmethod
+    def now():
+        return time.perf_counter()
+
+    def record(self, stage, started):
+        """Длительность стадии от момента started (значение now())"""
+        self.observe(stage, (time.perf_counter() - started) * 1000.0)
+
+    def observe(self, stage, value_ms):
+        stats = self._stages.get(stage)
+        if stats is None:
+            stats = self._stages[stage] = RollingStats(self.window)
+        stats.add(value_ms)
+
+    def count(self, name, n=1):
+        self._counters[name] = self._counters.get(name, 0) + n
+
+    def reset(self):
+        self.started_at = time.time()
+        self._stages.clear()
+        self._counters.clear()
+        self._compact = None
+
+    def snapshot(self):
+        """Полный отчет для команды get_metrics"""
+        return {
+            "enabled": True,
+            "window": self.window,
+            "uptime": round(time.time() - self.started_at, 1),
+            "stages_ms": {name: stats.summary() for name, stats in self._stages.items()},
+            "counters": dict(self._counters),
+        }
+
+    def compact(self):
+        """Короткий блок perf для meta (пересчитывается не чаще COMPACT_INTERVAL)"""
+        now = time.perf_counter()
+        if self._compact is not None and now - self._compact_at < COMPACT_INTERVAL:
+            return self._compact
+
+        block = {}
+        for name, stats in self._stages.items():
+            if len(stats):
+                block[name] = round(float(np.percentile(stats.values(), 95)), 1)
+        tick = self._stages.get("tick")
+        if tick is not None and len(tick):
+            block["fps"] = round(1000.0 / max(float(tick.values().mean()), 1e-3), 1)
+        block["late"] = self._counters.get("late_frames", 0)
+        block["dropped"] = self._counters.get("dropped_frames", 0)
+        block["skipped"] = self._counters.get("skipped_frames", 0)
+
+        self._compact = block
+        self._compact_at = now
+        return block
+
+
+class NullMetrics:
+    """Метрики выключены: тот же API, ничего не делает"""
+    enabled = False
+
+    @staticmethod
+    def now():
+        return 0.0
+
+    def record(self, stage, started):
+        pass
+
+    def observe(self, stage, value_ms):
+        pass
+
+    def count(self, name, n=1):
+        pass
+
+    def reset(self):
+        pass
+
+    def snapshot(self):
+        return {"enabled": False}
+
+    def compact(self):
+        return None
@@ -0,0 +1,85 @@
+# core/model_pool.py
+"""
+Общий пул графов MediaPipe Pose в пределах процесса.
+
+Граф Pose дорогой (сотни мс на создание и первый инференс, десятки МБ), поэтому
+компоненты не создают свои PoseEngine, а берут их из пула: acquire() отдает
+свободный экземпляр с теми же параметрами (static_mode, model_complexity) или
+создает новый, release() возвращает его обратно. Экземпляр в аренде принадлежит
+одному владельцу - у графа в режиме трекинга есть состояние, поэтому перед
+повторной выдачей оно сбрасывается (PoseEngine.reset).
+
+Пул свой в каждом процессе (pose_pool()): воркеры оцифровки переиспользуют граф
+между диапазонами кадров, а игровой движок - между игроками и перезапусками.
+"""
+import threading
+from contextlib import contextmanager
+
+
+class PosePool:
+    def __init__(self, factory=None):
+        """factory(static_mode=..., model_complexity=...) -> PoseEngine (в тестах - подмена)"""
+        if factory is None:
+            from backend.core.pose_engine import PoseEngine
+            factory = PoseEngine
+        self.factory = factory
+        self._free = {}  # (static_mode, model_complexity) -> [engine, ...]
+        self._lock = threading.Lock()
+        self.created = 0
+        self.reused = 0
+
+    @staticmethod
+    def _key(engine):
+        return engine.static_mode, engine.model_complexity
+
+    def acquire(self, model_complexity=1, static_mode=False):
+        with self._lock:
+            free = self._free.get((static_mode, model_complexity))
+            if free:
+                self.reused += 1
+                engine = free.pop()
+            else:
+                self.created += 1
+                engine = None
+        if engine is None:
+            return self.factory(static_mode=static_mode, model_complexity=model_complexity)
+        engine.reset()
+        return engine
+
+    def release(self, engine):
+        # Ключ - по текущим параметрам: governor мог сменить model_complexity во время аренды
+        with self._lock:
+            self._free.setdefault(self._key(engine), []).append(engine)
+
+    @contextmanager
+    def lease(self, model_complexity=1, static_mode=False):
+        engine = self.acquire(model_complexity, static_mode)
+        try:
+            yield engine
+        finally:
+            self.release(engine)
+
+    def warm_up(self, model_complexity=1, static_mode=False):
+        """Готовит граф заранее (например, в фоновом потоке при старте)"""
+        with self.lease(model_complexity, static_mode) as engine:
+            engine.warm_up()
+
+    def close(self):
+        with self._lock:
+            engines = [engine for free in self._free.values() for engine in free]
+            self._free.clear()
+        for engine in engines:
+            engine.close()
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def pose_pool():
+    """Пул текущего процесса"""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = PosePool()
+        return _pool
@@ -0,0 +1,407 @@
+# core/mtp_writer.py
+"""
+Потоковая запись уровня .mtp для digitizer'а с возобновлением после сбоя.
+
+Пока идет оцифровка, записи паттерна не копятся в памяти, а дописываются на
+диск в рабочую папку <output>.work/:
+- job.json - какой источник оцифровывается (путь, размер, mtime, fps) и план
+  сегментов кадров; при другом источнике папка начинается заново;
+- range-<start>.bin - строки сегмента, float32: номер кадра, world (33 x 3) и
+  visibility (33) найденной позы. Первыми идут строки прогрева (кадры
+  [warmup_start, start), трекер сегмента перед его началом);
+- range-<start>.json - контрольная точка: сегмент готов, строки на диске
+  (данные сбрасываются fsync до записи точки, сама точка заменяется атомарно).
+
+Сегмент - единица и параллельной обработки, и контрольных точек: трекер
+каждого сегмента начинает заново с его прогрева, поэтому строки сегмента
+зависят только от видео, а не от числа воркеров и перезапусков. Прерванная
+оцифровка (падение процесса, выключение) при повторном запуске с тем же
+output пропускает готовые сегменты, а недописанный начинает сначала.
+
+При упаковке строки прогрева сегмента сами в паттерн не попадают, а плавно
+смешиваются с хвостом предыдущего сегмента (вес нового трекера растет от 0
+до 1 по перекрытию): на границе сегментов нет скачка.
+
+Упаковка идет блоками по строкам (память не зависит от длины видео) в
+<output>.part, который в конце переименовывается в output: недописанного
+.mtp не бывает. Углы паттерна считаются при упаковке из landmarks по
+таблице углов, сами landmarks ложатся в landmarks.bin (core/landmark_store.py).
+patterns.json сжимается, медиа и бинарные треки (video.mp4, patterns.bin,
+landmarks.bin, seek_index.bin) пишутся без сжатия - MP4 от DEFLATE не
+уменьшается, а несжатые члены backend читает прямо из архива.
+
+rederive_mtp пересчитывает паттерн готового уровня из его landmarks.bin (в
+том числе с другой таблицей углов) - без видео и инференса.
+
+keyframe_error (градусы) включает сжатие паттерна до ключевых строк
+(core/pattern_keyframes.py); отчет пишется в manifest.pattern_keyframes и в
+заголовок patterns.bin. Для сжатия трек углов собирается в памяти целиком
+(около 80 байт на кадр), landmarks по-прежнему идут блоками.
+"""
+import json
+import os
+import shutil
+import zipfile
+
+import numpy as np
+
+from backend.core.geometry import DEFAULT_ANGLE_TABLE, NUM_LANDMARKS, calculate_angles_batch
+from backend.core.landmark_store import LANDMARKS_BIN_NAME, decode_landmark_track, encode_landmark_header
+from backend.core.pattern_keyframes import compression_report, keyframe_mask
+from backend.core.pattern_store import PATTERNS_BIN_NAME, encode_pattern_header
+from backend.core.seek_index import SEEK_INDEX_NAME, encode_seek_index
+
+# 2: в спулах landmarks вместо углов; 3: спул на сегмент со строками прогрева
+# (папки прежних раскладок начинаются заново)
+WORKSPACE_LAYOUT = 3
+# Строк паттерна за один шаг упаковки
+PACK_BLOCK_ROWS = 4096
+# Блок копирования членов архива при rederive
+COPY_CHUNK_BYTES = 1024 * 1024
+
+
+def work_dir_for(output_path):
+    return output_path + ".work"
+
+
+def discard_partial(output_path, keep_checkpoints=False):
+    """
+    Удаляет недописанный архив. keep_checkpoints=True (сбой) оставляет рабочую
+    папку для возобновления, иначе (отмена) удаляются и она, и output.
+    """
+    paths = [output_path + ".part"] if keep_checkpoints else [output_path + ".part", output_path]
+    for path in paths:
+        try:
+            if os.path.exists(path):
+                os.remove(path)
+        except OSError:
+            pass
+    if not keep_checkpoints:
+        shutil.rmtree(work_dir_for(output_path), ignore_errors=True)
+
+
+def _write_json_atomic(path, data):
+    tmp = path + ".tmp"
+    with open(tmp, 'w') as f:
+        json.dump(data, f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+class LandmarkSpool:
+    """
+    Landmarks одного сегмента кадров [start, end) на диске (end=None - до конца видео)
+    и его прогрева [warmup_start, start) (по умолчанию прогрева нет)
+    """
+
+    def __init__(self, directory, start, end, warmup_start=None, n_points=NUM_LANDMARKS):
+        self.start = start
+        self.end = end
+        self.warmup_start = start if warmup_start is None else warmup_start
+        self.n_points = n_points
+        # Номер кадра во float32 точен до 2^24 кадров (больше 150 часов при 30 fps)
+        self.columns = 1 + 4 * n_points
+        self.row_bytes = 4 * self.columns
+        self.path = os.path.join(directory, f"range-{start:08d}.bin")
+        self.state_path = os.path.join(directory, f"range-{start:08d}.json")
+
+        state = {}
+        if os.path.exists(self.state_path):
+            with open(self.state_path, 'r') as f:
+                state = json.load(f)
+        self.rows = state.get("rows", 0)
+        self.warmup_rows = state.get("warmup_rows", 0)
+        self.next_frame = state.get("next_frame", start)
+        self.done = state.get("done", False)
+        self._file = None
+
+    def _open(self):
+        if self._file is None:
+            # Строки после контрольной точки могли быть записаны не полностью - отрезаем
+            mode = 'r+b' if os.path.exists(self.path) else 'w+b'
+            self._file = open(self.path, mode)
+            self._file.truncate(self.rows * self.row_bytes)
+            self._file.seek(0, os.SEEK_END)
+        return self._file
+
+    def append(self, frame_indices, landmarks):
+        """
+        frame_indices (K,), landmarks (K, P, 4): x, y, z, visibility - кадры, где поза найдена.
+        Строки прогрева (кадры до start) дописываются первыми.
+        """
+        if not len(frame_indices):
+            return
+        self.warmup_rows += int(np.count_nonzero(np.asarray(frame_indices) < self.start))
+        landmarks = np.asarray(landmarks, dtype=np.float32)
+        block = np.column_stack((np.asarray(frame_indices, dtype=np.float32),
+                                 landmarks[..., :3].reshape(len(landmarks), -1),
+                                 landmarks[..., 3]))
+        self._open().write(block.astype('<f4').tobytes())
+        self.rows += len(block)
+
+    def checkpoint(self, next_frame, done=False):
+        """Все строки до next_frame на диске; при сбое диапазон продолжится отсюда"""
+        f = self._open()
+        f.flush()
+        os.fsync(f.fileno())
+        self.next_frame = next_frame
+        self.done = done
+        _write_json_atomic(self.state_path, {"start": self.start, "end": self.end, "rows": self.rows,
+                                             "warmup_rows": self.warmup_rows, "next_frame": next_frame,
+                                             "done": done})
+
+    @property
+    def pattern_rows(self):
+        """Строк сегмента без прогрева - столько он дает в паттерн"""
+        return self.rows - self.warmup_rows
+
+    def read_rows(self):
+        """Строки контрольной точки (rows, 1 + 4P) через memory map"""
+        self.close()
+        if self.rows == 0:
+            return np.zeros((0, self.columns), dtype=np.float32)
+        return np.memmap(self.path, dtype='<f4', mode='r', shape=(self.rows, self.columns))
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+class DigitizeWorkspace:
+    """Рабочая папка оцифровки одного output: описание задачи, план диапазонов и их спулы"""
+
+    def __init__(self, output_path, source_path, fps, joints, resume=True):
+        self.dir = work_dir_for(output_path)
+        self.joints = list(joints)
+        stat = os.stat(source_path)
+        job = {"layout": WORKSPACE_LAYOUT, "source": os.path.abspath(source_path), "size": stat.st_size,
+               "mtime": stat.st_mtime, "fps": fps, "joints": self.joints}
+
+        saved = None
+        job_path = os.path.join(self.dir, "job.json")
+        if resume and os.path.exists(job_path):
+            try:
+                with open(job_path, 'r') as f:
+                    saved = json.load(f)
+            except (OSError, ValueError):
+                saved = None
+        if saved is not None and {k: saved.get(k) for k in job} == job:
+            self.job = saved
+            self.resumed = True
+        else:
+            shutil.rmtree(self.dir, ignore_errors=True)
+            os.makedirs(self.dir)
+            self.job = job
+            self.resumed = False
+            _write_json_atomic(job_path, job)
+
+    def plan(self, chunks):
+        """
+        План сегментов [(warmup_start, start, end)]. При возобновлении - сохраненный
+        (строки уже записаны по нему).
+        """
+        if "chunks" not in self.job:
+            self.job["chunks"] = [list(chunk) for chunk in chunks]
+            _write_json_atomic(os.path.join(self.dir, "job.json"), self.job)
+        return [tuple(chunk) for chunk in self.job["chunks"]]
+
+    def spool(self, start, end, warmup_start=None):
+        return LandmarkSpool(self.dir, start, end, warmup_start)
+
+    def spools(self):
+        """Спулы по плану (после plan), в порядке кадров"""
+        return [self.spool(start, end, warm) for warm, start, end in self.job["chunks"]]
+
+    def discard(self):
+        shutil.rmtree(self.dir, ignore_errors=True)
+
+
+def _blend_warmup(rows, warmup, warmup_start, start):
+    """
+    Хвост сегмента rows (кадры до start) смешивается со строками прогрева следующего
+    сегмента: вес нового трекера растет линейно от кадра warmup_start до start.
+    Кадры, где поза есть только у одного трекера, остаются как в rows.
+    """
+    if not len(rows) or not len(warmup):
+        return rows
+    at = np.minimum(np.searchsorted(warmup[:, 0], rows[:, 0]), len(warmup) - 1)
+    match = warmup[at, 0] == rows[:, 0]
+    weight = ((rows[match, 0] - warmup_start + 1) / (start - warmup_start + 1))[:, None].astype(np.float32)
+    rows[match, 1:] = (1 - weight) * rows[match, 1:] + weight * warmup[at[match], 1:]
+    return rows
+
+
+def _spool_blocks(spools):
+    """
+    (frames (k,), world (k, P, 3), visibility (k, P)) по сегментам подряд, со сглаженными
+    границами (см. _blend_warmup); строки прогрева в результат не попадают
+    """
+    for i, spool in enumerate(spools):
+        rows = np.array(spool.read_rows()[spool.warmup_rows:])
+        following = spools[i + 1] if i + 1 < len(spools) else None
+        if following is not None and following.warmup_rows:
+            warmup = np.asarray(following.read_rows()[:following.warmup_rows])
+            rows = _blend_warmup(rows, warmup, following.warmup_start, following.start)
+        split = 1 + 3 * spool.n_points
+        yield rows[:, 0].astype(np.int64), rows[:, 1:split].reshape(len(rows), spool.n_points, 3), rows[:, split:]
+
+
+def _spool_angle_blocks(spools, table):
+    """(frames, angles (k, J)) по всем спулам: углы считаются из landmarks блоком за проход"""
+    for frames, world, _ in _spool_blocks(spools):
+        yield frames, calculate_angles_batch(world, table)
+
+
+def _timestamps(frames, fps):
+    # round как в patterns.json (десятичное округление Python, а не np.round)
+    return [round(idx / fps, 3) for idx in np.asarray(frames).astype(np.int64).tolist()]
+
+
+def _write_patterns_json(f, blocks, fps, joints):
+    """
+    patterns.json - тот же JSON-массив, что json.dumps(list of records), но блоками.
+    blocks() - новый проход по (frames, angles).
+    """
+    f.write(b"[")
+    first = True
+    for frames, angles in blocks():
+        parts = []
+        for t, row in zip(_timestamps(frames, fps), angles.tolist()):
+            values = {name: v for name, v in zip(joints, row) if v == v}
+            parts.append(json.dumps({"timestamp": t, "angles": values}))
+        if parts:
+            f.write(((", " if not first else "") + ", ".join(parts)).encode('utf-8'))
+            first = False
+    f.write(b"]")
+
+
+def _write_patterns_bin(f, blocks, n_frames, fps, joints, keyframes=None):
+    """patterns.bin: заголовок, колонка времени, затем колонка на сустав (проход по блокам на колонку)"""
+    f.write(encode_pattern_header(n_frames, joints, keyframes))
+    for frames, _ in blocks():
+        f.write(np.asarray(_timestamps(frames, fps), dtype='<f4').tobytes())
+    for j in range(len(joints)):
+        for _, angles in blocks():
+            f.write(np.ascontiguousarray(angles[:, j], dtype='<f4').tobytes())
+
+
+def _write_landmarks_bin(f, spools, fps):
+    """landmarks.bin из спулов: заголовок и три массива, по проходу на массив"""
+    n_points = spools[0].n_points if spools else NUM_LANDMARKS
+    f.write(encode_landmark_header(sum(spool.pattern_rows for spool in spools), n_points, fps))
+    for column, dtype in ((0, '<u4'), (1, '<f4'), (2, '<f2')):
+        for block in _spool_blocks(spools):
+            f.write(block[column].astype(dtype).tobytes())
+
+
+def _stored(name):
+    info = zipfile.ZipInfo(name, date_time=(1980, 1, 1, 0, 0, 0))
+    info.compress_type = zipfile.ZIP_STORED
+    return info
+
+
+def _keyframe_blocks(blocks, fps, n_joints, max_error):
+    """Сжимает паттерн до ключевых строк: (новый blocks, отчет сжатия)"""
+    parts = list(blocks())
+    frames = np.concatenate([p[0] for p in parts]) if parts else np.zeros(0, dtype=np.int64)
+    angles = np.concatenate([p[1] for p in parts]) if parts else np.zeros((0, n_joints))
+    # Ошибка считается по тем же (округленным) временам, что лягут в паттерн
+    timestamps = np.asarray(_timestamps(frames, fps), dtype=np.float32)
+    keep = keyframe_mask(timestamps, angles, max_error, 1.0 / fps)
+    frames, angles = frames[keep], angles[keep]
+
+    def kept():
+        for first in range(0, len(frames), PACK_BLOCK_ROWS):
+            yield frames[first:first + PACK_BLOCK_ROWS], angles[first:first + PACK_BLOCK_ROWS]
+
+    return kept, compression_report(len(keep), len(frames), max_error, 1.0 / fps)
+
+
+def _prepare_patterns(manifest, blocks, n_frames, fps, n_joints, max_error):
+    """(blocks, строк, отчет или None); отчет сжатия попадает в manifest"""
+    if max_error is None:
+        manifest.pop("pattern_keyframes", None)
+        return blocks, n_frames, None
+    blocks, report = _keyframe_blocks(blocks, fps, n_joints, max_error)
+    manifest["pattern_keyframes"] = report
+    return blocks, report["keyframes"], report
+
+
+def _write_patterns(zf, name, blocks, n_frames, fps, joints, keyframes=None):
+    with zf.open(name, 'w') as f:
+        _write_patterns_json(f, blocks, fps, joints)
+    # Бинарный трек без сжатия: его можно отобразить в память как есть
+    with zf.open(_stored(PATTERNS_BIN_NAME), 'w') as f:
+        _write_patterns_bin(f, blocks, n_frames, fps, joints, keyframes)
+
+
+def write_mtp(output_path, manifest, spools, fps, video_path, seek_index, table=DEFAULT_ANGLE_TABLE,
+              keyframe_error=None):
+    """
+    Упаковывает уровень из спулов в output_path (через .part и атомарное переименование).
+    Возвращает отчет сжатия паттерна (None, если keyframe_error не задан).
+    """
+    part = output_path + ".part"
+    blocks, rows, report = _prepare_patterns(manifest, lambda: _spool_angle_blocks(spools, table),
+                                             sum(spool.pattern_rows for spool in spools), fps, len(table),
+                                             keyframe_error)
+    with zipfile.ZipFile(part, 'w', zipfile.ZIP_DEFLATED) as zf:
+        zf.writestr("manifest.json", json.dumps(manifest, indent=2))
+        _write_patterns(zf, manifest["files"]["patterns"], blocks, rows, fps, table.names, report)
+        # Сырые landmarks - для пересчета паттерна без инференса (rederive_mtp)
+        with zf.open(_stored(LANDMARKS_BIN_NAME), 'w') as f:
+            _write_landmarks_bin(f, spools, fps)
+        # Время каждого кадра и ключевые кадры видео - для точного seek
+        zf.writestr(SEEK_INDEX_NAME, encode_seek_index(seek_index), compress_type=zipfile.ZIP_STORED)
+        # Видео копируется блоками и не сжимается
+        zf.write(video_path, manifest["files"]["video"], compress_type=zipfile.ZIP_STORED)
+    os.replace(part, output_path)
+    return report
+
+
+def _copy_member(src, dst, info):
+    """Член архива как есть (тот же способ сжатия), блоками - видео не читается в память целиком"""
+    target = zipfile.ZipInfo(info.filename, date_time=info.date_time)
+    target.compress_type = info.compress_type
+    target.file_size = info.file_size  # по нему zipfile решает, нужен ли ZIP64
+    with src.open(info) as fin, dst.open(target, 'w') as fout:
+        shutil.copyfileobj(fin, fout, COPY_CHUNK_BYTES)
+
+
+def rederive_mtp(mtp_path, output_path=None, table=DEFAULT_ANGLE_TABLE, keyframe_error=None):
+    """
+    Пересчитывает patterns.json и patterns.bin уровня по его landmarks.bin
+    (углы table, keyframe_error - сжатие до ключевых строк) - без декодирования
+    видео и инференса. Остальные члены копируются как есть; output_path=None -
+    архив заменяется на месте. Возвращает отчет: сколько кадров и строк паттерна.
+    """
+    output_path = output_path or mtp_path
+    part = output_path + ".part"
+    with zipfile.ZipFile(mtp_path) as src:
+        manifest = json.loads(src.read("manifest.json"))
+        files = manifest.setdefault("files", {})
+        name = files.get("landmarks")
+        if not name or name not in src.namelist():
+            raise ValueError(f"Level has no {LANDMARKS_BIN_NAME}, digitize the video again to store landmarks")
+        track = decode_landmark_track(src.read(name))
+
+        files.setdefault("patterns", "patterns.json")
+        files["patterns_bin"] = PATTERNS_BIN_NAME
+        skip = {"manifest.json", files["patterns"], PATTERNS_BIN_NAME}
+        blocks, rows, report = _prepare_patterns(manifest, lambda: track.angle_blocks(table), len(track),
+                                                 track.fps, len(table), keyframe_error)
+        try:
+            with zipfile.ZipFile(part, 'w', zipfile.ZIP_DEFLATED) as dst:
+                dst.writestr("manifest.json", json.dumps(manifest, indent=2))
+                _write_patterns(dst, files["patterns"], blocks, rows, track.fps, table.names, report)
+                for info in src.infolist():
+                    if info.filename not in skip:
+                        _copy_member(src, dst, info)
+        except BaseException:
+            if os.path.exists(part):
+                os.remove(part)
+            raise
+    os.replace(part, output_path)
+    return report or compression_report(len(track), rows, None, 1.0 / track.fps)
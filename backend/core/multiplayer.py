@@ -0,0 +1,262 @@
+# core/multiplayer.py
+"""
+Режим нескольких игроков (TECH_SPEC 8.4).
+
+MediaPipe Pose находит одного человека, поэтому кадр делится на области,
+и у каждого игрока свой PosePipeline (свой процесс-воркер и свой PoseEngine
+со своим состоянием трекинга). Воркеры считают параллельно, так что второй
+игрок нагружает еще одно ядро, а не удваивает время кадра.
+
+Области игроков:
+- по умолчанию - вертикальные полосы (lanes) одинаковой ширины;
+- с PersonDetector - рамки людей от HOG-детектора OpenCV (раз в несколько
+  кадров), привязанные к игрокам по ближайшему центру. Игрок, которого
+  детектор временно не нашел, сохраняет прежнюю область.
+
+HOG занимает несколько миллисекунд, поэтому детектор работает в своем потоке
+(DetectorThread): главный цикл отдает ему кадр и забирает последние готовые
+рамки, не дожидаясь их. Пока детектор занят, новые кадры ему не отдаются.
+
+play_frame - шаг игры на кадр (поза, углы, скоринг вне no_score_zone), общий
+для GameEngine._loop_playing и offline replay (core/replay.py): прогон записи
+не может разойтись с живой игрой.
+"""
+import math
+import threading
+
+import cv2
+import numpy as np
+
+from backend.core.geometry import calculate_angles_batch, DEFAULT_ANGLE_TABLE
+
+
+def split_lanes(width, height, count):
+    """count вертикальных полос кадра: [(x0, 0, x1, height), ...] слева направо"""
+    edges = [round(width * i / count) for i in range(count + 1)]
+    return [(edges[i], 0, edges[i + 1], height) for i in range(count)]
+
+
+def _center(rect):
+    x0, y0, x1, y1 = rect
+    return (x0 + x1) / 2.0, (y0 + y1) / 2.0
+
+
+def match_regions(previous, boxes, max_distance):
+    """
+    Привязывает найденные рамки к игрокам: жадно по расстоянию между центрами.
+    previous: {player_id: rect}; возвращает {player_id: индекс рамки}.
+    """
+    pairs = []
+    for player_id, rect in previous.items():
+        px, py = _center(rect)
+        for i, box in enumerate(boxes):
+            bx, by = _center(box)
+            distance = math.hypot(px - bx, py - by)
+            if distance <= max_distance:
+                pairs.append((distance, player_id, i))
+
+    matched = {}
+    used = set()
+    for _, player_id, i in sorted(pairs):
+        if player_id not in matched and i not in used:
+            matched[player_id] = i
+            used.add(i)
+    return matched
+
+
+class PersonDetector:
+    """Дешевый детектор людей (HOG + линейный SVM из OpenCV) на уменьшенном кадре"""
+
+    @staticmethod
+    def available():
+        # В OpenCV 5 HOG вынесен из основной сборки
+        return hasattr(cv2, 'HOGDescriptor')
+
+    def __init__(self, work_width=320):
+        self.work_width = work_width
+        self._hog = cv2.HOGDescriptor()
+        self._hog.setSVMDetector(cv2.HOGDescriptor_getDefaultPeopleDetector())
+
+    def detect(self, frame):
+        """Рамки людей [(x0, y0, x1, y1), ...] в координатах кадра, крупные первыми"""
+        h, w = frame.shape[:2]
+        scale = min(1.0, self.work_width / float(w))
+        small = cv2.resize(frame, (int(w * scale), int(h * scale)), interpolation=cv2.INTER_AREA) \
+            if scale < 1.0 else frame
+        rects, _ = self._hog.detectMultiScale(small, winStride=(8, 8), padding=(8, 8), scale=1.05)
+        boxes = [(int(x / scale), int(y / scale), int((x + bw) / scale), int((y + bh) / scale))
+                 for x, y, bw, bh in rects]
+        boxes.sort(key=lambda b: (b[2] - b[0]) * (b[3] - b[1]), reverse=True)
+        return boxes
+
+
+class DetectorThread:
+    """Детектор в фоновом потоке: submit(кадр) не ждет, take() отдает последние готовые рамки"""
+
+    def __init__(self, detector):
+        self.detector = detector
+        self._frame = None  # кадр, который детектор сейчас обрабатывает
+        self._boxes = None  # готовые рамки, еще не забранные take()
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="PersonDetector", daemon=True)
+            self._thread.start()
+        return self
+
+    def _run(self):
+        while not self._stop.is_set():
+            if not self._wake.wait(timeout=0.1):
+                continue
+            self._wake.clear()
+            boxes = self.detector.detect(self._frame)
+            with self._lock:
+                self._boxes = boxes
+                self._frame = None
+
+    def submit(self, frame):
+        """Отдает кадр детектору; False, если он еще занят предыдущим"""
+        with self._lock:
+            if self._frame is not None:
+                return False
+            self._frame = frame.copy()  # кадр пользователя дальше рисуется в главном цикле
+        self._wake.set()
+        return True
+
+    def take(self):
+        """Рамки последней завершенной детекции (один раз) или None"""
+        with self._lock:
+            boxes, self._boxes = self._boxes, None
+        return boxes
+
+    def close(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=1.0)
+
+
+class PlayerRegions:
+    def __init__(self, count, detector=None, detect_every=10, margin=0.15, background=True):
+        """
+        count: число игроков (id 1..count, слева направо)
+        detector: PersonDetector или None (только полосы)
+        margin: насколько расширять рамку детектора (MediaPipe нужен контекст вокруг тела)
+        background: детектор в своем потоке (False - прямо в regions(), как при офлайн-прогоне)
+        """
+        self.count = count
+        self.detector = detector
+        self.detect_every = detect_every
+        self.margin = margin
+        self._frame = 0
+        self._rects = {}
+        self._thread = DetectorThread(detector).start() if detector is not None and background else None
+
+    def regions(self, frame):
+        """{player_id: (x0, y0, x1, y1)} для текущего кадра"""
+        h, w = frame.shape[:2]
+        lanes = split_lanes(w, h, self.count)
+        if self.detector is None:
+            return {i + 1: lane for i, lane in enumerate(lanes)}
+
+        boxes = None
+        if self._frame % self.detect_every == 0:
+            if self._thread is not None:
+                self._thread.submit(frame)
+            else:
+                boxes = self.detector.detect(frame)
+        self._frame += 1
+        if self._thread is not None:
+            boxes = self._thread.take()
+        if boxes is not None:
+            self._update(boxes[:self.count], w, h, lanes)
+
+        # Кого детектор еще ни разу не нашел - ищем в его полосе
+        return {i + 1: self._rects.get(i + 1, lane) for i, lane in enumerate(lanes)}
+
+    def _update(self, boxes, w, h, lanes):
+        boxes = [self._expand(box, w, h) for box in boxes]
+        known = {pid: self._rects.get(pid, lanes[pid - 1]) for pid in range(1, self.count + 1)}
+        matched = match_regions(known, boxes, max_distance=w / self.count)
+
+        for player_id, i in matched.items():
+            self._rects[player_id] = boxes[i]
+        # Новые люди без пары - свободным игрокам, слева направо
+        free = [pid for pid in range(1, self.count + 1) if pid not in matched]
+        rest = sorted((box for i, box in enumerate(boxes) if i not in matched.values()), key=_center)
+        for player_id, box in zip(free, rest):
+            self._rects[player_id] = box
+
+    def close(self):
+        if self._thread is not None:
+            self._thread.close()
+
+    def _expand(self, box, w, h):
+        x0, y0, x1, y1 = box
+        dx = int((x1 - x0) * self.margin)
+        dy = int((y1 - y0) * self.margin)
+        return max(0, x0 - dx), max(0, y0 - dy), min(w, x1 + dx), min(h, y1 + dy)
+
+
+class Player:
+    def __init__(self, player_id, pipeline):
+        self.id = player_id
+        self.pipeline = pipeline  # PosePipeline (core/pose_worker.py)
+        self.scorer = None  # StreamingScorer по паттерну уровня
+        self.sample = None  # PoseSample текущего кадра
+        self.angles = None
+        self.result = None  # оценка текущего кадра (None - кадр не оценивался)
+
+    def to_meta(self):
+        """Блок игрока для meta["players"]"""
+        meta = {"id": self.id, "score": self.scorer.score if self.scorer else 0}
+        if self.scorer is not None and self.scorer.last is not None:
+            meta["rating"] = self.scorer.last["rating"]
+            meta["streak"] = self.scorer.streak
+        if self.sample is not None:
+            # [x, y, visibility] на точку, x/y нормализованы к кадру пользователя
+            points = np.column_stack((self.sample.image[:, :2], self.sample.visibility)).astype(np.float64)
+            meta["landmarks"] = np.round(points, 3).tolist()
+        else:
+            meta["landmarks"] = None
+        return meta
+
+    def close(self):
+        self.pipeline.close()
+
+
+def play_frame(players, frame, captured_at, level_time, timeline_index, metrics, regions=None):
+    """
+    Один кадр пользователя: поза и углы каждого игрока (stride и сложность модели
+    решает governor конвейера), затем скоринг в момент уровня level_time, если он
+    вне no_score_zone. Результат - в player.sample/angles/result; возвращает True,
+    если кадр оценивался.
+    regions: {player_id: (x0, y0, x1, y1)} от PlayerRegions (None - весь кадр)
+    """
+    regions = regions or {}
+    started = metrics.now()
+    for player in players:
+        player.sample = player.pipeline.process(frame, captured_at, regions.get(player.id))
+        player.angles = calculate_angles_batch(player.sample.world, DEFAULT_ANGLE_TABLE) \
+            if player.sample is not None else None
+    metrics.record("inference", started)
+
+    started = metrics.now()
+    scored = not timeline_index.in_no_score_zone(level_time)
+    for player in players:
+        player.result = player.scorer.update(level_time, player.angles) \
+            if scored and player.scorer is not None else None
+    metrics.record("scoring", started)
+    return scored
+
+
+def draw_players(engine, frame, players, scale, metrics):
+    """Скелеты игроков поверх кадра пользователя (scale - масштаб кадра на экране)"""
+    started = metrics.now()
+    for player in players:
+        if player.sample is not None:
+            engine.draw_sample(frame, player.sample, scale=scale)
+    metrics.record("draw", started)
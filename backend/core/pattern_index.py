@@ -0,0 +1,95 @@
+# core/pattern_index.py
+"""
+Индекс эталонного паттерна по времени.
+
+Хранит отсортированные массивы timestamps (N,) и angles (N, J) и отвечает
+на вопросы "поза в момент t" (бинарный поиск + линейная интерполяция)
+и "все сэмплы в окне [t - delta, t + delta]" (срезы без копирования).
+
+Паттерн, сжатый до ключевых строк, при загрузке дополняется
+интерполированными сэмплами на быстрых участках (core/pattern_keyframes.py),
+чтобы скорингу было с чем сравнивать позу между ключевыми строками.
+"""
+import numpy as np
+
+from backend.core.pattern_keyframes import densify
+
+
+class PatternTimeline:
+    def __init__(self, timestamps, angles, joints):
+        timestamps = np.asarray(timestamps)
+        angles = np.asarray(angles).reshape(len(timestamps), len(joints))
+
+        # Данные от digitizer уже отсортированы - тогда обходимся без копий
+        if len(timestamps) > 1 and np.any(np.diff(timestamps) < 0):
+            order = np.argsort(timestamps, kind='stable')
+            timestamps = timestamps[order]
+            angles = angles[order]
+
+        self.timestamps = timestamps
+        self.angles = angles
+        self.joints = list(joints)
+        self.joint_index = {name: j for j, name in enumerate(self.joints)}
+        self.keyframes = None  # отчет сжатия исходного трека (None - сэмпл на каждый кадр)
+
+    @classmethod
+    def from_track(cls, track):
+        """Из PatternTrack (см. core/pattern_store.py)"""
+        if not track.keyframes:
+            return cls(track.timestamps, track.angles, track.joints)
+        timestamps, angles = densify(track.timestamps, track.angles, track.keyframes["frame_time"])
+        timeline = cls(timestamps, angles, track.joints)
+        timeline.keyframes = track.keyframes
+        return timeline
+
+    def __len__(self):
+        return len(self.timestamps)
+
+    @property
+    def duration(self):
+        return float(self.timestamps[-1]) if len(self.timestamps) else 0.0
+
+    def at(self, t):
+        """
+        Эталонная поза в момент t: массив (J,) с линейной интерполяцией
+        между соседними сэмплами. За пределами паттерна - крайний сэмпл.
+        None, если паттерн пуст.
+        """
+        n = len(self.timestamps)
+        if n == 0:
+            return None
+
+        i = int(np.searchsorted(self.timestamps, t, side='right'))
+        if i == 0:
+            return self.angles[0]
+        if i == n:
+            return self.angles[-1]
+
+        t0 = self.timestamps[i - 1]
+        t1 = self.timestamps[i]
+        if t1 <= t0:
+            return self.angles[i]
+        w = (t - t0) / (t1 - t0)
+        return self.angles[i - 1] + (self.angles[i] - self.angles[i - 1]) * w
+
+    def angles_at(self, t):
+        """То же, что at(), но словарем {сустав: угол} (NaN пропускаются)"""
+        pose = self.at(t)
+        if pose is None:
+            return {}
+        return {name: float(v) for name, v in zip(self.joints, pose.tolist()) if v == v}
+
+    def range_slice(self, t0, t1):
+        """Диапазон индексов сэмплов, попадающих в [t0, t1]"""
+        lo = int(np.searchsorted(self.timestamps, t0, side='left'))
+        hi = int(np.searchsorted(self.timestamps, t1, side='right'))
+        return slice(lo, hi)
+
+    def window_slice(self, t, delta):
+        """Диапазон индексов сэмплов, попадающих в [t - delta, t + delta]"""
+        return self.range_slice(t - delta, t + delta)
+
+    def window(self, t, delta):
+        """Все сэмплы в [t - delta, t + delta]: (timestamps, angles) - виды без копий"""
+        s = self.window_slice(t, delta)
+        return self.timestamps[s], self.angles[s]
@@ -0,0 +1,105 @@
+# core/pattern_keyframes.py
+"""
+Сжатие паттерна до ключевых кадров с гарантированной ошибкой.
+
+Углы большую часть уровня меняются плавно или стоят на месте, поэтому вместо
+строки на каждый кадр видео достаточно ключевых строк, между которыми
+значения восстанавливаются линейной интерполяцией по времени (так
+PatternTimeline.at уже считает позу между сэмплами).
+
+keyframe_mask - Ramer-Douglas-Peucker сразу по всем суставам: строка
+остается, если без нее хотя бы один угол хотя бы в одном кадре отклонился бы
+от интерполяции больше max_error градусов. Набор строк общий для суставов,
+поэтому patterns.json/patterns.bin сохраняют свою раскладку, просто строк
+меньше. Всегда остаются первая и последняя строки, края разрывов (кадры без
+позы) и строки, где меняется набор определенных (не NaN) углов.
+
+densify - обратная сторона для скоринга: StreamingScorer сравнивает позу
+пользователя с сэмплами окна, а не с отрезками между ними. На отрезках, где
+угол меняется больше чем на step градусов, добавляются интерполированные
+сэмплы (не чаще исходных кадров); на удержаниях и медленных участках
+сэмплов остается столько, сколько ключевых строк. После сжатия разрыв не
+отличить от длинного отрезка, поэтому он заполняется так же - той же
+интерполяцией, которой at() уже отвечает внутри разрыва.
+"""
+import numpy as np
+
+# Шаг (градусы) сэмплов для сопоставления при скоринге сжатого паттерна
+MATCH_STEP_DEGREES = 5.0
+# Разрыв по времени больше стольких кадров - поза не найдена, края разрыва сохраняются
+GAP_FRAMES = 1.5
+
+
+def keyframe_mask(timestamps, angles, max_error, frame_time):
+    """
+    Какие строки (N,) оставить, чтобы интерполяция по ним отличалась от каждого
+    угла каждой строки не больше чем на max_error. timestamps (N,) по возрастанию,
+    angles (N, J) с NaN, frame_time - шаг кадров видео.
+    """
+    t = np.asarray(timestamps, dtype=np.float64)
+    angles = np.asarray(angles, dtype=np.float64)
+    n = len(t)
+    keep = np.zeros(n, dtype=bool)
+    if n <= 2:
+        keep[:] = True
+        return keep
+
+    missing = np.isnan(angles)
+    breaks = np.flatnonzero((missing[1:] != missing[:-1]).any(axis=1) | (np.diff(t) > GAP_FRAMES * frame_time))
+    keep[[0, n - 1]] = True
+    keep[breaks] = True
+    keep[breaks + 1] = True
+    # Внутри отрезка набор NaN один и тот же: такие суставы просто не участвуют в ошибке
+    values = np.where(missing, 0.0, angles)
+
+    kept = np.flatnonzero(keep)
+    stack = list(zip(kept[:-1].tolist(), kept[1:].tolist()))
+    while stack:
+        a, b = stack.pop()
+        if b - a < 2:
+            continue
+        w = (t[a + 1:b] - t[a]) / (t[b] - t[a])
+        line = values[a] + w[:, None] * (values[b] - values[a])
+        error = np.abs(values[a + 1:b] - line).max(axis=1)
+        worst = int(np.argmax(error))
+        if error[worst] > max_error:
+            m = a + 1 + worst
+            keep[m] = True
+            stack.append((a, m))
+            stack.append((m, b))
+    return keep
+
+
+def densify(timestamps, angles, frame_time, step=MATCH_STEP_DEGREES):
+    """
+    Сэмплы для скоринга из ключевых строк: отрезок, на котором какой-то угол
+    меняется на d градусов, делится на ceil(d / step) частей, но не больше, чем
+    было кадров. Возвращает (timestamps, angles).
+    """
+    t = np.asarray(timestamps)
+    angles = np.asarray(angles)
+    if len(t) < 2:
+        return t, angles
+
+    dt = np.diff(t.astype(np.float64))
+    with np.errstate(invalid='ignore'):
+        change = np.nan_to_num(np.abs(np.diff(angles.astype(np.float64), axis=0))).max(axis=1)
+    frames = np.rint(dt / frame_time)
+    pieces = np.maximum(np.minimum(np.ceil(change / step), frames), 1).astype(np.int64)
+    if int(pieces.max()) == 1:
+        return t, angles
+
+    # Начало каждого отрезка и его доли 1/p, 2/p, ... (p - число частей), плюс последняя строка
+    segment = np.repeat(np.arange(len(pieces)), pieces)
+    first = np.repeat(np.cumsum(pieces) - pieces, pieces)
+    w = (np.arange(len(segment)) - first) / pieces[segment]
+    out_t = np.append(t[segment] + w * dt[segment], t[-1]).astype(t.dtype)
+    delta = angles[segment + 1] - angles[segment]
+    out_angles = np.vstack((angles[segment] + w[:, None] * delta, angles[-1:])).astype(angles.dtype)
+    return out_t, out_angles
+
+
+def compression_report(frames, keyframes, max_error, frame_time):
+    """Отчет сжатия (manifest.pattern_keyframes, заголовок patterns.bin, логи)"""
+    return {"frames": frames, "keyframes": keyframes, "max_error": max_error, "frame_time": frame_time,
+            "ratio": round(frames / keyframes, 2) if keyframes else None}
@@ -0,0 +1,165 @@
+# core/pattern_store.py
+"""
+Хранение паттерна (эталонных углов) в бинарном колоночном виде.
+
+Формат члена `patterns.bin` (little-endian):
+    magic      4s      b"MTPP"
+    version    uint16  1
+    reserved   uint16  0
+    n_frames   uint32
+    n_joints   uint32
+    header_len uint32  длина JSON-заголовка ({"joints": [...], "keyframes": {...}})
+    header     JSON (utf-8), дополнен пробелами до кратности 4 байтам
+    timestamps float32[n_frames]
+    angles     float32[n_joints][n_frames]  (колонка на сустав, NaN = нет данных)
+
+"keyframes" в заголовке есть только у паттерна, сжатого до ключевых строк
+(core/pattern_keyframes.py): max_error, frame_time, frames, keyframes, ratio.
+
+Колонки читаются без копирования (np.frombuffer поверх mmap/bytes).
+"""
+import json
+import mmap
+import os
+import struct
+
+import numpy as np
+
+PATTERNS_BIN_NAME = "patterns.bin"
+MAGIC = b"MTPP"
+VERSION = 1
+_HEADER = struct.Struct("<4sHHIII")
+
+
+class PatternTrack:
+    """
+    Паттерн в виде массивов: timestamps (N,), angles (N, J), joints (J имен).
+    keyframes - отчет сжатия, если строки - ключевые (между ними интерполяция), иначе None.
+    """
+
+    def __init__(self, timestamps, angles, joints, keyframes=None):
+        self.timestamps = timestamps
+        self.angles = angles
+        self.joints = list(joints)
+        self.keyframes = keyframes
+
+    def __len__(self):
+        return len(self.timestamps)
+
+    @classmethod
+    def from_records(cls, records, joints=None):
+        """Из списка {timestamp, angles:{...}} (формат patterns.json)"""
+        if joints is None:
+            joints = []
+            for rec in records:
+                for name in rec.get('angles', {}):
+                    if name not in joints:
+                        joints.append(name)
+
+        timestamps = np.array([rec['timestamp'] for rec in records], dtype=np.float32)
+        angles = np.full((len(records), len(joints)), np.nan, dtype=np.float32)
+        col = {name: j for j, name in enumerate(joints)}
+        for i, rec in enumerate(records):
+            for name, value in rec.get('angles', {}).items():
+                j = col.get(name)
+                if j is not None and value is not None:
+                    angles[i, j] = value
+        return cls(timestamps, angles, joints)
+
+    def to_records(self):
+        """Обратно в список словарей (NaN-углы пропускаются)"""
+        records = []
+        for i, t in enumerate(self.timestamps.tolist()):
+            row = self.angles[i].tolist()
+            records.append({
+                "timestamp": round(t, 3),
+                "angles": {name: v for name, v in zip(self.joints, row) if v == v}
+            })
+        return records
+
+
+def encode_pattern_header(n_frames, joints, keyframes=None):
+    """Заголовок patterns.bin; за ним идут колонки (так его пишет и потоковый writer .mtp)"""
+    meta = {"joints": list(joints)}
+    if keyframes:
+        meta["keyframes"] = keyframes
+    header = json.dumps(meta).encode('utf-8')
+    header += b" " * (-(_HEADER.size + len(header)) % 4)
+    return _HEADER.pack(MAGIC, VERSION, 0, n_frames, len(joints), len(header)) + header
+
+
+def encode_pattern_track(track):
+    """PatternTrack -> bytes в формате patterns.bin"""
+    n_frames, n_joints = len(track.timestamps), len(track.joints)
+    columns = np.ascontiguousarray(np.asarray(track.angles, dtype='<f4').reshape(n_frames, n_joints).T)
+    return b"".join([
+        encode_pattern_header(n_frames, track.joints, track.keyframes),
+        np.asarray(track.timestamps, dtype='<f4').tobytes(),
+        columns.tobytes(),
+    ])
+
+
+def decode_pattern_track(buffer):
+    """
+    bytes/mmap -> PatternTrack без копирования данных.
+    angles возвращается как транспонированный вид колонок (N, J).
+    """
+    magic, version, _, n_frames, n_joints, header_len = _HEADER.unpack_from(buffer, 0)
+    if magic != MAGIC:
+        raise ValueError("Not a patterns.bin track")
+    if version != VERSION:
+        raise ValueError(f"Unsupported patterns.bin version: {version}")
+
+    offset = _HEADER.size
+    meta = json.loads(bytes(buffer[offset:offset + header_len]).decode('utf-8'))
+    offset += header_len
+
+    timestamps = np.frombuffer(buffer, dtype='<f4', count=n_frames, offset=offset)
+    offset += 4 * n_frames
+    columns = np.frombuffer(buffer, dtype='<f4', count=n_frames * n_joints, offset=offset)
+    angles = columns.reshape(n_joints, n_frames).T
+    return PatternTrack(timestamps, angles, meta['joints'], meta.get('keyframes'))
+
+
+def load_pattern_track(path):
+    """Открывает patterns.bin через memory map"""
+    with open(path, 'rb') as f:
+        mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    # mmap живет, пока на него ссылаются numpy-виды
+    return decode_pattern_track(mm)
+
+
+def load_patterns(json_path, bin_path=None):
+    """
+    Загружает паттерн уровня. Предпочитает бинарный член из manifest.files
+    (manifest.json лежит рядом с patterns.json после распаковки .mtp),
+    иначе разбирает patterns.json. Возвращает PatternTrack или None.
+    """
+    manifest = _read_manifest(os.path.dirname(json_path)) if json_path else {}
+    if bin_path is None and manifest.get('files', {}).get('patterns_bin'):
+        bin_path = os.path.join(os.path.dirname(json_path), manifest['files']['patterns_bin'])
+
+    if bin_path and os.path.exists(bin_path):
+        try:
+            return load_pattern_track(bin_path)
+        except (ValueError, OSError, struct.error) as e:
+            print(f"[Patterns] Binary track unreadable, falling back to JSON: {e}")
+
+    if json_path and os.path.exists(json_path):
+        with open(json_path, 'r') as f:
+            track = PatternTrack.from_records(json.load(f))
+        # Отчет сжатия в JSON не попадает - он в manifest
+        track.keyframes = manifest.get('pattern_keyframes')
+        return track
+    return None
+
+
+def _read_manifest(level_dir):
+    manifest_path = os.path.join(level_dir, "manifest.json")
+    if not os.path.exists(manifest_path):
+        return {}
+    try:
+        with open(manifest_path, 'r') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
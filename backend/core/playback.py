@@ -0,0 +1,226 @@
+# core/playback.py
+"""
+Воспроизведение уровня от одних главных часов.
+
+- MediaClock: монотонные часы позиции уровня (секунды видео) с паузой, seek и
+  скоростью speed (0.5 - вдвое медленнее).
+- AudioTrack: звук уровня через ffpyplayer (только аудио, без второго декодера
+  видео); темп меняется фильтром FFmpeg atempo, высота тона сохраняется.
+- PlaybackClock: главные часы - позиция звука, пока он играет, иначе MediaClock.
+- FrameScheduler: на каждом тике решает, какой кадр референса должен быть на
+  экране в момент часов: отстающие кадры пропускает, а если следующий кадр еще
+  не наступил - оставляет прежний. Поэтому медленный тик не копит отставание
+  видео от звука, а при speed < 1 кадры держатся дольше тика.
+"""
+import math
+import time
+
+SPEED_MIN = 0.25
+SPEED_MAX = 2.0
+
+
+def atempo_filter(speed):
+    """Цепочка atempo для скорости speed (один фильтр поддерживает только 0.5..2.0)"""
+    parts = []
+    while speed < 0.5:
+        parts.append(0.5)
+        speed /= 0.5
+    while speed > 2.0:
+        parts.append(2.0)
+        speed /= 2.0
+    parts.append(speed)
+    return ",".join(f"atempo={p:.6g}" for p in parts)
+
+
+class MediaClock:
+    def __init__(self, speed=1.0, clock=time.monotonic):
+        self.speed = speed
+        self._clock = clock
+        self._origin = 0.0  # позиция в момент _anchor
+        self._anchor = None  # момент clock(), с которого часы идут; None - на паузе
+
+    @property
+    def running(self):
+        return self._anchor is not None
+
+    def position(self):
+        if self._anchor is None:
+            return self._origin
+        return self._origin + (self._clock() - self._anchor) * self.speed
+
+    def start(self):
+        if self._anchor is None:
+            self._anchor = self._clock()
+
+    def pause(self):
+        self._origin = self.position()
+        self._anchor = None
+
+    def seek(self, position):
+        self._origin = position
+        if self._anchor is not None:
+            self._anchor = self._clock()
+
+    def set_speed(self, speed):
+        self.seek(self.position())
+        self.speed = speed
+
+
+class AudioTrack:
+    """Звук уровня; player_cls - ffpyplayer MediaPlayer (в тестах - подмена)"""
+
+    def __init__(self, player_cls, path, speed=1.0):
+        self.player_cls = player_cls
+        self.path = path
+        self.player = None
+        self._open(0.0, speed, paused=True)  # стартует вместе с уровнем (PlaybackClock.start)
+
+    def _open(self, start, speed, paused):
+        if self.player is not None:
+            self.player.close_player()
+        opts = {'vn': True, 'paused': paused}
+        if start > 0:
+            opts['ss'] = start
+        if speed != 1.0:
+            opts['af'] = atempo_filter(speed)
+        self.player = self.player_cls(self.path, ff_opts=opts)
+        self.speed = speed
+        self.paused = paused
+        # atempo ставит время выхода от первого сэмпла, поэтому pts идут в реальном времени от start
+        self._start = start
+
+    def position(self):
+        """Позиция уровня по звуку или None, если звук еще не пошел"""
+        pts = self.player.get_pts()
+        if pts is None or not math.isfinite(pts) or (pts == 0.0 and self._start > 0):
+            return None
+        return self._start + (pts - self._start) * self.speed
+
+    def set_pause(self, paused):
+        self.player.set_pause(paused)
+        self.paused = paused
+
+    def seek(self, position):
+        if self.speed == 1.0:
+            self.player.seek(position, relative=False)
+        else:
+            # Время после atempo отсчитывается от начала потока фильтра: проще начать заново
+            self._open(position, self.speed, self.paused)
+
+    def set_speed(self, speed, position):
+        if speed != self.speed:
+            self._open(position, speed, self.paused)
+
+    def close(self):
+        self.player.close_player()
+
+
+class PlaybackClock:
+    """Главные часы уровня: звук (если есть и играет), иначе монотонные часы"""
+
+    # Расхождение (сек), после которого звук считается остановившимся (кончился раньше видео)
+    MAX_AUDIO_GAP = 1.0
+
+    def __init__(self, audio=None, speed=1.0, clock=time.monotonic):
+        self.audio = audio
+        self.fallback = MediaClock(speed, clock)
+
+    @property
+    def speed(self):
+        return self.fallback.speed
+
+    @property
+    def master(self):
+        return "audio" if self.audio is not None else "monotonic"
+
+    def position(self):
+        if self.audio is not None and self.fallback.running:
+            position = self.audio.position()
+            expected = self.fallback.position()
+            if position is not None and abs(position - expected) < self.MAX_AUDIO_GAP:
+                # Монотонные часы догоняют звук: при паузе и после seek позиция не прыгнет
+                self.fallback.seek(position)
+                return position
+            return expected
+        return self.fallback.position()
+
+    def start(self):
+        self.fallback.start()
+        if self.audio is not None:
+            self.audio.set_pause(False)
+
+    def pause(self):
+        position = self.position()
+        self.fallback.pause()
+        self.fallback.seek(position)
+        if self.audio is not None:
+            self.audio.set_pause(True)
+
+    def seek(self, position):
+        self.fallback.seek(position)
+        if self.audio is not None:
+            self.audio.seek(position)
+
+    def set_speed(self, speed):
+        position = self.position()
+        self.fallback.seek(position)
+        self.fallback.set_speed(speed)
+        if self.audio is not None:
+            self.audio.set_speed(speed, position)
+
+    def close(self):
+        if self.audio is not None:
+            self.audio.close()
+
+
+class FrameScheduler:
+    """Выбор кадра референса под позицию главных часов (reader - PrefetchReader)"""
+
+    # Отставание (сек), начиная с которого дешевле seek, чем декодировать и выбрасывать кадры
+    RESYNC_LAG = 0.5
+
+    def __init__(self, reader, frame_time):
+        self.reader = reader
+        self.frame_time = frame_time
+        self._pending = None  # следующий кадр, время которого еще не наступило
+
+    def reset(self):
+        """После seek ридера: прочитанный наперед кадр больше не следующий"""
+        self._pending = None
+
+    def _next(self, timeout):
+        item, self._pending = self._pending, None
+        return item if item is not None else self.reader.read_frame(timeout=timeout)
+
+    def advance(self, position, timeout=None):
+        """
+        Кадр, который должен быть на экране в момент position:
+        (новый кадр или None - держать прежний, сколько кадров пропущено, опоздал ли декодер).
+        """
+        # Кадр k показывается с момента своего времени до времени k+1; полкадра допуска на дрожание тика
+        due = position + self.frame_time / 2.0
+        item = self._next(timeout)
+        if item is None:
+            return None, 0, not self.reader.eof
+
+        if item.pos_msec / 1000.0 < position - self.RESYNC_LAG:
+            resynced = self.reader.seek_time(position)
+            if resynced is not None:
+                skipped = max(int(round((resynced.pos_msec - item.pos_msec) / 1000.0 / self.frame_time)), 0)
+                return resynced, skipped, False
+
+        if item.pos_msec / 1000.0 > due:
+            self._pending = item
+            return None, 0, False
+
+        skipped = 0
+        while True:
+            following = self.reader.read_frame(timeout=0)
+            if following is None:
+                break
+            if following.pos_msec / 1000.0 > due:
+                self._pending = following
+                break
+            skipped += 1
+            item = following
+        return item, skipped, False
@@ -1,18 +1,30 @@
 # core/pose_engine.py
-import mediapipe as mp
 import cv2
+import numpy as np
+
+from backend.core.pose_tracking import PoseSample
+
+# Размер пустого кадра для прогрева графа
+WARM_UP_SIZE = (256, 256)
+
+
+def _pose_solution():
+    # mediapipe импортируется при первом обращении: сам импорт занимает секунды,
+    # а движку он нужен только к первому кадру (или в фоновом прогреве)
+    import mediapipe as mp
+    return mp.solutions.pose
 
 
 class PoseEngine:
     def __init__(self, static_mode=False, model_complexity=1):
-        self.mp_pose = mp.solutions.pose
-        self.mp_draw = mp.solutions.drawing_utils
-        self.pose = self.mp_pose.Pose(
-            static_image_mode=static_mode,
-            model_complexity=model_complexity,
-            min_detection_confidence=0.5,
-            min_tracking_confidence=0.5
-        )
+        """
+        Конструктор дешевый: граф MediaPipe создается при первом process_frame
+        или в warm_up(). Общие экземпляры выдает PosePool (core/model_pool.py).
+        """
+        self.static_mode = static_mode
+        self.model_complexity = model_complexity
+        self._pose = None
+        self._connections = None
         # Индексы ключевых точек (чтобы не путаться в цифрах)
         self.JOINTS = {
             'LEFT_SHOULDER': 11, 'RIGHT_SHOULDER': 12,
@@ -23,8 +35,72 @@ class PoseEngine:
             'LEFT_ANKLE': 27, 'RIGHT_ANKLE': 28
         }
 
-    def process_frame(self, frame):
-        """Возвращает результаты MediaPipe для кадра"""
+    @property
+    def pose(self):
+        if self._pose is None:
+            self._pose = self._create_pose()
+        return self._pose
+
+    @property
+    def connections(self):
+        if self._connections is None:
+            self._connections = list(_pose_solution().POSE_CONNECTIONS)
+        return self._connections
+
+    @property
+    def loaded(self):
+        return self._pose is not None
+
+    def _create_pose(self):
+        return _pose_solution().Pose(
+            static_image_mode=self.static_mode,
+            model_complexity=self.model_complexity,
+            min_detection_confidence=0.5,
+            min_tracking_confidence=0.5
+        )
+
+    def set_model_complexity(self, model_complexity):
+        """Пересоздает граф MediaPipe с другой моделью (0 - lite, 1 - full, 2 - heavy)"""
+        if model_complexity == self.model_complexity:
+            return
+        self.model_complexity = model_complexity
+        if self._pose is not None:
+            self._pose.close()
+            self._pose = self._create_pose()
+
+    def warm_up(self):
+        """Создает граф и прогоняет пустой кадр: первый инференс (загрузка модели) - не в игре"""
+        self.connections
+        self.process_frame(np.zeros((WARM_UP_SIZE[1], WARM_UP_SIZE[0], 3), dtype=np.uint8))
+        self.reset()
+
+    def reset(self):
+        """Сбрасывает состояние трекинга (новое видео/пользователь), граф остается"""
+        if self._pose is None:
+            return
+        reset = getattr(self._pose, 'reset', None)
+        if reset is not None:
+            reset()
+        else:
+            self._pose.close()
+            self._pose = self._create_pose()
+
+    def close(self):
+        if self._pose is not None:
+            self._pose.close()
+            self._pose = None
+
+    def process_frame(self, frame, max_height=None):
+        """
+        Возвращает результаты MediaPipe для кадра.
+        max_height: кадр выше этого уменьшается перед инференсом (модель все равно
+        работает на ~256 px). Нормализованные landmarks от масштаба не зависят,
+        world landmarks - в метрах, поэтому результат переносится на любой размер кадра.
+        """
+        h, w = frame.shape[:2]
+        if max_height and h > max_height:
+            frame = cv2.resize(frame, (max(1, round(w * max_height / h)), max_height),
+                               interpolation=cv2.INTER_AREA)
         frame_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
         return self.pose.process(frame_rgb)
 
@@ -37,4 +113,48 @@ class PoseEngine:
         landmarks = {}
         for id, lm in enumerate(results.pose_world_landmarks.landmark):
             landmarks[id] = [lm.x, lm.y, lm.z]
-        return landmarks
\ No newline at end of file
+        return landmarks
+
+    def get_landmark_array(self, results):
+        """3D координаты (в метрах) массивом (33, 3) для пакетного расчета углов"""
+        if not results.pose_world_landmarks:
+            return None
+        return np.array(
+            [(lm.x, lm.y, lm.z) for lm in results.pose_world_landmarks.landmark], dtype=np.float32
+        )
+
+    def get_landmark_tensor(self, results):
+        """(33, 4) float32: мировые x, y, z (метры) и visibility - все, что digitizer хранит о позе"""
+        if not results.pose_world_landmarks:
+            return None
+        return np.array(
+            [(lm.x, lm.y, lm.z, lm.visibility) for lm in results.pose_world_landmarks.landmark],
+            dtype=np.float32
+        )
+
+    def get_sample(self, results):
+        """PoseSample (массивы world/image/visibility) или None, если поза не найдена"""
+        if not results.pose_world_landmarks or not results.pose_landmarks:
+            return None
+        world = self.get_landmark_array(results)
+        image = np.array(
+            [(lm.x, lm.y, lm.z, lm.visibility) for lm in results.pose_landmarks.landmark], dtype=np.float32
+        )
+        return PoseSample(world, image[:, :3], image[:, 3])
+
+    def draw_sample(self, frame, sample, min_visibility=0.5, scale=1.0):
+        """
+        Рисует скелет по PoseSample (в т.ч. предсказанному между инференсами).
+        scale: во сколько раз кадр будет увеличен при показе - толщина линий
+        подбирается так, чтобы после масштабирования скелет выглядел одинаково.
+        """
+        h, w = frame.shape[:2]
+        points = np.rint(sample.image[:, :2] * (w, h)).astype(np.int32)
+        visible = sample.visibility >= min_visibility
+        thickness = max(1, round(2 / scale))
+        radius = max(1, round(3 / scale))
+        for a, b in self.connections:
+            if visible[a] and visible[b]:
+                cv2.line(frame, tuple(points[a].tolist()), tuple(points[b].tolist()), (224, 224, 224), thickness)
+        for i in np.flatnonzero(visible):
+            cv2.circle(frame, tuple(points[i].tolist()), radius, (0, 0, 255), -1)
@@ -0,0 +1,198 @@
+# core/pose_tracking.py
+"""
+Слой между MediaPipe и игровым циклом:
+
+- PoseSample: поза кадра массивами (world/image landmarks + visibility),
+  не зависит от protobuf MediaPipe (можно передавать между процессами).
+- OneEuroFilter / LandmarkTracker: сглаживание One-Euro и дешевая
+  экстраполяция позы на кадрах, где инференс пропущен.
+- InferenceGovernor: меряет время инференса и под нагрузкой запускает
+  MediaPipe только на каждом N-м кадре, а затем понижает model_complexity.
+"""
+import math
+import time
+
+import numpy as np
+
+
+class PoseSample:
+    __slots__ = ('world', 'image', 'visibility', 'predicted')
+
+    def __init__(self, world, image, visibility, predicted=False):
+        self.world = world  # (33, 3) метры, для углов
+        self.image = image  # (33, 3) нормализованные x, y (0..1) и z, для отрисовки
+        self.visibility = visibility  # (33,)
+        self.predicted = predicted  # True - экстраполяция, а не инференс
+
+
+def map_region_sample(sample, region, frame_size):
+    """
+    Переводит image-координаты позы, найденной в вырезке region = (x0, y0, x1, y1),
+    в нормализованные координаты всего кадра frame_size = (h, w)
+    """
+    x0, y0, x1, y1 = region
+    h, w = frame_size
+    image = np.array(sample.image, dtype=np.float32, copy=True)
+    image[:, 0] = (x0 + image[:, 0] * (x1 - x0)) / w
+    image[:, 1] = (y0 + image[:, 1] * (y1 - y0)) / h
+    return PoseSample(sample.world, image, sample.visibility, sample.predicted)
+
+
+class OneEuroFilter:
+    """Фильтр One-Euro (Casiez et al.) для массива значений одинаковой формы"""
+
+    def __init__(self, min_cutoff=1.0, beta=0.05, d_cutoff=1.0):
+        self.min_cutoff = min_cutoff
+        self.beta = beta
+        self.d_cutoff = d_cutoff
+        self.reset()
+
+    def reset(self):
+        self.x = None
+        self.dx = None
+        self.t = None
+
+    @staticmethod
+    def _alpha(cutoff, dt):
+        tau = 1.0 / (2.0 * math.pi * cutoff)
+        return 1.0 / (1.0 + tau / dt)
+
+    def __call__(self, t, x):
+        x = np.asarray(x, dtype=np.float64)
+        if self.x is None:
+            self.x, self.dx, self.t = x, np.zeros_like(x), t
+            return x
+
+        dt = max(t - self.t, 1e-6)
+        dx = (x - self.x) / dt
+        self.dx = self.dx + self._alpha(self.d_cutoff, dt) * (dx - self.dx)
+
+        cutoff = self.min_cutoff + self.beta * np.abs(self.dx)
+        alpha = 1.0 / (1.0 + 1.0 / (2.0 * math.pi * cutoff * dt))
+        self.x = self.x + alpha * (x - self.x)
+        self.t = t
+        return self.x
+
+    def predict(self, t, max_horizon=0.25):
+        """Линейная экстраполяция по отфильтрованной скорости (не дальше max_horizon сек)"""
+        if self.x is None:
+            return None
+        dt = min(max(t - self.t, 0.0), max_horizon)
+        return self.x + self.dx * dt
+
+
+class LandmarkTracker:
+    """Сглаживает позы после инференса и предсказывает позы между инференсами"""
+
+    def __init__(self, min_cutoff=1.0, beta=0.05):
+        self._world = OneEuroFilter(min_cutoff, beta)
+        self._image = OneEuroFilter(min_cutoff, beta)
+        self._visibility = None
+
+    def reset(self):
+        self._world.reset()
+        self._image.reset()
+        self._visibility = None
+
+    def update(self, t, sample):
+        self._visibility = sample.visibility
+        return PoseSample(self._world(t, sample.world), self._image(t, sample.image), sample.visibility)
+
+    def predict(self, t):
+        world = self._world.predict(t)
+        if world is None:
+            return None
+        return PoseSample(world, self._image.predict(t), self._visibility, predicted=True)
+
+
+class InferenceGovernor:
+    """
+    Решает, на каких кадрах запускать инференс.
+
+    Режимы: "full" - каждый кадр; "stride" - каждый N-й кадр (остальные
+    предсказываются); "lite" - максимальный шаг и пониженная model_complexity.
+    budget_ms - сколько времени кадра можно отдать инференсу.
+    """
+
+    def __init__(self, budget_ms=20.0, max_stride=3, complexity=1, min_complexity=0,
+                 smoothing=0.2, settle_frames=15):
+        self.budget_ms = budget_ms
+        self.max_stride = max_stride
+        self.base_complexity = complexity
+        self.min_complexity = min_complexity
+        self.smoothing = smoothing
+        self.settle_frames = settle_frames
+        self.reset()
+
+    def reset(self):
+        self.stride = 1
+        self.complexity = self.base_complexity
+        self.infer_ms = None  # EMA времени инференса
+        self._frame = 0
+        self._since_change = 0
+        self._infer_times = []  # моменты инференсов за последнюю секунду
+
+    @property
+    def mode(self):
+        if self.complexity < self.base_complexity:
+            return "lite"
+        return "stride" if self.stride > 1 else "full"
+
+    def should_infer(self):
+        """Вызывается на каждом кадре; True - этот кадр нужно прогнать через MediaPipe"""
+        self._frame += 1
+        self._since_change += 1
+        return self.infer_ms is None or self._frame % self.stride == 0
+
+    def record(self, elapsed_ms, now=None):
+        """
+        Сообщает время инференса. Возвращает новую model_complexity,
+        если ее нужно сменить, иначе None.
+        """
+        now = time.monotonic() if now is None else now
+        self._infer_times = [t for t in self._infer_times if now - t < 1.0] + [now]
+
+        if self.infer_ms is None:
+            self.infer_ms = elapsed_ms
+        else:
+            self.infer_ms += self.smoothing * (elapsed_ms - self.infer_ms)
+
+        if self._since_change < self.settle_frames:
+            return None
+
+        # Средняя цена инференса на кадр = infer_ms / stride
+        per_frame = self.infer_ms / self.stride
+        if per_frame > self.budget_ms:
+            if self.stride < self.max_stride:
+                self.stride += 1
+            elif self.complexity > self.min_complexity:
+                return self._set_complexity(self.complexity - 1)
+            self._since_change = 0
+        elif self.infer_ms < self.budget_ms * 0.5 * (self.stride - 1 or 1):
+            # Запас большой: сначала возвращаем сложность модели, потом частоту
+            if self.complexity < self.base_complexity:
+                return self._set_complexity(self.complexity + 1)
+            if self.stride > 1:
+                self.stride -= 1
+                self._since_change = 0
+        return None
+
+    def _set_complexity(self, complexity):
+        self.complexity = complexity
+        self.infer_ms = None  # другая модель - другая цена, меряем заново
+        self._since_change = 0
+        return complexity
+
+    @property
+    def rate(self):
+        """Фактическое число инференсов в секунду"""
+        return len(self._infer_times)
+
+    def meta(self):
+        return {
+            "mode": self.mode,
+            "stride": self.stride,
+            "complexity": self.complexity,
+            "rate": self.rate,
+            "infer_ms": round(self.infer_ms, 1) if self.infer_ms is not None else None,
+        }
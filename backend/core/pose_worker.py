@@ -0,0 +1,271 @@
+# core/pose_worker.py
+"""
+Бэкенды инференса позы для игрового цикла.
+
+- InlinePoseBackend: MediaPipe в главном потоке (как раньше), результат
+  готов сразу после submit().
+- ProcessPoseBackend: MediaPipe в отдельном процессе. Кадры передаются
+  через SharedFrameRing (core/shm_transport.py), в очередь уходит только
+  дескриптор слота. Пока воркер считает кадр N, главный цикл рисует,
+  кодирует и публикует кадр N-1: время кадра становится максимумом стадий,
+  а не их суммой.
+
+Оба бэкенда работают по одной схеме: submit(seq, frame) -> позже collect()
+возвращает [(seq, PoseSample | None, infer_ms)]. Номер кадра seq позволяет
+сопоставить результат с моментом захвата. infer_ms = None означает, что кадр
+потерян (слот перезаписан) и позы по нему не будет.
+
+PosePipeline связывает бэкенд с InferenceGovernor и LandmarkTracker
+(core/pose_tracking.py) - это конвейер позы одного игрока.
+"""
+import multiprocessing
+import queue
+import time
+
+from backend.core.frame_encoder import fit_height
+from backend.core.pose_tracking import map_region_sample
+from backend.core.shm_transport import SharedFrameRing, default_shm_path
+
+# Высота кадра пользователя для MediaPipe: модель работает на ~256 px, больше - лишние пиксели
+DEFAULT_INFERENCE_HEIGHT = 360
+# Доля тика, которую можно отдать инференсу позы (остальное - чтение, JPEG, отправка)
+INFERENCE_BUDGET_SHARE = 0.5
+# С воркером инференс идет параллельно циклу и может занимать почти весь тик
+WORKER_BUDGET_SHARE = 0.9
+
+
+def shrink_to_height(frame, max_height):
+    """Уменьшает кадр до max_height (кадры ниже не трогаем)"""
+    if max_height and frame.shape[0] > max_height:
+        return fit_height(frame, max_height)
+    return frame
+
+
+def _pose_worker_main(requests, results, model_complexity):
+    """Точка входа процесса инференса"""
+    from backend.core.pose_engine import PoseEngine
+
+    engine = PoseEngine(model_complexity=model_complexity)
+    # Модель грузится сразу при старте воркера, а не на первом кадре уровня
+    engine.warm_up()
+    ring = None
+    try:
+        while True:
+            message = requests.get()
+            if message is None:
+                break
+            kind = message[0]
+            if kind == "ring":
+                if ring is not None:
+                    ring.close()
+                ring = SharedFrameRing.open(message[1])
+            elif kind == "complexity":
+                engine.set_model_complexity(message[1])
+            elif kind == "frame":
+                _, seq, desc = message
+                frame = ring.read(desc) if ring is not None else None
+                if frame is None:
+                    results.put((seq, None, None))
+                    continue
+                started = time.perf_counter()
+                sample = engine.get_sample(engine.process_frame(frame))
+                results.put((seq, sample, (time.perf_counter() - started) * 1000.0))
+    finally:
+        if ring is not None:
+            ring.close()
+
+
+class InlinePoseBackend:
+    # Инференс делит тик с остальными стадиями
+    parallel = False
+
+    def __init__(self, engine, max_height=None, pool=None):
+        """pool: PosePool, из которого взят engine (вернется туда при close)"""
+        self.engine = engine
+        self.max_height = max_height
+        self.pool = pool
+        self._done = []
+
+    def can_submit(self):
+        return True
+
+    def submit(self, seq, frame):
+        started = time.perf_counter()
+        sample = self.engine.get_sample(self.engine.process_frame(frame, self.max_height))
+        self._done.append((seq, sample, (time.perf_counter() - started) * 1000.0))
+
+    def collect(self):
+        done, self._done = self._done, []
+        return done
+
+    def set_model_complexity(self, model_complexity):
+        self.engine.set_model_complexity(model_complexity)
+
+    def close(self):
+        if self.pool is not None:
+            self.pool.release(self.engine)
+            self.pool = None
+
+
+class ProcessPoseBackend:
+    # Инференс идет параллельно главному циклу
+    parallel = True
+
+    def __init__(self, max_height=None, model_complexity=1, depth=2, target=_pose_worker_main):
+        """
+        depth: сколько кадров может одновременно ждать инференса (глубина конвейера).
+        Больше - выше пропускная способность, но и задержка позы на экране.
+        """
+        self.max_height = max_height
+        self.depth = max(1, depth)
+        self.ring = None
+        self._in_flight = set()
+
+        # spawn: в родителе работают потоки и сокеты ZMQ
+        mp = multiprocessing.get_context("spawn")
+        self._requests = mp.Queue()
+        self._results = mp.Queue()
+        self.process = mp.Process(
+            target=target, args=(self._requests, self._results, model_complexity),
+            name="pose-worker", daemon=True,
+        )
+        self.process.start()
+
+    @property
+    def alive(self):
+        return self.process.is_alive()
+
+    def can_submit(self):
+        return len(self._in_flight) < self.depth
+
+    def _ensure_ring(self, frame):
+        h, w = frame.shape[:2]
+        channels = frame.shape[2] if frame.ndim == 3 else 1
+        if self.ring is not None and frame.nbytes <= self.ring.slot_size:
+            return
+        if self.ring is not None:
+            # Кадр больше слота: новое кольцо. Воркер держит свое отображение старого,
+            # пока не дочитает кадры, отправленные до сообщения "ring"
+            self.ring.close()
+        # Слотов на один больше глубины: кадр в работе не перезаписывается
+        self.ring = SharedFrameRing(default_shm_path("motion_pose"), slot_count=self.depth + 1,
+                                    max_width=w, max_height=h, channels=channels)
+        self._requests.put(("ring", self.ring.path))
+
+    def submit(self, seq, frame):
+        frame = shrink_to_height(frame, self.max_height)
+        self._ensure_ring(frame)
+        desc = self.ring.write(frame)
+        self._requests.put(("frame", seq, desc))
+        self._in_flight.add(seq)
+
+    def collect(self):
+        """Готовые результаты без ожидания; RuntimeError, если воркер умер"""
+        done = []
+        while True:
+            try:
+                result = self._results.get_nowait()
+            except queue.Empty:
+                break
+            self._in_flight.discard(result[0])
+            done.append(result)
+        if not done and self._in_flight and not self.alive:
+            raise RuntimeError(f"Pose worker exited with code {self.process.exitcode}")
+        return done
+
+    def set_model_complexity(self, model_complexity):
+        self._requests.put(("complexity", model_complexity))
+
+    def close(self):
+        if self.alive:
+            self._requests.put(None)
+            self.process.join(timeout=2)
+        if self.alive:
+            self.process.terminate()
+            self.process.join(timeout=1)
+        if self.ring is not None:
+            self.ring.close()
+            self.ring = None
+        self._requests.close()
+        self._results.close()
+
+
+class PosePipeline:
+    """
+    Конвейер позы одного игрока: бэкенд инференса + governor + трекер.
+    process() вызывается на каждом кадре и возвращает позу текущего кадра:
+    результат его инференса, если он уже готов, иначе предсказание трекера.
+    """
+
+    def __init__(self, backend, governor, tracker, fallback=None):
+        """fallback: фабрика InlinePoseBackend на случай, если воркер упадет"""
+        self.backend = backend
+        self.governor = governor
+        self.tracker = tracker
+        self.fallback = fallback
+        self.frame_ms = 33.0
+        self._seq = 0
+        self._pending = {}  # seq -> (момент захвата, region, размер кадра)
+        self._update_budget()
+
+    def set_frame_time(self, frame_ms):
+        self.frame_ms = frame_ms
+        self._update_budget()
+
+    def _update_budget(self):
+        share = WORKER_BUDGET_SHARE if self.backend.parallel else INFERENCE_BUDGET_SHARE
+        self.governor.budget_ms = self.frame_ms * share
+
+    def process(self, frame, t, region=None):
+        """
+        frame: кадр пользователя; t: момент захвата (time.monotonic());
+        region: (x0, y0, x1, y1) - инференс только по этой части кадра (мультиплеер).
+        Координаты image в ответе всегда относятся ко всему кадру.
+        """
+        self._seq += 1
+        seq = self._seq
+        if self.governor.should_infer() and self.backend.can_submit():
+            crop = frame
+            if region is not None:
+                x0, y0, x1, y1 = region
+                crop = frame[y0:y1, x0:x1]
+            self._pending[seq] = (t, region, frame.shape[:2])
+            self.backend.submit(seq, crop)
+
+        try:
+            results = self.backend.collect()
+        except RuntimeError as e:
+            if self.fallback is None:
+                raise
+            print(f"[PosePipeline] {e}. Falling back to inline inference.")
+            self.backend.close()
+            self.backend = self.fallback()
+            self._pending.clear()
+            self._update_budget()
+            results = []
+
+        current = None
+        for result_seq, sample, infer_ms in sorted(results, key=lambda r: r[0]):
+            captured_at, result_region, frame_size = self._pending.pop(result_seq, (t, None, None))
+            if infer_ms is None:
+                continue  # кадр потерян по дороге к воркеру
+
+            complexity = self.governor.record(infer_ms)
+            if complexity is not None:
+                print(f"[Governor] model_complexity -> {complexity}")
+                self.backend.set_model_complexity(complexity)
+
+            if sample is None:
+                self.tracker.reset()
+                current = None
+                continue
+            if result_region is not None:
+                sample = map_region_sample(sample, result_region, frame_size)
+            current = self.tracker.update(captured_at, sample)
+            if result_seq != seq:
+                current = None
+
+        return current if current is not None else self.tracker.predict(t)
+
+    def close(self):
+        self.backend.close()
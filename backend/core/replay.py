@@ -0,0 +1,262 @@
+# core/replay.py
+"""
+Offline replay: прогон записанного видео пользователя через игровой конвейер.
+
+Тот же шаг кадра, что в GameEngine._loop_playing (multiplayer.play_frame:
+инференс -> углы -> скоринг с учетом no_score_zone; при render - draw_players и
+JPEG), и тот же разбор .mtp через LevelCache, но без камеры, ZeroMQ и пауз
+между кадрами: кадры идут подряд из VideoFileSource(realtime=False), а время
+уровня берется из позиции кадра в записи. Поэтому прогон идет так быстро, как
+позволяет железо, и результат не зависит от загрузки машины (инференс на каждом
+кадре, без stride/lite).
+
+Результат - JSONL-лог: строка на кадр (рейтинг, счет, точки скелета) и
+последняя строка {"summary": {...}}. replay_many прогоняет несколько записей
+параллельно, по процессу на запись.
+"""
+import json
+import multiprocessing as mp
+import os
+import time
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+
+import cv2
+import numpy as np
+
+from backend.core.frame_encoder import FrameEncoder
+from backend.core.frame_source import VideoFileSource
+from backend.core.geometry import DEFAULT_ANGLE_TABLE
+from backend.core.level_cache import LevelCache, member_name, open_video_capture
+from backend.core.metrics import Metrics
+from backend.core.model_pool import pose_pool
+from backend.core.multiplayer import Player, draw_players, play_frame
+from backend.core.pattern_index import PatternTimeline
+from backend.core.pattern_store import load_patterns
+from backend.core.pose_tracking import InferenceGovernor, LandmarkTracker
+from backend.core.pose_worker import DEFAULT_INFERENCE_HEIGHT, InlinePoseBackend, PosePipeline
+from backend.core.scoring import StreamingScorer
+from backend.core.timeline_index import TimelineIndex, load_timeline_events
+
+
+def resolve_level(path, level_cache=None):
+    """
+    Файлы уровня по manifest.json: path - распакованная папка уровня или .mtp.
+    Архив открывается через LevelCache, как при load с mtp_path (те же пути и
+    разобранный таймлайн; несжатое видео читается прямо из архива).
+    Возвращает {"video", "patterns", "patterns_bin", "timeline_events"}; video - путь
+    или subfile-URL для open_video_capture, пути - None, если файла нет.
+    """
+    if zipfile.is_zipfile(path):
+        cached = (level_cache or LevelCache()).open(path)
+        return {"video": cached.video, "patterns": None, "patterns_bin": cached.patterns_bin,
+                "timeline_events": cached.timeline_events}
+
+    with open(os.path.join(path, "manifest.json"), 'r') as f:
+        files = json.load(f).get('files', {})
+
+    def member(key):
+        name = member_name(files.get(key))
+        return os.path.join(path, name) if name else None
+
+    return {
+        "video": member("video"),
+        "patterns": member("patterns"),
+        "patterns_bin": member("patterns_bin"),
+        "timeline_events": load_timeline_events(member("timeline")),
+    }
+
+
+class ReplaySession:
+    def __init__(self, level_path, user_video, log_path=None, render=False, mirror=False, offset=0.0,
+                 inference_height=DEFAULT_INFERENCE_HEIGHT, model_complexity=1, tolerance=25,
+                 engine=None, cache_dir=None):
+        """
+        level_path: .mtp или папка уровня; user_video: запись пользователя
+        log_path: куда писать JSONL (None - лог не пишется, только summary)
+        render: рисовать скелет и кодировать JPEG как в игре (нагрузочный прогон)
+        mirror: отзеркалить кадры (как делает игра с вебкой; recorder.py пишет уже зеркальное видео)
+        offset: момент уровня (сек), соответствующий началу записи
+        engine: PoseEngine (по умолчанию берется из пула процесса; в тестах - подмена)
+        cache_dir: корень LevelCache для .mtp (None - общий кеш уровней)
+        """
+        self.level_path = level_path
+        self.user_video = user_video
+        self.log_path = log_path
+        self.render = render
+        self.mirror = mirror
+        self.offset = offset
+        self.inference_height = inference_height
+        self.model_complexity = model_complexity
+        self.tolerance = tolerance
+        self.engine = engine
+        self.cache_dir = cache_dir
+        self.metrics = Metrics()
+
+    def _create_backend(self):
+        if self.engine is not None:
+            return InlinePoseBackend(self.engine, self.inference_height)
+        pool = pose_pool()
+        engine = pool.acquire(model_complexity=self.model_complexity)
+        return InlinePoseBackend(engine, self.inference_height, pool=pool)
+
+    def run(self):
+        """Прогоняет запись целиком, возвращает summary"""
+        return self._run(resolve_level(self.level_path, LevelCache(self.cache_dir)))
+
+    def _run(self, level):
+        track = load_patterns(level["patterns"], level["patterns_bin"])
+        patterns = PatternTimeline.from_track(track) if track is not None else None
+        scorer = StreamingScorer(patterns, DEFAULT_ANGLE_TABLE.names, tolerance=self.tolerance) \
+            if patterns is not None else None
+        timeline = TimelineIndex(level["timeline_events"])
+
+        source = VideoFileSource(self.user_video, realtime=False)
+
+        # Инференс на каждом кадре с постоянной сложностью модели: скорость не влияет на результат
+        governor = InferenceGovernor(max_stride=1, complexity=self.model_complexity,
+                                     min_complexity=self.model_complexity)
+        backend = self._create_backend()
+        engine = backend.engine
+        player = Player(1, PosePipeline(backend, governor, LandmarkTracker()))
+        player.scorer = scorer
+        ref = self._open_reference(level) if self.render else None
+        encoder = FrameEncoder() if self.render else None
+        log = open(self.log_path, 'w') if self.log_path else None
+        player.pipeline.set_frame_time(1000.0 / source.fps)
+
+        metrics = self.metrics
+        ratings = {}
+        frames = 0
+        started_at = time.perf_counter()
+        try:
+            while True:
+                started = metrics.now()
+                item = source.read_frame()
+                metrics.record("capture", started)
+                if item is None:
+                    break
+                frames += 1
+                frame = cv2.flip(item.frame, 1) if self.mirror else item.frame
+                t = item.captured_at + self.offset
+
+                play_frame([player], frame, t, t, timeline, metrics)
+                result = player.result
+                if result is not None:
+                    ratings[result["rating"]] = ratings.get(result["rating"], 0) + 1
+
+                if self.render:
+                    self._render(ref, encoder, engine, frame, player, t)
+
+                if log is not None:
+                    log.write(json.dumps(self._frame_record(frames, t, player.sample, result, scorer)) + "\n")
+        finally:
+            source.release()
+            if ref is not None:
+                ref.release()
+            if encoder is not None:
+                encoder.close()
+            if log is not None:
+                log.close()
+            player.close()
+
+        elapsed = time.perf_counter() - started_at
+        summary = {
+            "level": self.level_path,
+            "user_video": self.user_video,
+            "frames": frames,
+            "duration": round(frames / source.fps, 3),
+            "score": scorer.score if scorer else 0,
+            "best_streak": scorer.best_streak if scorer else 0,
+            "ratings": ratings,
+            "elapsed": round(elapsed, 3),
+            "fps": round(frames / elapsed, 1) if elapsed > 0 else None,
+            "realtime_factor": round(frames / source.fps / elapsed, 2) if elapsed > 0 else None,
+            "stages_ms": metrics.snapshot()["stages_ms"],
+        }
+        if self.log_path:
+            with open(self.log_path, 'a') as f:
+                f.write(json.dumps({"summary": summary}) + "\n")
+        return summary
+
+    @staticmethod
+    def _frame_record(index, t, sample, result, scorer):
+        record = {"frame": index, "time": round(t, 3), "score": scorer.score if scorer else 0}
+        if result is not None:
+            record.update(rating=result["rating"], error=result["error"], lag=result["lag"],
+                          streak=result["streak"])
+        if sample is not None:
+            # [x, y, visibility] на точку, x/y нормализованы к кадру пользователя
+            points = np.column_stack((sample.image[:, :2], sample.visibility)).astype(np.float64)
+            record["landmarks"] = np.round(points, 3).tolist()
+            record["predicted"] = bool(sample.predicted)
+        else:
+            record["landmarks"] = None
+        return record
+
+    def _open_reference(self, level):
+        cap = open_video_capture(level["video"]) if level["video"] else None
+        if cap is None or not cap.isOpened():
+            raise FileNotFoundError(f"Level video not found: {self.level_path}")
+        return _ReferenceFrames(cap)
+
+    def _render(self, ref, encoder, engine, frame, player, t):
+        metrics = self.metrics
+        frame_ref = ref.at(t)
+        display_height = frame_ref.shape[0] if frame_ref is not None else frame.shape[0]
+        display_scale = display_height / frame.shape[0]
+
+        draw_players(engine, frame, [player], display_scale, metrics)
+
+        started = metrics.now()
+        encoder.encode_pair(frame_ref if frame_ref is not None else frame, frame, user_height=display_height)
+        metrics.record("encode", started)
+
+
+class _ReferenceFrames:
+    """Кадр референса для момента t при последовательном проходе (без seek)"""
+
+    def __init__(self, cap):
+        self.cap = cap
+        self.fps = cap.get(cv2.CAP_PROP_FPS) or 30.0
+        self._index = -1
+        self._frame = None
+
+    def at(self, t):
+        target = int(t * self.fps)
+        while self._index < target:
+            ret, frame = self.cap.read()
+            if not ret:
+                break
+            self._index += 1
+            self._frame = frame
+        return self._frame
+
+    def release(self):
+        self.cap.release()
+
+
+def replay_session(level_path, user_video, log_path=None, **options):
+    return ReplaySession(level_path, user_video, log_path, **options).run()
+
+
+def _replay_job(args):
+    level_path, user_video, log_path, options = args
+    try:
+        return replay_session(level_path, user_video, log_path, **options)
+    except Exception as e:
+        # Одна битая запись не должна останавливать весь пакет
+        return {"level": level_path, "user_video": user_video, "error": str(e)}
+
+
+def replay_many(level_path, recordings, workers=None, **options):
+    """
+    recordings: [(user_video, log_path), ...]. Каждая запись - в своем процессе
+    (у MediaPipe свой граф на процесс). Возвращает summary в порядке recordings.
+    """
+    jobs = [(level_path, video, log, options) for video, log in recordings]
+    workers = min(workers or os.cpu_count() or 1, len(jobs))
+    if workers <= 1:
+        return [_replay_job(job) for job in jobs]
+    with ProcessPoolExecutor(max_workers=workers, mp_context=mp.get_context("spawn")) as pool:
+        return list(pool.map(_replay_job, jobs))
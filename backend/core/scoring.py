@@ -0,0 +1,155 @@
+# core/scoring.py
+"""
+Потоковый скоринг: углы пользователя против эталонного паттерна.
+
+Каждый кадр пользователя сравнивается не с одной эталонной позой в момент t,
+а со всеми сэмплами окна [t - max_lag, t + lookahead]. Поверх окна ведется
+инкрементальный DTW (одна колонка матрицы на кадр):
+
+    A[j] = (1 - forget) * c[j] + forget * min(D_prev[j], D_prev[j - 1])
+    D[j] = min(A[j], D[j - 1] + (1 - forget) * c[j])
+
+c[j] - средняя по суставам |угол пользователя - угол эталона j|. Коэффициент
+forget делает стоимость экспоненциально затухающим средним, поэтому она
+не растет с длиной уровня. Горизонтальный шаг (эталон ушел вперед без
+пользователя) считается через накопительный минимум, без цикла Python.
+Путь может начаться в любом сэмпле окна (open-begin), поэтому отставание
+пользователя на полтакта не считается ошибкой.
+
+Стоимость кадра - O(окно x суставы), от длины уровня не зависит
+(целевой бюджет: < 1 мс на кадр на CPU ноутбука).
+"""
+import numpy as np
+
+PERFECT = "PERFECT!"
+GOOD = "GOOD"
+MISS = "MISS"
+
+# Очки за кадр по оценке
+POINTS = {PERFECT: 3, GOOD: 1, MISS: 0}
+
+
+class StreamingScorer:
+    def __init__(self, patterns, joints, tolerance=25.0, max_lag=0.75, lookahead=0.25,
+                 forget=0.8, perfect_ratio=0.4):
+        """
+        patterns: PatternTimeline эталона
+        joints: имена суставов в порядке массива углов пользователя
+        tolerance: ошибка (градусы), до которой кадр считается GOOD
+        max_lag / lookahead: окно поиска эталона назад / вперед от t (сек)
+        """
+        self.patterns = patterns
+        self.tolerance = tolerance
+        self.max_lag = max_lag
+        self.lookahead = lookahead
+        self.forget = forget
+        self.perfect_limit = tolerance * perfect_ratio
+
+        # Сопоставляем колонки пользователя и эталона по именам суставов
+        pairs = [(i, patterns.joint_index[name]) for i, name in enumerate(joints)
+                 if name in patterns.joint_index]
+        self.joint_names = [joints[i] for i, _ in pairs]
+        self._user_cols = np.array([i for i, _ in pairs], dtype=np.intp)
+        self._ref_cols = np.array([j for _, j in pairs], dtype=np.intp)
+
+        self.reset()
+
+    def reset(self):
+        """Сброс выравнивания и счета (restart, новый уровень)"""
+        self.score = 0
+        self.streak = 0
+        self.best_streak = 0
+        self.last = None
+        self._clear_alignment()
+
+    def _clear_alignment(self):
+        # seek: счет сохраняем, а выравнивание начинаем заново
+        self._col = None
+        self._col_start = 0
+
+    def seek(self):
+        self._clear_alignment()
+
+    def update(self, t, user_angles):
+        """
+        Один кадр пользователя. user_angles - массив углов (порядок joints) или None.
+        Возвращает словарь результата (он же self.last) или None, если сравнивать не с чем.
+        """
+        if user_angles is None or len(self._ref_cols) == 0 or len(self.patterns) == 0:
+            self.streak = 0
+            self._clear_alignment()
+            self.last = None
+            return None
+
+        window = self.patterns.range_slice(t - self.max_lag, t + self.lookahead)
+        lo, hi = window.start, window.stop
+        if hi <= lo:
+            # Окно пустое (t за пределами паттерна) - берем ближайший сэмпл
+            lo = min(lo, len(self.patterns) - 1)
+            hi = lo + 1
+
+        user = np.asarray(user_angles, dtype=np.float64)[self._user_cols]
+        ref = self.patterns.angles[lo:hi][:, self._ref_cols]
+        diff = np.abs(ref - user)  # (k, J), NaN там, где сустав не найден
+
+        with np.errstate(invalid='ignore'):
+            valid = ~np.isnan(diff)
+            counts = valid.sum(axis=1)
+            cost = np.where(counts > 0, np.where(valid, diff, 0.0).sum(axis=1) / np.maximum(counts, 1),
+                            2.0 * self.tolerance)
+
+        col = self._step(cost, lo)
+        # При равной стоимости предпочитаем сэмпл ближе к t
+        best = int(np.argmin(col + 1e-3 * np.abs(self.patterns.timestamps[lo:hi] - t)))
+
+        errors = diff[best]
+        error = float(cost[best])
+        rating = PERFECT if error <= self.perfect_limit else GOOD if error <= self.tolerance else MISS
+
+        self.score += POINTS[rating]
+        self.streak = self.streak + 1 if rating != MISS else 0
+        self.best_streak = max(self.best_streak, self.streak)
+
+        accuracy = np.clip(1.0 - errors / (2.0 * self.tolerance), 0.0, 1.0)
+        self.last = {
+            "rating": rating,
+            "error": round(error, 1),
+            "lag": round(float(t - self.patterns.timestamps[lo + best]), 3),
+            "streak": self.streak,
+            "best_streak": self.best_streak,
+            "accuracy": {name: round(float(a), 2)
+                         for name, a, ok in zip(self.joint_names, accuracy, valid[best]) if ok},
+        }
+        return self.last
+
+    def _step(self, cost, lo):
+        """Одна колонка DTW для сэмплов эталона [lo, lo + len(cost))"""
+        k = len(cost)
+        weighted = (1.0 - self.forget) * cost
+
+        # Предыдущая колонка, выровненная по абсолютным индексам сэмплов
+        prev = np.full(k + 1, np.inf)  # prev[0] - сэмпл lo - 1
+        if self._col is not None:
+            src_lo = max(lo - 1, self._col_start)
+            src_hi = min(lo + k, self._col_start + len(self._col))
+            if src_hi > src_lo:
+                prev[src_lo - (lo - 1):src_hi - (lo - 1)] = self._col[src_lo - self._col_start:src_hi - self._col_start]
+
+        best_prev = np.minimum(prev[1:], prev[:-1])
+        # Open-begin: путь может начаться здесь, как будто история совпадала с текущим кадром
+        best_prev = np.minimum(best_prev, cost)
+        a = weighted + self.forget * best_prev
+
+        # Горизонтальные шаги: D[j] = min_{m <= j}(A[m] + sum_{m < i <= j} w[i])
+        csum = np.cumsum(weighted)
+        col = csum + np.minimum.accumulate(a - csum)
+
+        self._col = col
+        self._col_start = lo
+        return col
+
+    def summary(self):
+        """Блок для meta JSON"""
+        if self.last is None:
+            return {"streak": self.streak, "best_streak": self.best_streak}
+        return self.last
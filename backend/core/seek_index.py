@@ -0,0 +1,244 @@
+# core/seek_index.py
+"""
+Индекс кадров видео для точного seek: время каждого кадра в порядке показа
+и номера ключевых кадров.
+
+Строится без декодирования - из таблиц сэмплов MP4 (moov/trak/mdia/minf/stbl:
+stts - длительности, ctts - сдвиг показа относительно декодирования при
+B-кадрах, stss - ключевые кадры). Для других контейнеров - равномерная сетка
+по fps без ключевых кадров. Digitizer кладет индекс в .mtp (seek_index.bin),
+для старых уровней его строит загрузка.
+
+Формат члена `seek_index.bin` (little-endian):
+    magic       4s       b"MTSI"
+    version     uint16   1
+    reserved    uint16   0
+    n_frames    uint32
+    n_keyframes uint32
+    fps         float64
+    timestamps  float64[n_frames]    секунды, по возрастанию
+    keyframes   uint32[n_keyframes]  номера кадров (в порядке показа), по возрастанию
+"""
+import json
+import os
+import struct
+
+import cv2
+import numpy as np
+
+SEEK_INDEX_NAME = "seek_index.bin"
+MAGIC = b"MTSI"
+VERSION = 1
+_HEADER = struct.Struct("<4sHHIId")
+
+# Половина миллисекунды: время из команды seek округлено клиентом
+_TIME_EPSILON = 5e-4
+
+
+class SeekIndex:
+    def __init__(self, timestamps, keyframes, fps):
+        self.timestamps = np.asarray(timestamps, dtype=np.float64)
+        self.keyframes = np.asarray(keyframes, dtype=np.int64)  # пустой - ключевые кадры неизвестны
+        self.fps = fps
+
+    def __len__(self):
+        return len(self.timestamps)
+
+    @classmethod
+    def from_fps(cls, frame_count, fps):
+        fps = fps or 30.0
+        return cls(np.arange(frame_count) / fps, [], fps)
+
+    def frame_at(self, t):
+        """Номер кадра, который показывается в момент t"""
+        i = int(np.searchsorted(self.timestamps, t + _TIME_EPSILON, side='right')) - 1
+        return min(max(i, 0), len(self.timestamps) - 1)
+
+    def time_of(self, index):
+        return float(self.timestamps[index])
+
+    def keyframe_before(self, index):
+        """Ближайший ключевой кадр не позже index (None, если ключевые кадры неизвестны)"""
+        if len(self.keyframes) == 0:
+            return None
+        k = int(np.searchsorted(self.keyframes, index, side='right')) - 1
+        return int(self.keyframes[max(k, 0)])
+
+
+def encode_seek_index(index):
+    return b"".join((
+        _HEADER.pack(MAGIC, VERSION, 0, len(index.timestamps), len(index.keyframes), float(index.fps)),
+        index.timestamps.astype('<f8').tobytes(),
+        index.keyframes.astype('<u4').tobytes(),
+    ))
+
+
+def decode_seek_index(data):
+    magic, version, _, n_frames, n_keyframes, fps = _HEADER.unpack_from(data, 0)
+    if magic != MAGIC:
+        raise ValueError("Not a seek index")
+    if version != VERSION:
+        raise ValueError(f"Unsupported seek index version: {version}")
+    offset = _HEADER.size
+    timestamps = np.frombuffer(data, dtype='<f8', count=n_frames, offset=offset)
+    keyframes = np.frombuffer(data, dtype='<u4', count=n_keyframes, offset=offset + 8 * n_frames)
+    return SeekIndex(timestamps, keyframes, fps)
+
+
+def load_seek_index(path):
+    with open(path, 'rb') as f:
+        return decode_seek_index(f.read())
+
+
+def find_seek_index(level_dir):
+    """Индекс из распакованной папки уровня (по manifest.files.seek_index) или None"""
+    manifest_path = os.path.join(level_dir, "manifest.json")
+    if not os.path.exists(manifest_path):
+        return None
+    try:
+        with open(manifest_path, 'r') as f:
+            name = json.load(f).get('files', {}).get('seek_index')
+        return load_seek_index(os.path.join(level_dir, name)) if name else None
+    except (OSError, ValueError, struct.error) as e:
+        print(f"[SeekIndex] Index unreadable, rebuilding: {e}")
+        return None
+
+
+# --- MP4 ---
+
+def _boxes(data, start=0, end=None):
+    """(тип, начало payload, конец) боксов внутри data[start:end]"""
+    end = len(data) if end is None else end
+    pos = start
+    while pos + 8 <= end:
+        size, kind = struct.unpack_from('>I4s', data, pos)
+        header = 8
+        if size == 1:
+            size = struct.unpack_from('>Q', data, pos + 8)[0]
+            header = 16
+        elif size == 0:
+            size = end - pos
+        if size < header:
+            break
+        yield kind, pos + header, min(pos + size, end)
+        pos += size
+
+
+def _read_moov(f, offset, size):
+    """Содержимое бокса moov (mdat пропускается без чтения)"""
+    pos, end = offset, offset + size
+    while pos + 8 <= end:
+        f.seek(pos)
+        head = f.read(16)
+        if len(head) < 8:
+            break
+        box_size, kind = struct.unpack_from('>I4s', head)
+        header = 8
+        if box_size == 1:
+            box_size = struct.unpack_from('>Q', head, 8)[0]
+            header = 16
+        elif box_size == 0:
+            box_size = end - pos
+        if box_size < header:
+            break
+        if kind == b'moov':
+            f.seek(pos)
+            return f.read(box_size), header
+        pos += box_size
+    return None, 0
+
+
+def _find(data, start, end, path):
+    """Первый бокс по пути типов, например (b'mdia', b'hdlr')"""
+    for kind, body, box_end in _boxes(data, start, end):
+        if kind == path[0]:
+            if len(path) == 1:
+                return body, box_end
+            found = _find(data, body, box_end, path[1:])
+            if found is not None:
+                return found
+    return None
+
+
+def _video_track(moov, start):
+    for kind, body, end in _boxes(moov, start):
+        if kind != b'trak':
+            continue
+        hdlr = _find(moov, body, end, (b'mdia', b'hdlr'))
+        if hdlr is not None and moov[hdlr[0] + 8:hdlr[0] + 12] == b'vide':
+            return body, end
+    return None
+
+
+def _table(moov, stbl, kind, columns, signed=False):
+    """Таблица full box из 32-битных полей: version/flags, entry_count, записи по columns полей"""
+    box = _find(moov, stbl[0], stbl[1], (kind,))
+    if box is None:
+        return None
+    version = moov[box[0]]
+    count = struct.unpack_from('>I', moov, box[0] + 4)[0]
+    dtype = '>i4' if (signed and version == 1) else '>u4'
+    return np.frombuffer(moov, dtype=dtype, count=count * columns, offset=box[0] + 8).astype(np.int64)
+
+
+def read_mp4_index(f, offset=0, size=None):
+    """SeekIndex из таблиц сэмплов MP4 (f - файл, видео в [offset, offset + size)); None, если это не MP4"""
+    if size is None:
+        f.seek(0, 2)
+        size = f.tell() - offset
+    moov, header = _read_moov(f, offset, size)
+    if moov is None:
+        return None
+    track = _video_track(moov, header)
+    if track is None:
+        return None
+
+    mdhd = _find(moov, track[0], track[1], (b'mdia', b'mdhd'))
+    stbl = _find(moov, track[0], track[1], (b'mdia', b'minf', b'stbl'))
+    if mdhd is None or stbl is None:
+        return None
+    version = moov[mdhd[0]]
+    timescale = struct.unpack_from('>I', moov, mdhd[0] + (20 if version == 1 else 12))[0]
+
+    stts = _table(moov, stbl, b'stts', 2)
+    if stts is None or timescale == 0:
+        return None
+    counts, deltas = stts[0::2], stts[1::2]
+    durations = np.repeat(deltas, counts)
+    dts = np.concatenate(([0], np.cumsum(durations)[:-1])) if len(durations) else np.zeros(0, np.int64)
+
+    pts = dts
+    ctts = _table(moov, stbl, b'ctts', 2, signed=True)
+    if ctts is not None:
+        offsets = np.repeat(ctts[1::2], ctts[0::2])
+        if len(offsets) == len(dts):
+            pts = dts + offsets
+
+    # Порядок показа; ключевые кадры переводим из номеров сэмплов (порядок декодирования)
+    order = np.argsort(pts, kind='stable')
+    position = np.empty(len(order), dtype=np.int64)
+    position[order] = np.arange(len(order))
+    stss = _table(moov, stbl, b'stss', 1)
+    keyframes = np.arange(len(order)) if stss is None else np.sort(position[stss - 1])
+
+    timestamps = (pts[order] - pts.min()) / float(timescale) if len(pts) else np.zeros(0)
+    fps = len(timestamps) / (float(dts[-1] + durations[-1]) / timescale) if len(timestamps) else 0.0
+    return SeekIndex(timestamps, keyframes, fps)
+
+
+def build_seek_index(path, offset=0, size=None):
+    """Индекс видеофайла (или члена архива по смещению): из MP4, иначе равномерный по fps"""
+    try:
+        with open(path, 'rb') as f:
+            index = read_mp4_index(f, offset, size)
+    except (OSError, struct.error, ValueError, IndexError):
+        index = None
+    if index is not None and len(index):
+        return index
+    if offset:
+        return None  # равномерную сетку для члена архива строит загрузчик по cv2
+    cap = cv2.VideoCapture(path)
+    try:
+        return SeekIndex.from_fps(int(cap.get(cv2.CAP_PROP_FRAME_COUNT)), cap.get(cv2.CAP_PROP_FPS))
+    finally:
+        cap.release()
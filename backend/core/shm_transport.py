@@ -0,0 +1,137 @@
+# core/shm_transport.py
+"""
+Транспорт кадров через общую память для frontend на той же машине.
+
+Кадры (BGR, uint8) пишутся "как есть" в кольцо слотов внутри memory-mapped
+файла (на Linux - /dev/shm, иначе временная папка). В PUB-сообщении `video`
+вместо JPEG идут пустые части, а meta["shm"] указывает слот и seq каждого кадра.
+
+Раскладка файла (little-endian):
+    magic      4s      b"MTSH"
+    version    uint32  1
+    slot_count uint32
+    slot_size  uint32  байт на пиксели одного слота
+    далее slot_count слотов по (SLOT_HEADER.size + slot_size) байт:
+        seq      uint64  номер записи (пишется последним)
+        width    uint32
+        height   uint32
+        channels uint32
+        nbytes   uint32
+        pixels   uint8[slot_size]
+
+Читатель копирует пиксели и сверяет seq до и после копирования: если слот
+успели перезаписать, кадр пропускается.
+
+Размер слота задает владелец под реальные кадры (GameEngine - по разрешению
+захвата и видео уровня); кадр, который в слот не влез, уходит JPEG.
+"""
+import mmap
+import os
+import struct
+import tempfile
+
+import numpy as np
+
+MAGIC = b"MTSH"
+VERSION = 1
+FILE_HEADER = struct.Struct("<4sIII")
+SLOT_HEADER = struct.Struct("<QIIII")
+# Слотов в кольце: читатель успевает скопировать кадр, пока его слот не перезаписан
+DEFAULT_SLOT_COUNT = 3
+
+
+def default_shm_path(name="motion_frames"):
+    base = "/dev/shm" if os.path.isdir("/dev/shm") else tempfile.gettempdir()
+    return os.path.join(base, f"{name}_{os.getpid()}.bin")
+
+
+class SharedFrameRing:
+    def __init__(self, path=None, slot_count=DEFAULT_SLOT_COUNT, max_width=640, max_height=480, channels=3,
+                 create=True):
+        self.path = path or default_shm_path()
+
+        if create:
+            self.slot_count = slot_count
+            self.slot_size = max_width * max_height * channels
+            self.stride = SLOT_HEADER.size + self.slot_size
+            size = FILE_HEADER.size + self.slot_count * self.stride
+            with open(self.path, 'wb') as f:
+                f.truncate(size)
+        with open(self.path, 'r+b' if create else 'rb') as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_WRITE if create else mmap.ACCESS_READ)
+
+        if create:
+            FILE_HEADER.pack_into(self._mm, 0, MAGIC, VERSION, self.slot_count, self.slot_size)
+        else:
+            magic, version, self.slot_count, self.slot_size = FILE_HEADER.unpack_from(self._mm, 0)
+            if magic != MAGIC or version != VERSION:
+                raise ValueError("Not a Motion frame ring")
+            self.stride = SLOT_HEADER.size + self.slot_size
+
+        self._owner = create
+        self._next_slot = 0
+        self._seq = 0
+
+    @classmethod
+    def open(cls, path):
+        """Подключение читателя к уже созданному кольцу"""
+        return cls(path, create=False)
+
+    def describe(self):
+        """Параметры для ответа на handshake"""
+        return {
+            "path": self.path,
+            "slots": self.slot_count,
+            "slot_size": self.slot_size,
+            "header_size": FILE_HEADER.size,
+            "slot_header_size": SLOT_HEADER.size,
+            "pixel_format": "bgr24",
+        }
+
+    def _offset(self, slot):
+        return FILE_HEADER.size + slot * self.stride
+
+    def write(self, frame):
+        """
+        Пишет кадр в следующий слот. Возвращает дескриптор для meta
+        или None, если кадр не помещается в слот (тогда шлем JPEG).
+        """
+        frame = np.ascontiguousarray(frame)
+        if frame.dtype != np.uint8 or frame.nbytes > self.slot_size:
+            return None
+        h, w = frame.shape[:2]
+        channels = frame.shape[2] if frame.ndim == 3 else 1
+
+        slot = self._next_slot
+        self._next_slot = (slot + 1) % self.slot_count
+        self._seq += 1
+
+        offset = self._offset(slot)
+        data_start = offset + SLOT_HEADER.size
+        # seq = 0 на время записи, чтобы читатель не взял полузаписанный кадр
+        SLOT_HEADER.pack_into(self._mm, offset, 0, w, h, channels, frame.nbytes)
+        self._mm[data_start:data_start + frame.nbytes] = frame.data.cast('B')
+        struct.pack_into("<Q", self._mm, offset, self._seq)
+
+        return {"slot": slot, "seq": self._seq, "w": w, "h": h, "c": channels}
+
+    def read(self, desc):
+        """Копия кадра по дескриптору из meta или None, если слот уже перезаписан"""
+        offset = self._offset(desc['slot'])
+        seq, w, h, channels, nbytes = SLOT_HEADER.unpack_from(self._mm, offset)
+        if seq != desc['seq']:
+            return None
+        data_start = offset + SLOT_HEADER.size
+        pixels = np.frombuffer(self._mm, dtype=np.uint8, count=nbytes, offset=data_start).copy()
+        if struct.unpack_from("<Q", self._mm, offset)[0] != desc['seq']:
+            return None
+        shape = (h, w, channels) if channels > 1 else (h, w)
+        return pixels.reshape(shape)
+
+    def close(self):
+        self._mm.close()
+        if self._owner:
+            try:
+                os.remove(self.path)
+            except OSError:
+                pass
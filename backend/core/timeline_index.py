@@ -0,0 +1,111 @@
+# core/timeline_index.py
+"""
+Скомпилированный таймлайн оверлеев.
+
+При загрузке уровня границы всех событий (time и time + duration) сортируются
+в точки смены; между соседними точками набор активных событий постоянен и
+считается один раз. Поиск активного набора - бинарный поиск по точкам смены
+(O(log n + k)), а при обычном воспроизведении - сдвиг курсора на соседний
+отрезок за O(1). Seek назад/вперед обрабатывается тем же бинарным поиском.
+
+Правило активации не меняется: event.time <= t < event.time + event.duration.
+"""
+import json
+import os
+from bisect import bisect_right
+
+
+def load_timeline_events(path):
+    """События всех дорожек timeline.json одним списком, отсортированным по time"""
+    timeline = []
+    if path and os.path.exists(path):
+        try:
+            with open(path, 'r') as f:
+                data = json.load(f)
+                for track in data.get('tracks', []):
+                    for evt in track.get('events', []):
+                        timeline.append(evt)
+                timeline.sort(key=lambda x: x['time'])
+            print(f"Timeline loaded: {len(timeline)} events")
+        except Exception as e:
+            print(f"Error loading timeline: {e}")
+    return timeline
+
+
+class TimelineIndex:
+    def __init__(self, events=()):
+        self.events = list(events)
+
+        bounds = set()
+        spans = []
+        for i, evt in enumerate(self.events):
+            start = evt.get('time', 0)
+            end = start + evt.get('duration', 0)
+            if end > start:
+                spans.append((start, end, i))
+                bounds.add(start)
+                bounds.add(end)
+        self.change_points = sorted(bounds)
+
+        # Отрезок s = [change_points[s], change_points[s + 1]); события храним
+        # в исходном порядке таймлайна (он отсортирован по time)
+        starts = {}
+        ends = {}
+        for start, end, i in spans:
+            starts.setdefault(start, []).append(i)
+            ends.setdefault(end, []).append(i)
+
+        active = set()
+        self._segments = []
+        for point in self.change_points:
+            active.difference_update(ends.get(point, ()))
+            active.update(starts.get(point, ()))
+            self._segments.append(tuple(sorted(active)))
+
+        self._fragments = {}
+        self._cursor = -1  # индекс отрезка; -1 - до первой точки смены
+
+    def __len__(self):
+        return len(self.events)
+
+    def _segment_at(self, t):
+        points = self.change_points
+        cur = self._cursor
+        n = len(points)
+
+        # Быстрый путь: то же место или следующий отрезок (монотонное воспроизведение)
+        for seg in (cur, cur + 1):
+            if -1 <= seg < n:
+                lo = points[seg] if seg >= 0 else float('-inf')
+                hi = points[seg + 1] if seg + 1 < n else float('inf')
+                if lo <= t < hi:
+                    self._cursor = seg
+                    return seg
+
+        # Seek: бинарный поиск
+        self._cursor = bisect_right(points, t) - 1
+        return self._cursor
+
+    def active_ids(self, t):
+        seg = self._segment_at(t)
+        return self._segments[seg] if seg >= 0 else ()
+
+    def active(self, t):
+        """Список событий, активных в момент t"""
+        return [self.events[i] for i in self.active_ids(t)]
+
+    def in_no_score_zone(self, t):
+        """Момент t внутри события no_score_zone (кадр не оценивается)"""
+        return any(self.events[i].get('type') == 'no_score_zone' for i in self.active_ids(t))
+
+    def active_json(self, t):
+        """
+        Активные события уже сериализованными в JSON-массив.
+        Фрагмент кешируется для набора и переиспользуется, пока набор не меняется.
+        """
+        ids = self.active_ids(t)
+        fragment = self._fragments.get(ids)
+        if fragment is None:
+            fragment = json.dumps([self.events[i] for i in ids])
+            self._fragments[ids] = fragment
+        return fragment
@@ -1,9 +1,12 @@
 # processors/video_processor.py
 import cv2
 import json
+import os
 import time
+import numpy as np
 from core.pose_engine import PoseEngine
-from core.geometry import calculate_angle_3d
+from core.geometry import calculate_angles_batch, DEFAULT_ANGLE_TABLE
+from core.landmark_store import LandmarkTrack, encode_landmark_track
 
 
 class VideoDigitizer:
@@ -13,6 +16,8 @@ class VideoDigitizer:
         # Включаем static_mode=False, так как это видеопоток
         self.engine = PoseEngine(static_mode=False, model_complexity=2)
         self.pose_data = []  # Сюда будем писать историю
+        self.landmark_frames = []  # Сырые landmarks (33, 4) - для пересчета углов без инференса
+        self.landmarks = []
 
     def process(self):
         if not self.cap.isOpened():
@@ -32,32 +37,22 @@ class VideoDigitizer:
             results = self.engine.process_frame(frame)
 
             # 2. Получаем координаты (World Landmarks - это 3D метры!)
-            lms = self.engine.get_3d_landmarks(results)
+            tensor = self.engine.get_landmark_tensor(results)
+            lms = tensor[:, :3] if tensor is not None else None
 
             frame_data = {
                 "timestamp": frame_count / fps,  # Время в секундах
                 "angles": {}
             }
 
-            if lms:
-                # 3. Рассчитываем углы (Пример для локтей и коленей)
-                # Используем словарь индексов из engine
-                idx = self.engine.JOINTS
-
-                # Левый локоть (Плечо - Локоть - Запястье)
-                angle_l_elbow = calculate_angle_3d(
-                    lms[idx['LEFT_SHOULDER']], lms[idx['LEFT_ELBOW']], lms[idx['LEFT_WRIST']]
-                )
-
-                # Правый локоть
-                angle_r_elbow = calculate_angle_3d(
-                    lms[idx['RIGHT_SHOULDER']], lms[idx['RIGHT_ELBOW']], lms[idx['RIGHT_WRIST']]
-                )
-
-                frame_data["angles"]["left_elbow"] = round(angle_l_elbow, 1)
-                frame_data["angles"]["right_elbow"] = round(angle_r_elbow, 1)
-
-                # TODO: Добавить колени и плечи сюда же
+            if lms is not None:
+                self.landmark_frames.append(frame_count)
+                self.landmarks.append(tensor)
+                # 3. Все углы из таблицы geometry.JOINT_ANGLES одним вызовом
+                angles = calculate_angles_batch(lms, DEFAULT_ANGLE_TABLE)
+                frame_data["angles"] = {
+                    name: round(value, 1) for name, value in DEFAULT_ANGLE_TABLE.to_dict(angles).items()
+                }
 
             self.pose_data.append(frame_data)
 
@@ -67,8 +62,18 @@ class VideoDigitizer:
 
         self.cap.release()
         self.save_json()
+        self.save_landmarks(fps)
 
     def save_json(self):
         with open(self.output_path, 'w') as f:
             json.dump(self.pose_data, f, indent=2)
-        print(f"Готово! Данные сохранены в {self.output_path}")
\ No newline at end of file
+        print(f"Готово! Данные сохранены в {self.output_path}")
+
+    def save_landmarks(self, fps):
+        """Рядом с JSON: <output>.landmarks.bin в формате члена .mtp (core/landmark_store.py)"""
+        stacked = np.stack(self.landmarks) if self.landmarks else np.zeros((0, 33, 4), dtype=np.float32)
+        track = LandmarkTrack(np.array(self.landmark_frames), stacked[..., :3], stacked[..., 3], fps)
+        path = os.path.splitext(self.output_path)[0] + ".landmarks.bin"
+        with open(path, 'wb') as f:
+            f.write(encode_landmark_track(track))
+        print(f"Landmarks сохранены в {path}")
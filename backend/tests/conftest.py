@@ -0,0 +1,8 @@
+import os
+import sys
+
+# Тесты запускаются из папки backend (python -m pytest), а модули импортируют
+# друг друга как backend.core.*, поэтому добавляем корень репозитория в путь.
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
@@ -0,0 +1,65 @@
+import cv2
+
+from backend.benchmarks import bench
+from backend.benchmarks.bench import compare, summarize
+from backend.benchmarks.synthetic import make_video
+
+
+def stage(fps, mean_ms, p95_ms):
+    return {"iterations": 100, "fps": fps, "mean_ms": mean_ms, "p50_ms": mean_ms, "p95_ms": p95_ms}
+
+
+def test_summarize_reports_throughput_and_percentiles():
+    result = summarize([10.0] * 19 + [30.0])
+    assert result["iterations"] == 20
+    assert result["fps"] == 90.9
+    assert result["p50_ms"] == 10.0
+    assert result["p95_ms"] == 11.0
+
+
+def test_compare_flags_slow_stages_only():
+    baseline = {"stages": {
+        "encode": stage(200.0, 5.0, 6.0),
+        "decode": stage(500.0, 2.0, 3.0),
+        "pose": {"skipped": "mediapipe not installed"},
+    }}
+    results = {
+        "encode": stage(150.0, 6.6, 6.5),   # -25% fps
+        "decode": stage(480.0, 2.1, 4.0),   # p95 +33%
+        "pose": stage(30.0, 33.0, 40.0),    # в базе нет замера
+        "angles": stage(1.0, 1000.0, 1000.0),  # стадии нет в базе
+    }
+    regressions = compare(results, baseline, threshold=0.2)
+    assert len(regressions) == 2
+    assert regressions[0].startswith("encode: 150.0 fps")
+    assert regressions[1].startswith("decode: p95")
+
+
+def test_fast_stages_get_noise_tolerance():
+    baseline = {"stages": {"overlays": stage(100000.0, 0.01, 0.02)}}
+    assert compare({"overlays": stage(70000.0, 0.014, 0.2)}, baseline, threshold=0.2) == []
+    assert compare({"overlays": stage(10000.0, 0.1, 0.2)}, baseline, threshold=0.2)
+
+
+def test_synthetic_video_is_readable(tmp_path):
+    path = make_video(str(tmp_path / "v.mp4"), frames=5, width=160, height=120)
+    cap = cv2.VideoCapture(path)
+    ok, frame = cap.read()
+    cap.release()
+    assert ok and frame.shape == (120, 160, 3)
+
+
+def test_check_without_baseline_fails_and_writes_nothing(tmp_path, monkeypatch):
+    monkeypatch.setattr(bench, "run", lambda *args: {"angles": stage(1000.0, 1.0, 1.2)})
+    path = tmp_path / "baseline.json"
+    assert bench.main(["--check", "--baseline", str(path)]) == 1
+    assert not path.exists()
+
+    # База пишется только явно
+    assert bench.main(["--update-baseline", "--baseline", str(path)]) == 0
+    assert bench.main(["--check", "--baseline", str(path)]) == 0
+
+
+def test_send_frame_stage_drives_the_engine():
+    result = bench.run({"send_frame"}, quick=True, repeats=1)["send_frame"]
+    assert result["iterations"] == 60 and result["fps"] > 0
@@ -0,0 +1,136 @@
+import time
+
+import cv2
+import numpy as np
+
+from backend.core.capture import DecodedFrameCache, LatestFrameReader, PrefetchReader
+from backend.core.seek_index import SeekIndex
+
+
+class FakeCapture:
+    """Имитация cv2.VideoCapture: кадры с номером в пикселе [0, 0]"""
+
+    def __init__(self, n_frames, fps=30.0):
+        self.n_frames = n_frames
+        self.fps = fps
+        self.pos = 0
+
+    def read(self):
+        if self.pos >= self.n_frames:
+            return False, None
+        frame = np.full((2, 2, 3), self.pos % 256, dtype=np.uint8)
+        self.pos += 1
+        return True, frame
+
+    def get(self, prop):
+        if prop == cv2.CAP_PROP_FPS:
+            return self.fps
+        if prop == cv2.CAP_PROP_FRAME_COUNT:
+            return self.n_frames
+        if prop == cv2.CAP_PROP_POS_MSEC:
+            return (self.pos - 1) * 1000.0 / self.fps
+        return 0
+
+    def set(self, prop, value):
+        if prop == cv2.CAP_PROP_POS_FRAMES:
+            self.pos = int(value)
+        elif prop == cv2.CAP_PROP_POS_MSEC:
+            self.pos = int(round(value * self.fps / 1000.0))
+
+    def release(self):
+        pass
+
+
+def test_prefetch_reader_keeps_order_and_reports_eof():
+    reader = PrefetchReader(FakeCapture(20), prefetch=4).start()
+    values = []
+    while True:
+        item = reader.read_frame(timeout=1.0)
+        if item is None:
+            break
+        values.append(int(item.frame[0, 0, 0]))
+    reader.release()
+    assert values == list(range(20))
+    assert reader.eof
+
+
+def test_prefetch_reader_seek_drops_prefetched_frames():
+    reader = PrefetchReader(FakeCapture(100), prefetch=4).start()
+    reader.read_frame(timeout=1.0)
+    reader.seek_msec(2000.0)
+    item = reader.read_frame(timeout=1.0)
+    reader.release()
+    assert int(item.frame[0, 0, 0]) == 60
+    assert item.pos_msec == 2000.0
+
+
+def test_latest_frame_reader_returns_newest_frame():
+    reader = LatestFrameReader(FakeCapture(50)).start()
+    deadline = time.monotonic() + 1.0
+    while reader.read_frame() is None or reader.read_frame().seq < 50:
+        assert time.monotonic() < deadline
+        time.sleep(0.001)
+    ret, frame = reader.read()
+    reader.release()
+    assert ret and int(frame[0, 0, 0]) == 49
+
+
+class CountingCapture(FakeCapture):
+    def __init__(self, n_frames, fps=30.0):
+        super().__init__(n_frames, fps)
+        self.decoded = 0
+        self.seeks = []
+
+    def read(self):
+        self.decoded += 1
+        return super().read()
+
+    def set(self, prop, value):
+        self.seeks.append(int(value))
+        super().set(prop, value)
+
+
+def test_seek_time_is_exact_and_reuses_decoded_frames():
+    index = SeekIndex(np.arange(100) / 30.0, [0, 30, 60, 90], 30.0)
+    cap = CountingCapture(100)
+    reader = PrefetchReader(cap, seek_index=index, frame_cache=DecodedFrameCache())
+
+    item = reader.seek_time(1.5)  # кадр 45: за ключевым кадром 30 - seek декодера по номеру кадра
+    assert int(item.frame[0, 0, 0]) == 45
+    assert item.pos_msec == 1500.0
+    assert cap.seeks == [45]
+
+    # Вперед в пределах GOP - декодирование подряд без seek
+    assert int(reader.seek_time(50 / 30.0).frame[0, 0, 0]) == 50
+    assert cap.seeks == [45]
+
+    # Кадры 45..50 уже декодированы: скраббинг назад не трогает декодер
+    decoded = cap.decoded
+    assert int(reader.seek_time(47 / 30.0).frame[0, 0, 0]) == 47
+    assert cap.decoded == decoded
+    assert int(reader.seek_time(50 / 30.0).frame[0, 0, 0]) == 50
+
+    # Чтение продолжается со следующего кадра после seek
+    assert int(reader.read_frame(timeout=1.0).frame[0, 0, 0]) == 51
+    reader.release()
+
+
+def test_seek_time_from_cache_resumes_playback_after_target():
+    index = SeekIndex(np.arange(100) / 30.0, [0, 30, 60, 90], 30.0)
+    reader = PrefetchReader(CountingCapture(100), seek_index=index, frame_cache=DecodedFrameCache())
+    reader.seek_time(2.0)  # 60
+    reader.seek_time(70 / 30.0)
+    assert int(reader.seek_time(2.0).frame[0, 0, 0]) == 60  # из кеша
+    assert [int(reader.read_frame(timeout=1.0).frame[0, 0, 0]) for _ in range(3)] == [61, 62, 63]
+    reader.release()
+
+
+def test_frame_cache_evicts_frames_far_from_playhead():
+    frame = np.zeros((10, 10, 3), dtype=np.uint8)
+    cache = DecodedFrameCache(max_bytes=frame.nbytes * 3)
+    cache.playhead = 10
+    for i in (0, 9, 10, 11):
+        cache.put(i, frame)
+    assert len(cache) == 3
+    assert cache.get(0) is None
+    assert cache.get(11) is frame
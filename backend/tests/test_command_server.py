@@ -0,0 +1,53 @@
+import json
+
+import zmq
+
+from backend.core.command_server import CommandServer
+
+
+def make_client(context, endpoint):
+    sock = context.socket(zmq.REQ)
+    sock.setsockopt(zmq.LINGER, 0)
+    sock.connect(endpoint)
+    return sock
+
+
+def test_router_serves_several_req_clients_out_of_order():
+    context = zmq.Context()
+    server = CommandServer(context, "inproc://commands-test")
+    a = make_client(context, "inproc://commands-test")
+    b = make_client(context, "inproc://commands-test")
+
+    a.send_json({"type": "load"})
+    b.send_json({"type": "get_state"})
+
+    requests = []
+    while len(requests) < 2:
+        requests += server.poll(timeout=1.0)
+    by_type = {r.command["type"]: r for r in requests}
+
+    # Ответ на быструю команду уходит раньше, чем на долгую
+    server.reply(by_type["get_state"], {"status": "ok", "state": "IDLE"})
+    assert b.recv_json() == {"status": "ok", "state": "IDLE"}
+    server.reply(by_type["load"], {"status": "ok"})
+    assert a.recv_json() == {"status": "ok"}
+
+    for sock in (a, b):
+        sock.close()
+    server.close()
+    context.term()
+
+
+def test_bad_json_gets_error_reply():
+    context = zmq.Context()
+    server = CommandServer(context, "inproc://commands-bad")
+    client = make_client(context, "inproc://commands-bad")
+
+    client.send(b"not json")
+    assert server.poll(timeout=1.0) == []
+    reply = json.loads(client.recv())
+    assert reply["status"] == "error"
+
+    client.close()
+    server.close()
+    context.term()
@@ -0,0 +1,96 @@
+import os
+import zipfile
+
+import cv2
+import numpy as np
+import pytest
+
+import backend.core.digitizer as digitizer
+from backend.core.digitizer import VideoDigitizer, plan_segments
+from backend.core.pattern_store import load_patterns
+from conftest import ROOT
+
+# Градусы. Сегменты считаются одинаково при любом числе воркеров, в другом
+# процессе и после возобновления, поэтому паттерны совпадают (допуск - только на округление)
+ANGLE_TOLERANCE = 1e-3
+
+
+def test_plan_segments_covers_all_frames_once():
+    segments = plan_segments(100, 30, overlap_frames=5)
+    covered = [f for _, start, end in segments for f in range(start, 100 if end is None else end)]
+    assert covered == list(range(100))
+    assert segments[-1][2] is None  # последний - до конца файла, а не до оценки числа кадров
+    assert segments[0][0] == 0
+    assert all(warm == max(0, start - 5) for warm, start, _ in segments)
+
+
+def test_short_video_is_one_segment():
+    assert plan_segments(2, 300) == [(0, 0, None)]
+
+
+def _trim_level_video(path, frames):
+    """Первые frames кадров видео реального уровня levels/level.mtp"""
+    with zipfile.ZipFile(os.path.join(ROOT, "levels", "level.mtp")) as zf:
+        source = zf.extract("video.mp4", os.path.dirname(path))
+    cap = cv2.VideoCapture(source)
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*'mp4v'), cap.get(cv2.CAP_PROP_FPS),
+                             (int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)), int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))))
+    for _ in range(frames):
+        ret, frame = cap.read()
+        assert ret
+        writer.write(frame)
+    writer.release()
+    cap.release()
+    return path
+
+
+def _patterns(path):
+    """PatternTrack из patterns.bin уровня"""
+    with zipfile.ZipFile(path) as zf:
+        return load_patterns(None, zf.extract("patterns.bin", path + ".d"))
+
+
+def assert_patterns_close(a, b, tolerance=ANGLE_TOLERANCE):
+    np.testing.assert_array_equal(a.timestamps, b.timestamps)
+    np.testing.assert_array_equal(np.isnan(a.angles), np.isnan(b.angles))
+    assert np.nanmax(np.abs(a.angles - b.angles)) <= tolerance
+
+
+def test_parallel_matches_sequential_on_real_clip(tmp_path, monkeypatch):
+    pytest.importorskip("mediapipe")
+    monkeypatch.setattr(digitizer, "SEGMENT_FRAMES", 40)
+    video = _trim_level_video(str(tmp_path / "clip.mp4"), 120)
+    VideoDigitizer().create_level_from_video(video, str(tmp_path / "seq.mtp"), resume=False)
+    VideoDigitizer().create_level_from_video(video, str(tmp_path / "par.mtp"), workers=3, resume=False)
+
+    sequential = _patterns(str(tmp_path / "seq.mtp"))
+    parallel = _patterns(str(tmp_path / "par.mtp"))
+    assert len(sequential.timestamps) > 100
+    assert_patterns_close(parallel, sequential)
+
+
+def test_resumed_run_matches_uninterrupted_on_real_clip(tmp_path, monkeypatch):
+    pytest.importorskip("mediapipe")
+    monkeypatch.setattr(digitizer, "SEGMENT_FRAMES", 40)
+    video = _trim_level_video(str(tmp_path / "clip.mp4"), 120)
+    VideoDigitizer().create_level_from_video(video, str(tmp_path / "full.mtp"), resume=False)
+
+    class StopAfter:
+        """Прерывает оцифровку после frames кадров: первый сегмент готов, второй - на середине"""
+
+        def __init__(self, frames):
+            self.left = frames
+
+        def is_set(self):
+            self.left -= 1
+            return self.left < 0
+
+    output = str(tmp_path / "out.mtp")
+    with pytest.raises(digitizer.DigitizeCancelled):
+        VideoDigitizer().create_level_from_video(video, output, resume=False, cancel_event=StopAfter(60))
+    states = sorted(name for name in os.listdir(output + ".work") if name.startswith("range-") and
+                    name.endswith(".json"))
+    assert states == ["range-00000000.json"]  # одна контрольная точка
+
+    VideoDigitizer().create_level_from_video(video, output)
+    assert_patterns_close(_patterns(output), _patterns(str(tmp_path / "full.mtp")))
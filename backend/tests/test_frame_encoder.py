@@ -0,0 +1,56 @@
+import cv2
+import numpy as np
+
+from backend.core.frame_encoder import FrameEncoder, fit_height
+
+
+def test_encode_pair_produces_decodable_jpegs():
+    encoder = FrameEncoder()
+    ref = np.full((48, 64, 3), 200, dtype=np.uint8)
+    user = np.zeros((48, 64, 3), dtype=np.uint8)
+    buf_ref, buf_user = encoder.encode_pair(ref, user)
+    encoder.close()
+
+    decoded = cv2.imdecode(np.frombuffer(buf_ref, np.uint8), cv2.IMREAD_COLOR)
+    assert decoded.shape == ref.shape
+    assert buf_user[:2] == b"\xff\xd8"
+
+
+def test_static_frames_are_encoded_once():
+    encoder = FrameEncoder()
+    blank = np.zeros((48, 64, 3), dtype=np.uint8)
+    first = encoder.encode_pair(blank, blank)
+    for _ in range(10):
+        assert encoder.encode_pair(blank, blank) == first
+    encoder.close()
+    assert encoder.misses == 1
+
+
+def test_paused_reference_stays_cached_while_user_changes():
+    encoder = FrameEncoder(cache_size=4)
+    ref = np.zeros((48, 64, 3), dtype=np.uint8)
+    for _ in range(20):
+        encoder.encode_pair(ref, np.random.randint(0, 255, (48, 64, 3), dtype=np.uint8))
+    encoder.close()
+    assert encoder.misses == 21
+
+
+def test_fit_height_keeps_frame_when_size_matches():
+    frame = np.zeros((48, 64, 3), dtype=np.uint8)
+    assert fit_height(frame, 48) is frame
+    assert fit_height(frame, None) is frame
+    assert fit_height(frame, 96).shape == (96, 128, 3)
+
+
+def test_user_frame_is_scaled_inside_encoder():
+    encoder = FrameEncoder()
+    ref = np.full((96, 128, 3), 200, dtype=np.uint8)
+    user = np.zeros((48, 64, 3), dtype=np.uint8)
+    _, buf_user = encoder.encode_pair(ref, user, user_height=96)
+    _, again = encoder.encode_pair(ref, user, user_height=96)
+    _, native = encoder.encode_pair(ref, user)
+    encoder.close()
+
+    assert again == buf_user
+    assert cv2.imdecode(np.frombuffer(buf_user, np.uint8), cv2.IMREAD_COLOR).shape == (96, 128, 3)
+    assert cv2.imdecode(np.frombuffer(native, np.uint8), cv2.IMREAD_COLOR).shape == (48, 64, 3)
@@ -0,0 +1,45 @@
+import numpy as np
+import pytest
+
+from backend.benchmarks.synthetic import make_video
+from backend.core.frame_source import SyntheticSource, VideoFileSource, open_frame_source
+
+
+def test_offline_video_source_reads_every_frame_with_file_time(tmp_path):
+    path = make_video(str(tmp_path / "user.mp4"), frames=12, width=160, height=120, fps=30.0)
+    source = VideoFileSource(path, realtime=False)
+    try:
+        items = []
+        while (item := source.read_frame()) is not None:
+            items.append(item)
+        assert len(items) == 12
+        assert [item.seq for item in items] == list(range(1, 13))
+        # Время кадра - позиция в записи, а не часы
+        assert items[3].captured_at == pytest.approx(0.1)
+        assert source.eof
+        assert source.read() == (False, None)
+    finally:
+        source.release()
+
+
+def test_offline_synthetic_source_advances_per_call():
+    source = SyntheticSource(160, 120, fps=30.0, realtime=False)
+    first, second = source.read_frame(), source.read_frame()
+    assert first.frame.shape == (120, 160, 3)
+    assert (first.seq, second.seq) == (1, 2)
+    assert second.captured_at == pytest.approx(1 / 30.0)
+    assert not np.array_equal(first.frame, second.frame)
+
+
+def test_open_frame_source_by_spec(tmp_path):
+    source = SyntheticSource(realtime=False)
+    assert open_frame_source(source) is source
+    assert isinstance(open_frame_source("synthetic", 160, 120, realtime=False), SyntheticSource)
+
+    path = make_video(str(tmp_path / "user.mp4"), frames=3, width=160, height=120)
+    video = open_frame_source(path, realtime=False)
+    try:
+        assert isinstance(video, VideoFileSource)
+        assert video.read_frame().frame.shape == (120, 160, 3)
+    finally:
+        video.release()
@@ -0,0 +1,42 @@
+import numpy as np
+import pytest
+
+from backend.core.geometry import (
+    AngleTable, calculate_angle_3d, calculate_angles_batch, DEFAULT_ANGLE_TABLE, JOINT_ANGLES
+)
+
+
+def test_batch_matches_scalar_angles():
+    rng = np.random.default_rng(0)
+    lms = rng.random((4, 33, 3))
+    batch = calculate_angles_batch(lms)
+
+    assert batch.shape == (4, len(JOINT_ANGLES))
+    for f in range(4):
+        for j, name in enumerate(DEFAULT_ANGLE_TABLE.names):
+            a, b, c = JOINT_ANGLES[name]
+            if max(a, b, c) < 33:
+                assert batch[f, j] == pytest.approx(calculate_angle_3d(lms[f, a], lms[f, b], lms[f, c]))
+
+
+def test_single_frame_and_right_angle():
+    lms = np.zeros((33, 3))
+    lms[11] = [0, 1, 0]
+    lms[15] = [1, 0, 0]
+    table = AngleTable({"left_elbow": (11, 13, 15)})
+    assert calculate_angles_batch(lms, table) == pytest.approx([90.0])
+
+
+def test_degenerate_vector_gives_nan():
+    lms = np.zeros((33, 3))
+    angles = calculate_angles_batch(lms, AngleTable({"left_elbow": (11, 13, 15)}))
+    assert np.isnan(angles[0])
+    assert AngleTable({"left_elbow": (11, 13, 15)}).to_dict(angles) == {}
+
+
+def test_torso_uses_virtual_midpoints():
+    lms = np.zeros((33, 3))
+    lms[[11, 12]] = [0, 1, 0]
+    lms[[25, 26]] = [0, -1, 0]
+    torso = calculate_angles_batch(lms, AngleTable({"torso": JOINT_ANGLES["torso"]}))
+    assert torso == pytest.approx([180.0])
@@ -1,4 +1,9 @@
 import json
+import os
+import subprocess
+import sys
+
+from conftest import ROOT
 
 def test_pub_meta_schema_minimal():
     # Contract: these fields exist in meta (backend/core/game_engine.py)
@@ -13,3 +18,22 @@ def test_pub_meta_schema_minimal():
     encoded = json.dumps(meta).encode("utf-8")
     decoded = json.loads(encoded.decode("utf-8"))
     assert set(["state","score","time","status","progress","overlays"]).issubset(decoded.keys())
+
+
+def test_encoded_meta_with_spliced_overlays_is_valid_json():
+    from backend.core.game_engine import encode_meta
+
+    meta = {"state": "PLAYING", "score": 0, "time": 1.5, "status": "", "progress": 0}
+    decoded = json.loads(encode_meta(meta, '[{"type": "text"}]').decode("utf-8"))
+    assert decoded["overlays"] == [{"type": "text"}]
+    assert decoded["state"] == "PLAYING"
+
+
+def test_engine_module_import_defers_heavy_dependencies():
+    # Старт backend не ждет mediapipe и ffpyplayer: их грузит фоновый прогрев
+    code = ("import sys, backend.core.game_engine; "
+            "print(sorted(m for m in ('mediapipe', 'ffpyplayer') if m in sys.modules))")
+    # Дочернему интерпретатору путь из conftest не достается - корень репозитория передаем явно
+    out = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True,
+                         cwd=ROOT, env={**os.environ, "PYTHONPATH": ROOT})
+    assert out.stdout.strip() == "[]"
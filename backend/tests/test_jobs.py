@@ -0,0 +1,118 @@
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import pytest
+
+from backend.core.jobs import DigitizeJobManager, DONE, CANCELLED, CANCELLING, QUEUED, RUNNING
+
+
+def fake_job(job_id, source, output, options, events, cancel):
+    for p in (25, 50, 75):
+        events.put((job_id, "progress", p))
+    if options.get("sleep") and cancel.wait(options["sleep"]):
+        return  # отменена
+    with open(output, "w") as f:
+        f.write(source)
+    events.put((job_id, DONE, None))
+
+
+def wait_for(manager, predicate, timeout=20.0):
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        assert time.monotonic() < deadline
+        manager.poll()
+        time.sleep(0.02)
+
+
+def test_jobs_run_one_at_a_time_and_report_progress(tmp_path):
+    manager = DigitizeJobManager(target=fake_job)
+    first = manager.submit("a", str(tmp_path / "a.mtp"))
+    second = manager.submit("b", str(tmp_path / "b.mtp"))
+    assert first.status == RUNNING
+    assert second.status == QUEUED
+
+    wait_for(manager, lambda: second.status == DONE)
+    assert first.status == DONE and first.progress == 100
+    assert (tmp_path / "b.mtp").read_text() == "b"
+    assert [j["job_id"] for j in manager.list()] == [first.id, second.id]
+    manager.close()
+
+
+def test_cancel_running_and_queued_jobs(tmp_path):
+    manager = DigitizeJobManager(target=fake_job)
+    running = manager.submit("a", str(tmp_path / "a.mtp"), sleep=30)
+    queued = manager.submit("b", str(tmp_path / "b.mtp"), sleep=30)
+
+    manager.cancel(queued.id)
+    manager.cancel(running.id)
+    assert queued.status == CANCELLED
+    assert running.status == CANCELLING
+    wait_for(manager, lambda: not manager.busy)
+    assert running.status == CANCELLED
+    assert not (tmp_path / "a.mtp").exists()
+    manager.close()
+
+
+def test_queue_is_bounded(tmp_path):
+    manager = DigitizeJobManager(max_queued=1, target=fake_job)
+    manager.submit("a", str(tmp_path / "a.mtp"), sleep=30)
+    manager.submit("b", str(tmp_path / "b.mtp"))
+    with pytest.raises(RuntimeError):
+        manager.submit("c", str(tmp_path / "c.mtp"))
+    manager.close()
+
+
+def _spin(pid_dir, stop, ignore_cancel):
+    open(os.path.join(pid_dir, str(os.getpid())), "w").close()
+    while ignore_cancel or not stop.is_set():
+        time.sleep(0.01)
+
+
+def stub_parallel_job(job_id, source, output, options, events, cancel):
+    """Как digitizer с workers > 1: Manager + пул процессов, отмена - через Event менеджера"""
+    ignore_cancel = options.get("ignore_cancel", False)
+    open(os.path.join(source, str(os.getpid())), "w").close()
+    with multiprocessing.Manager() as manager, ProcessPoolExecutor(max_workers=3) as pool:
+        stop = manager.Event()
+        futures = [pool.submit(_spin, source, stop, ignore_cancel) for _ in range(3)]
+        while not all(f.done() for f in futures):
+            if cancel.is_set() and not ignore_cancel:
+                stop.set()
+            time.sleep(0.02)
+
+
+def _alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    try:
+        with open(f"/proc/{pid}/stat") as f:
+            return f.read().rsplit(")", 1)[1].split()[0] != "Z"  # зомби уже не работает
+    except OSError:
+        return True
+
+
+@pytest.mark.skipif(os.name != "posix", reason="liveness check via os.kill(pid, 0)")
+@pytest.mark.parametrize("ignore_cancel", [False, True])
+def test_cancel_leaves_no_worker_processes(tmp_path, ignore_cancel):
+    manager = DigitizeJobManager(target=stub_parallel_job, cancel_timeout=1.0)
+    job = manager.submit(str(tmp_path), str(tmp_path / "a.mtp"), ignore_cancel=ignore_cancel)
+    wait_for(manager, lambda: len(os.listdir(tmp_path)) == 4)  # задача + 3 воркера
+    pids = [int(name) for name in os.listdir(tmp_path)]
+
+    started = time.monotonic()
+    manager.cancel(job.id)
+    assert time.monotonic() - started < 0.2  # главный цикл не ждет даже упрямый процесс
+    assert job.status == CANCELLING
+    wait_for(manager, lambda: job.status == CANCELLED)
+    if not ignore_cancel:
+        assert job.process.exitcode == 0  # вышел сам, пул закрыт штатно
+        assert time.monotonic() - started < 1.0
+    deadline = time.monotonic() + 5
+    while any(_alive(pid) for pid in pids) and time.monotonic() < deadline:
+        time.sleep(0.05)
+    assert not [pid for pid in pids if _alive(pid)]
+    manager.close()
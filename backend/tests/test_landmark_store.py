@@ -0,0 +1,75 @@
+import json
+import zipfile
+
+import numpy as np
+import pytest
+
+from backend.core.geometry import AngleTable, DEFAULT_ANGLE_TABLE, calculate_angles_batch
+from backend.core.landmark_store import (
+    LANDMARKS_BIN_NAME, LandmarkTrack, decode_landmark_track, encode_landmark_track, load_landmark_track
+)
+from backend.core.mtp_writer import rederive_mtp
+from backend.core.pattern_store import decode_pattern_track
+
+
+def _track(frames=(0, 1, 3, 4)):
+    rng = np.random.default_rng(7)
+    world = rng.normal(size=(len(frames), 33, 3)).astype(np.float32)
+    visibility = rng.uniform(size=(len(frames), 33)).astype(np.float32)
+    return LandmarkTrack(np.array(frames), world, visibility, 25.0)
+
+
+def _level(path, track, with_landmarks=True):
+    files = {"video": "video.mp4", "patterns": "patterns.json"}
+    if with_landmarks:
+        files["landmarks"] = LANDMARKS_BIN_NAME
+    with zipfile.ZipFile(path, 'w', zipfile.ZIP_DEFLATED) as zf:
+        zf.writestr("manifest.json", json.dumps({"version": "2.0", "files": files}))
+        zf.writestr("patterns.json", "[]")
+        zf.writestr("video.mp4", b"\0" * 1000, compress_type=zipfile.ZIP_STORED)
+        if with_landmarks:
+            zf.writestr(LANDMARKS_BIN_NAME, encode_landmark_track(track), compress_type=zipfile.ZIP_STORED)
+
+
+def test_round_trip_and_mmap_at_offset(tmp_path):
+    track = _track()
+    data = encode_landmark_track(track)
+    decoded = decode_landmark_track(data)
+    assert decoded.frames.tolist() == [0, 1, 3, 4] and decoded.fps == 25.0
+    np.testing.assert_array_equal(decoded.world, track.world)  # world без потерь
+    assert np.abs(decoded.visibility - track.visibility).max() < 1e-3
+    assert not decoded.world.flags.owndata
+
+    path = tmp_path / "blob.bin"
+    path.write_bytes(b"xyz" + data)  # член архива лежит не с начала файла
+    np.testing.assert_array_equal(load_landmark_track(str(path), offset=3).world, track.world)
+
+
+def test_rederive_rebuilds_patterns_without_video(tmp_path):
+    track = _track()
+    _level(str(tmp_path / "level.mtp"), track)
+    assert rederive_mtp(str(tmp_path / "level.mtp"))["frames"] == 4  # на месте
+
+    with zipfile.ZipFile(tmp_path / "level.mtp") as zf:
+        manifest = json.loads(zf.read("manifest.json"))
+        records = json.loads(zf.read("patterns.json"))
+        patterns = decode_pattern_track(zf.read(manifest["files"]["patterns_bin"]))
+        assert zf.read("video.mp4") == b"\0" * 1000
+        assert zf.getinfo("video.mp4").compress_type == zipfile.ZIP_STORED
+    expected = calculate_angles_batch(track.world, DEFAULT_ANGLE_TABLE)
+    assert [r["timestamp"] for r in records] == [0.0, 0.04, 0.12, 0.16]
+    assert records[2]["angles"] == DEFAULT_ANGLE_TABLE.to_dict(expected[2])
+    np.testing.assert_allclose(patterns.angles, expected, rtol=1e-6)
+
+    # Новая таблица углов - из тех же landmarks
+    table = AngleTable({"left_elbow": (11, 13, 15), "neck_tilt": (0, 33, 34)})
+    rederive_mtp(str(tmp_path / "level.mtp"), str(tmp_path / "new.mtp"), table)
+    with zipfile.ZipFile(tmp_path / "new.mtp") as zf:
+        assert list(json.loads(zf.read("patterns.json"))[0]["angles"]) == ["left_elbow", "neck_tilt"]
+
+
+def test_rederive_requires_landmarks(tmp_path):
+    _level(str(tmp_path / "old.mtp"), None, with_landmarks=False)
+    with pytest.raises(ValueError):
+        rederive_mtp(str(tmp_path / "old.mtp"))
+    assert not (tmp_path / "old.mtp.part").exists()
@@ -0,0 +1,147 @@
+import json
+import os
+import shutil
+import zipfile
+from types import SimpleNamespace
+
+import cv2
+import pytest
+
+from backend.benchmarks.synthetic import make_video
+from backend.core.game_engine import GameEngine
+from backend.core.level_cache import LevelCache, open_video_capture
+from backend.core.pattern_store import load_patterns
+from backend.core.seek_index import load_seek_index
+from conftest import ROOT
+
+RECORDS = [
+    {"timestamp": 0.0, "angles": {"left_elbow": 90.0}},
+    {"timestamp": 0.033, "angles": {"left_elbow": 91.0}},
+]
+TIMELINE = {"tracks": [
+    {"id": "b", "events": [{"type": "text", "time": 2.0, "duration": 1.0}]},
+    {"id": "a", "events": [{"type": "no_score_zone", "time": 0.5, "duration": 1.0}]},
+]}
+
+
+def make_mtp(tmp_path, name="level.mtp", video_compression=zipfile.ZIP_STORED, frames=10,
+             timeline=TIMELINE, assets=None):
+    video = make_video(str(tmp_path / f"{name}.mp4"), frames=frames, width=160, height=120)
+    manifest = {"version": "2.0", "files": {"video": "video.mp4", "patterns": "patterns.json",
+                                            "timeline": "timeline.json"}}
+    path = tmp_path / name
+    with zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED) as zf:
+        zf.writestr("manifest.json", json.dumps(manifest))
+        zf.writestr("patterns.json", json.dumps(RECORDS))
+        zf.writestr("timeline.json", json.dumps(timeline))
+        zf.write(video, "video.mp4", compress_type=video_compression)
+        for name, data in (assets or {}).items():
+            zf.writestr(name, data)
+    return str(path)
+
+
+def test_stored_video_is_read_in_place_and_level_is_preparsed(tmp_path):
+    cache = LevelCache(str(tmp_path / "cache"))
+    level = cache.open(make_mtp(tmp_path))
+
+    assert not level.hit and level.video_in_place
+    assert not os.path.exists(os.path.join(level.dir, "video.mp4"))
+    cap = open_video_capture(level.video)
+    assert cap.read()[1].shape == (120, 160, 3)
+    cap.release()
+
+    # Паттерн собран в patterns.bin, таймлайн сведен и отсортирован
+    assert load_patterns(None, level.patterns_bin).joints == ["left_elbow"]
+    assert [evt["time"] for evt in level.timeline_events] == [0.5, 2.0]
+    with open(level.timeline) as f:
+        assert json.load(f) == TIMELINE
+    # Индекса кадров в старом архиве нет - построен по таблицам MP4
+    assert len(load_seek_index(level.seek_index)) == 10
+
+
+def test_compressed_video_is_extracted_once(tmp_path):
+    cache = LevelCache(str(tmp_path / "cache"))
+    level = cache.open(make_mtp(tmp_path, video_compression=zipfile.ZIP_DEFLATED))
+    assert not level.video_in_place
+    assert os.path.exists(level.video)
+
+
+def test_cache_is_keyed_by_content_not_path(tmp_path):
+    cache = LevelCache(str(tmp_path / "cache"))
+    path = make_mtp(tmp_path)
+    copy = str(tmp_path / "copy.mtp")
+    shutil.copy(path, copy)
+
+    first = cache.open(path)
+    second = cache.open(copy)
+    assert second.hit and second.key == first.key
+    assert second.video.endswith(":" + os.path.abspath(copy))
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_least_recently_used_entries_are_evicted(tmp_path):
+    paths = [make_mtp(tmp_path, f"level{i}.mtp", video_compression=zipfile.ZIP_DEFLATED, frames=10 + i)
+             for i in range(3)]
+    cache = LevelCache(str(tmp_path / "cache"), max_bytes=1 << 40)
+    keys = [cache.open(path).key for path in paths]
+    entry_size = max(size for _, size, _ in cache.entries())
+
+    # level0 использован последним, level1 - самый старый
+    for i, key in enumerate((keys[1], keys[2], keys[0])):
+        entry = os.path.join(cache.root, key, "entry.json")
+        os.utime(entry, (1000 + i, 1000 + i))
+
+    cache.max_bytes = entry_size * 2
+    cache.evict()
+    assert sorted(key for key, _, _ in cache.entries()) == sorted([keys[0], keys[2]])
+
+
+def test_archive_without_manifest_is_rejected(tmp_path):
+    path = tmp_path / "broken.mtp"
+    with zipfile.ZipFile(path, "w") as zf:
+        zf.writestr("video.mp4", b"")
+    with pytest.raises(KeyError):
+        LevelCache(str(tmp_path / "cache")).open(str(path))
+    assert os.listdir(tmp_path / "cache") == []
+
+
+def _engine(tmp_path):
+    return SimpleNamespace(level_cache=LevelCache(str(tmp_path / "cache")), frame_cache_bytes=1 << 20, speed=1.0)
+
+
+def test_engine_level_info_keeps_path_keys_for_mtp(tmp_path):
+    # Frontend читает level.timeline_path из get_state и для уровней, загруженных по mtp_path,
+    # и разрешает пути картинок таймлайна относительно него
+    timeline = {"tracks": [{"id": "a", "events": [
+        {"type": "image", "time": 1.0, "duration": 1.0, "asset": "./assets/logo.png"}]}]}
+    mtp = make_mtp(tmp_path, timeline=timeline, assets={"assets/logo.png": b"png"})
+    level = GameEngine._prepare_level(_engine(tmp_path), {"mtp_path": mtp})
+    GameEngine._release_level(level)
+
+    info = level["info"]
+    assert {"video_path", "json_path", "timeline_path", "mtp_path", "cache_hit"} <= set(info)
+    with open(info["timeline_path"]) as f:
+        assert json.load(f) == timeline
+    logo = os.path.join(os.path.dirname(info["timeline_path"]), "./assets/logo.png")
+    with open(logo, "rb") as f:
+        assert f.read() == b"png"
+
+
+def test_manifest_paths_are_normalized(tmp_path):
+    # levels/src.mtp: "video": "./assets/video.mp4" рядом с assets/logo.png
+    level = GameEngine._prepare_level(_engine(tmp_path), {"mtp_path": os.path.join(ROOT, "levels", "src.mtp")})
+    try:
+        assert level["cap_ref"].frame_size[0] > 0
+        assert level["patterns"] is not None
+        logo = os.path.join(os.path.dirname(level["info"]["timeline_path"]), "assets", "logo.png")
+        assert os.path.exists(logo)
+    finally:
+        GameEngine._release_level(level)
+
+
+def test_level_without_video_is_a_clear_error(tmp_path):
+    path = tmp_path / "novideo.mtp"
+    with zipfile.ZipFile(path, "w") as zf:
+        zf.writestr("manifest.json", json.dumps({"files": {"video": "./missing.mp4"}}))
+    with pytest.raises(ValueError, match="no video"):
+        GameEngine._prepare_level(_engine(tmp_path), {"mtp_path": str(path)})
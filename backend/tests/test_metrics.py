@@ -0,0 +1,58 @@
+import numpy as np
+
+from backend.core.metrics import Metrics, NullMetrics, RollingStats
+
+
+def test_rolling_stats_keeps_last_window():
+    stats = RollingStats(window=100)
+    for v in range(1000):
+        stats.add(float(v))
+    assert len(stats) == 100
+    summary = stats.summary()
+    assert summary["count"] == 100
+    assert summary["p50"] == np.percentile(np.arange(900, 1000), 50)
+    assert summary["max"] == 999.0
+
+
+def test_empty_stats():
+    assert RollingStats().summary() == {"count": 0}
+
+
+def test_metrics_snapshot_and_reset():
+    metrics = Metrics(window=10)
+    for v in (1.0, 2.0, 3.0):
+        metrics.observe("encode", v)
+    started = metrics.now()
+    metrics.record("loop", started)
+    metrics.count("late_frames")
+    metrics.count("late_frames", 2)
+
+    report = metrics.snapshot()
+    assert report["enabled"] is True
+    assert report["stages_ms"]["encode"]["p50"] == 2.0
+    assert report["stages_ms"]["loop"]["count"] == 1
+    assert report["counters"] == {"late_frames": 3}
+
+    metrics.reset()
+    assert metrics.snapshot()["stages_ms"] == {}
+
+
+def test_compact_block_is_cached():
+    metrics = Metrics()
+    metrics.observe("tick", 40.0)
+    metrics.count("dropped_frames")
+    block = metrics.compact()
+    assert block == {"tick": 40.0, "fps": 25.0, "late": 0, "dropped": 1, "skipped": 0}
+
+    metrics.observe("tick", 1000.0)
+    assert metrics.compact() is block
+
+
+def test_null_metrics_is_inert():
+    metrics = NullMetrics()
+    assert metrics.now() == 0.0
+    metrics.record("loop", metrics.now())
+    metrics.observe("encode", 1.0)
+    metrics.count("late_frames")
+    assert metrics.snapshot() == {"enabled": False}
+    assert metrics.compact() is None
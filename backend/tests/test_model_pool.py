@@ -0,0 +1,51 @@
+from backend.core.model_pool import PosePool
+
+
+class FakeEngine:
+    def __init__(self, static_mode=False, model_complexity=1):
+        self.static_mode = static_mode
+        self.model_complexity = model_complexity
+        self.resets = 0
+        self.warmed = False
+
+    def reset(self):
+        self.resets += 1
+
+    def warm_up(self):
+        self.warmed = True
+
+    def close(self):
+        pass
+
+
+def test_released_engine_is_reused_with_reset_state():
+    pool = PosePool(FakeEngine)
+    engine = pool.acquire()
+    pool.release(engine)
+    again = pool.acquire()
+    assert again is engine
+    assert again.resets == 1
+    assert (pool.created, pool.reused) == (1, 1)
+
+
+def test_engines_are_leased_exclusively_per_parameters():
+    pool = PosePool(FakeEngine)
+    first = pool.acquire()
+    second = pool.acquire()  # первый еще в аренде
+    lite = pool.acquire(model_complexity=0)
+    assert first is not second
+    assert lite.model_complexity == 0
+
+    # Вернувшийся с другой сложностью граф выдается по новым параметрам
+    first.model_complexity = 0
+    pool.release(first)
+    assert pool.acquire(model_complexity=1) is not first
+    assert pool.acquire(model_complexity=0) is first
+
+
+def test_warm_up_leaves_ready_engine_in_pool():
+    pool = PosePool(FakeEngine)
+    pool.warm_up()
+    with pool.lease() as engine:
+        assert engine.warmed
+    assert pool.created == 1
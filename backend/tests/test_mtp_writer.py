@@ -0,0 +1,166 @@
+import json
+import os
+import zipfile
+
+import numpy as np
+import pytest
+
+from backend.benchmarks.synthetic import make_video
+from backend.core.digitizer import DigitizeCancelled, _fill_spool, plan_segments
+from backend.core.geometry import JOINT_ANGLES, AngleTable, calculate_angles_batch
+from backend.core.landmark_store import decode_landmark_track
+from backend.core.mtp_writer import DigitizeWorkspace, LandmarkSpool, write_mtp
+from backend.core.pattern_store import PatternTrack, encode_pattern_track
+from backend.core.seek_index import SeekIndex
+
+JOINTS = ["left_elbow", "right_elbow"]
+TABLE = AngleTable({name: JOINT_ANGLES[name] for name in JOINTS})
+
+
+def _pose(seed):
+    """(33, 4): случайные world-координаты и visibility"""
+    rng = np.random.default_rng(seed)
+    return np.column_stack((rng.normal(size=(33, 3)), rng.uniform(size=33))).astype(np.float32)
+
+
+class FakeEngine:
+    """Поза из яркости кадра; на каждом 7-м кадре позы нет; crash_at - «падение» процесса"""
+
+    def __init__(self, crash_at=None):
+        self.crash_at = crash_at
+        self.frames = 0
+        self.resets = 0
+
+    def reset(self):
+        self.resets += 1
+
+    def process_frame(self, frame):
+        if self.crash_at is not None and self.frames == self.crash_at:
+            raise RuntimeError("crash")
+        self.frames += 1
+        return frame
+
+    def get_landmark_tensor(self, frame):
+        value = float(frame.mean())
+        if int(value * 10) % 7 == 0:
+            return None
+        return _pose(int(value * 1000))
+
+
+def test_spool_resumes_from_last_checkpoint(tmp_path):
+    spool = LandmarkSpool(str(tmp_path), 0, None)
+    spool.append([0, 1], [_pose(0), _pose(1)])
+    spool.checkpoint(2)
+    spool.append([2], [_pose(2)])  # после точки - теряется при сбое
+    spool.close()
+
+    resumed = LandmarkSpool(str(tmp_path), 0, None)
+    assert (resumed.rows, resumed.next_frame, resumed.done) == (2, 2, False)
+    resumed.append([3], [_pose(3)])
+    resumed.checkpoint(4, done=True)
+    rows = resumed.read_rows()
+    assert rows[:, 0].tolist() == [0, 1, 3]
+    np.testing.assert_array_equal(rows[2, 1:100].reshape(33, 3), _pose(3)[:, :3])
+    np.testing.assert_array_equal(rows[1, 100:], _pose(1)[:, 3])
+    assert os.path.getsize(resumed.path) == 3 * resumed.row_bytes
+
+
+def test_streamed_archive_matches_in_memory_encoding(tmp_path):
+    video = make_video(str(tmp_path / "v.mp4"), frames=5, width=64, height=48)
+    workspace = DigitizeWorkspace(str(tmp_path / "out.mtp"), video, 30.0, JOINTS)
+    workspace.plan([(0, 0, 3), (0, 3, None)])
+    poses = {i: _pose(i) for i in (0, 2, 3, 4)}
+    poses[0][[11, 13], :3] = 0.0  # плечо совпало с локтем: левый угол не определен (NaN)
+    first, second = workspace.spools()
+    first.append([0, 2], [poses[0], poses[2]])
+    first.checkpoint(3, done=True)
+    second.append([3, 4], [poses[3], poses[4]])
+    second.checkpoint(5, done=True)
+
+    manifest = {"version": "2.0", "files": {"video": "video.mp4", "patterns": "patterns.json"}}
+    write_mtp(str(tmp_path / "out.mtp"), manifest, workspace.spools(), 30.0, video,
+              SeekIndex.from_fps(5, 30.0), TABLE)
+    assert not os.path.exists(str(tmp_path / "out.mtp.part"))
+
+    world = np.stack([poses[i][:, :3] for i in sorted(poses)])
+    records = [{"timestamp": round(i / 30.0, 3), "angles": TABLE.to_dict(angles)}
+               for i, angles in zip(sorted(poses), calculate_angles_batch(world, TABLE))]
+    assert list(records[0]["angles"]) == ["right_elbow"]
+    with zipfile.ZipFile(tmp_path / "out.mtp") as zf:
+        assert zf.read("patterns.json") == json.dumps(records).encode()
+        assert zf.read("patterns.bin") == encode_pattern_track(PatternTrack.from_records(records, JOINTS))
+        track = decode_landmark_track(zf.read("landmarks.bin"))
+        assert zf.getinfo("video.mp4").compress_type == zipfile.ZIP_STORED
+        assert zf.getinfo("patterns.bin").compress_type == zipfile.ZIP_STORED
+        assert zf.getinfo("landmarks.bin").compress_type == zipfile.ZIP_STORED
+    assert track.frames.tolist() == [0, 2, 3, 4] and track.fps == 30.0
+    np.testing.assert_array_equal(track.world, world)
+
+
+def test_segment_warmup_is_blended_into_previous_tail(tmp_path):
+    video = make_video(str(tmp_path / "v.mp4"), frames=6, width=64, height=48)
+    workspace = DigitizeWorkspace(str(tmp_path / "out.mtp"), video, 30.0, JOINTS)
+    workspace.plan([(0, 0, 4), (2, 4, None)])
+    first, second = workspace.spools()
+    first.append([0, 1, 2, 3], [_pose(0)] * 4)
+    first.checkpoint(4, done=True)
+    # Прогрев второго сегмента (кадры 2, 3), затем его собственные кадры
+    second.append([2, 3, 4, 5], [_pose(1)] * 4)
+    second.checkpoint(6, done=True)
+    assert (second.rows, second.pattern_rows) == (4, 2)
+
+    manifest = {"version": "2.0", "files": {"video": "video.mp4", "patterns": "patterns.json"}}
+    write_mtp(str(tmp_path / "out.mtp"), manifest, workspace.spools(), 30.0, video,
+              SeekIndex.from_fps(6, 30.0), TABLE)
+    with zipfile.ZipFile(tmp_path / "out.mtp") as zf:
+        track = decode_landmark_track(zf.read("landmarks.bin"))
+    assert track.frames.tolist() == [0, 1, 2, 3, 4, 5]
+    old, new = _pose(0)[:, :3], _pose(1)[:, :3]
+    for frame, weight in ((0, 0.0), (1, 0.0), (2, 1 / 3), (3, 2 / 3), (4, 1.0), (5, 1.0)):
+        np.testing.assert_allclose(track.world[frame], old + (new - old) * weight, atol=1e-5)
+
+
+def _digitize_segments(output, video, engine, segments, resume=True, cancel_event=None):
+    workspace = DigitizeWorkspace(output, video, 30.0, JOINTS, resume)
+    workspace.plan(segments)
+    for spool in workspace.spools():
+        _fill_spool(engine, video, spool, cancel_event=cancel_event)
+    return workspace.spools()
+
+
+def test_interrupted_run_resumes_with_same_rows(tmp_path):
+    video = make_video(str(tmp_path / "v.mp4"), frames=45, width=64, height=48)
+    segments = plan_segments(45, 10, overlap_frames=5)
+    full = _digitize_segments(str(tmp_path / "full.mtp"), video, FakeEngine(), segments)
+
+    # Сегменты 0 и 1 - 10 + 15 кадров, падение на третьем
+    with pytest.raises(RuntimeError):
+        _digitize_segments(str(tmp_path / "out.mtp"), video, FakeEngine(crash_at=27), segments)
+    engine = FakeEngine()
+    resumed = _digitize_segments(str(tmp_path / "out.mtp"), video, engine, segments)
+    assert engine.frames == 3 * 15 - 5  # готовые сегменты пропущены, недописанный - с прогрева
+    assert engine.resets == 3  # трекер начинает заново на каждом сегменте
+    assert all(spool.done for spool in resumed)
+    for a, b in zip(full, resumed):
+        np.testing.assert_array_equal(a.read_rows(), b.read_rows())
+
+
+def test_cancelled_segment_is_not_marked_done(tmp_path):
+    video = make_video(str(tmp_path / "v.mp4"), frames=45, width=64, height=48)
+
+    class Cancel:
+        """Выставляется после 30 кадров"""
+
+        def __init__(self, engine):
+            self.engine = engine
+
+        def is_set(self):
+            return self.engine.frames >= 30
+
+    engine = FakeEngine()
+    segments = plan_segments(45, 10, overlap_frames=5)
+    with pytest.raises(DigitizeCancelled):
+        _digitize_segments(str(tmp_path / "out.mtp"), video, engine, segments, cancel_event=Cancel(engine))
+    assert engine.frames == 30
+    workspace = DigitizeWorkspace(str(tmp_path / "out.mtp"), video, 30.0, JOINTS)
+    assert [spool.done for spool in workspace.spools()] == [True, True, False, False, False]
@@ -0,0 +1,108 @@
+import threading
+import time
+
+import numpy as np
+
+from backend.core.multiplayer import Player, PlayerRegions, match_regions, split_lanes
+from backend.core.pose_tracking import PoseSample, map_region_sample
+
+
+class FakeDetector:
+    def __init__(self, frames):
+        self.frames = list(frames)
+
+    def detect(self, frame):
+        return self.frames.pop(0)
+
+
+def test_split_lanes_covers_frame():
+    assert split_lanes(640, 480, 2) == [(0, 0, 320, 480), (320, 0, 640, 480)]
+    lanes = split_lanes(641, 480, 3)
+    assert lanes[0][0] == 0 and lanes[-1][2] == 641
+    assert all(a[2] == b[0] for a, b in zip(lanes, lanes[1:]))
+
+
+def test_match_regions_prefers_nearest_and_respects_distance():
+    previous = {1: (0, 0, 100, 100), 2: (200, 0, 300, 100)}
+    boxes = [(210, 0, 310, 100), (5, 0, 105, 100), (900, 0, 1000, 100)]
+    assert match_regions(previous, boxes, max_distance=50) == {1: 1, 2: 0}
+
+
+def test_lane_regions_without_detector():
+    regions = PlayerRegions(2)
+    frame = np.zeros((120, 200, 3), dtype=np.uint8)
+    assert regions.regions(frame) == {1: (0, 0, 100, 120), 2: (100, 0, 200, 120)}
+
+
+def test_detector_ids_stay_stable_when_players_move():
+    frame = np.zeros((100, 400, 3), dtype=np.uint8)
+    detector = FakeDetector([
+        [(220, 10, 280, 90), (20, 10, 80, 90)],   # крупные первыми - порядок не слева направо
+        [(60, 10, 120, 90), (240, 10, 300, 90)],  # оба сдвинулись вправо
+        [(250, 10, 310, 90)],                     # первый игрок пропал из кадра
+    ])
+    regions = PlayerRegions(2, detector, detect_every=1, margin=0.0, background=False)
+
+    first = regions.regions(frame)
+    assert first == {1: (20, 10, 80, 90), 2: (220, 10, 280, 90)}
+    second = regions.regions(frame)
+    assert second == {1: (60, 10, 120, 90), 2: (240, 10, 300, 90)}
+    # Ненайденный игрок сохраняет прежнюю область
+    third = regions.regions(frame)
+    assert third == {1: (60, 10, 120, 90), 2: (250, 10, 310, 90)}
+
+
+class SlowDetector:
+    def __init__(self):
+        self.release = threading.Event()
+        self.calls = 0
+
+    def detect(self, frame):
+        self.calls += 1
+        self.release.wait(5)
+        return [(20, 10, 80, 90)]
+
+
+def test_background_detector_never_blocks_regions():
+    frame = np.zeros((100, 400, 3), dtype=np.uint8)
+    detector = SlowDetector()
+    regions = PlayerRegions(2, detector, detect_every=1, margin=0.0)
+    lanes = {1: (0, 0, 200, 100), 2: (200, 0, 400, 100)}
+
+    started = time.perf_counter()
+    for _ in range(5):
+        assert regions.regions(frame) == lanes  # детектор занят - области прежние
+    assert time.perf_counter() - started < 0.5
+    deadline = time.monotonic() + 5
+    while detector.calls == 0:
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+    regions.regions(frame)
+    assert detector.calls == 1  # занятому детектору кадры не отдаются
+
+    detector.release.set()
+    while regions.regions(frame)[1] != (20, 10, 80, 90):
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+    regions.close()
+
+
+def test_region_sample_maps_to_full_frame():
+    image = np.array([[0.0, 0.0, 0.1], [1.0, 1.0, 0.2], [0.5, 0.5, 0.3]], dtype=np.float32)
+    sample = PoseSample(np.zeros((3, 3)), image, np.ones(3))
+    mapped = map_region_sample(sample, (100, 0, 200, 50), (100, 400))
+    assert np.allclose(mapped.image[:, 0], [0.25, 0.5, 0.375])
+    assert np.allclose(mapped.image[:, 1], [0.0, 0.5, 0.25])
+    assert np.allclose(mapped.image[:, 2], image[:, 2])
+    assert sample.image[1, 0] == 1.0
+
+
+def test_player_meta_reports_landmarks():
+    player = Player(2, pipeline=None)
+    assert player.to_meta() == {"id": 2, "score": 0, "landmarks": None}
+
+    image = np.full((33, 3), 0.12345, dtype=np.float32)
+    player.sample = PoseSample(np.zeros((33, 3)), image, np.full(33, 0.9, dtype=np.float32))
+    meta = player.to_meta()
+    assert len(meta["landmarks"]) == 33
+    assert meta["landmarks"][0] == [0.123, 0.123, 0.9]
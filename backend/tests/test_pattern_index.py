@@ -0,0 +1,44 @@
+import numpy as np
+import pytest
+
+from backend.core.pattern_index import PatternTimeline
+
+
+def make_timeline():
+    ts = np.array([0.0, 1.0, 2.0, 3.0], dtype=np.float32)
+    angles = np.array([[0, 100], [10, 100], [20, np.nan], [30, 90]], dtype=np.float32)
+    return PatternTimeline(ts, angles, ["left_elbow", "right_elbow"])
+
+
+def test_at_interpolates_between_samples():
+    pose = make_timeline().at(0.25)
+    assert pose[0] == pytest.approx(2.5)
+    assert pose[1] == pytest.approx(100.0)
+
+
+def test_at_clamps_outside_pattern():
+    tl = make_timeline()
+    assert tl.at(-1.0)[0] == 0
+    assert tl.at(99.0)[0] == 30
+
+
+def test_angles_at_skips_missing_values():
+    assert make_timeline().angles_at(2.0) == {"left_elbow": 20.0}
+
+
+def test_window_returns_samples_in_closed_range():
+    ts, angles = make_timeline().window(1.5, 0.5)
+    assert ts.tolist() == [1.0, 2.0]
+    assert angles.shape == (2, 2)
+
+
+def test_unsorted_input_is_sorted():
+    tl = PatternTimeline([2.0, 0.0, 1.0], [[2.0], [0.0], [1.0]], ["a"])
+    assert tl.timestamps.tolist() == [0.0, 1.0, 2.0]
+    assert tl.at(1.5)[0] == pytest.approx(1.5)
+
+
+def test_empty_pattern():
+    tl = PatternTimeline(np.zeros(0), np.zeros((0, 1)), ["a"])
+    assert tl.at(1.0) is None
+    assert tl.angles_at(1.0) == {}
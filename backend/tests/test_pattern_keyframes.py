@@ -0,0 +1,85 @@
+import json
+import zipfile
+
+import numpy as np
+
+from backend.core.geometry import DEFAULT_ANGLE_TABLE, calculate_angles_batch
+from backend.core.landmark_store import LANDMARKS_BIN_NAME, LandmarkTrack, encode_landmark_track
+from backend.core.mtp_writer import rederive_mtp
+from backend.core.pattern_index import PatternTimeline
+from backend.core.pattern_keyframes import densify, keyframe_mask
+from backend.core.pattern_store import decode_pattern_track, load_patterns
+
+FPS = 30.0
+
+
+def _grid(n):
+    return np.round(np.arange(n) / FPS, 3).astype(np.float32)
+
+
+def test_mask_bounds_interpolation_error():
+    rng = np.random.default_rng(3)
+    t = _grid(600)
+    angles = np.column_stack([np.interp(t, np.sort(rng.uniform(0, 20, 12)), rng.uniform(20, 170, 12))
+                              for _ in range(4)]) + rng.normal(0, 0.2, (600, 4))
+    keep = keyframe_mask(t, angles, 1.0, 1 / FPS)
+    assert keep[0] and keep[-1] and keep.sum() < 600 / 3
+
+    rebuilt = np.column_stack([np.interp(t, t[keep], angles[keep, j]) for j in range(4)])
+    assert np.abs(rebuilt - angles).max() <= 1.0
+
+
+def test_mask_keeps_gaps_and_missing_joints():
+    t = np.concatenate((_grid(40), _grid(100)[60:]))  # кадры 40..59 без позы
+    angles = np.full((len(t), 2), 90.0)
+    angles[10:20, 1] = np.nan  # сустав не определен
+    keep = np.flatnonzero(keyframe_mask(t, angles, 1.0, 1 / FPS))
+    assert keep.tolist() == [0, 9, 10, 19, 20, 39, 40, len(t) - 1]
+
+
+def test_densify_adds_match_samples_on_fast_segments():
+    t = np.array([0.0, 1.0, 2.0, 2.1], dtype=np.float32)
+    angles = np.array([[0.0, 10.0], [90.0, 10.0], [90.0, 11.0], [130.0, 11.0]], dtype=np.float32)
+    dense_t, dense = densify(t, angles, 1 / FPS)
+
+    # 90 градусов за секунду - 18 шагов по 5; удержание - без новых сэмплов; 3 кадра - не больше 3 шагов
+    assert len(dense_t) == 18 + 1 + 3 + 1
+    assert dense_t.dtype == np.float32 and np.all(np.diff(dense_t) > 0)
+    np.testing.assert_allclose(dense[9], [45.0, 10.0], atol=1e-4)
+    timeline = PatternTimeline(dense_t, dense, ["a", "b"])
+    np.testing.assert_allclose(timeline.at(0.77), [69.3, 10.0], atol=1e-3)
+
+
+def test_compressed_level_round_trip(tmp_path):
+    n = 300
+    world = np.tile(np.random.default_rng(1).normal(size=(33, 3)), (n, 1, 1)).astype(np.float32)
+    world[:, 15] += np.linspace(0, 0.5, n, dtype=np.float32)[:, None]  # запястье медленно уходит
+    track = LandmarkTrack(np.arange(n), world, np.ones((n, 33), np.float32), FPS)
+    path = tmp_path / "level.mtp"
+    with zipfile.ZipFile(path, 'w') as zf:
+        files = {"patterns": "patterns.json", "landmarks": LANDMARKS_BIN_NAME}
+        zf.writestr("manifest.json", json.dumps({"version": "2.0", "files": files}))
+        zf.writestr(LANDMARKS_BIN_NAME, encode_landmark_track(track))
+
+    report = rederive_mtp(str(path), keyframe_error=0.5)
+    assert report["frames"] == n and report["keyframes"] < n / 5
+    assert report["ratio"] == round(n / report["keyframes"], 2)
+
+    with zipfile.ZipFile(path) as zf:
+        assert json.loads(zf.read("manifest.json"))["pattern_keyframes"] == report
+        assert len(json.loads(zf.read("patterns.json"))) == report["keyframes"]
+        stored = decode_pattern_track(zf.read("patterns.bin"))
+        zf.extractall(tmp_path / "level")
+    assert stored.keyframes == report
+
+    expected = calculate_angles_batch(world, DEFAULT_ANGLE_TABLE)
+    for loaded in (stored, load_patterns(str(tmp_path / "level" / "patterns.json"), bin_path="")):
+        timeline = PatternTimeline.from_track(loaded)
+        assert timeline.keyframes == report
+        rebuilt = np.stack([timeline.at(t) for t in _grid(n)])
+        assert np.nanmax(np.abs(rebuilt - expected)) <= 0.5 + 1e-3  # + float32 в patterns.bin
+
+    # Без keyframe_error - снова строка на кадр, отчет из manifest убирается
+    assert rederive_mtp(str(path))["keyframes"] == n
+    with zipfile.ZipFile(path) as zf:
+        assert "pattern_keyframes" not in json.loads(zf.read("manifest.json"))
@@ -0,0 +1,46 @@
+import json
+
+import numpy as np
+
+from backend.core.pattern_store import (
+    PatternTrack, encode_pattern_track, decode_pattern_track, load_patterns, PATTERNS_BIN_NAME
+)
+
+RECORDS = [
+    {"timestamp": 0.0, "angles": {"left_elbow": 90.0, "right_elbow": 45.5}},
+    {"timestamp": 0.033, "angles": {"left_elbow": 91.0}},
+    {"timestamp": 0.067, "angles": {"left_elbow": 92.5, "right_elbow": 47.0}},
+]
+
+
+def test_binary_track_round_trip():
+    track = PatternTrack.from_records(RECORDS)
+    decoded = decode_pattern_track(encode_pattern_track(track))
+
+    assert decoded.joints == ["left_elbow", "right_elbow"]
+    assert decoded.angles.shape == (3, 2)
+    assert np.isnan(decoded.angles[1, 1])
+    assert decoded.to_records()[1]["angles"] == {"left_elbow": 91.0}
+
+
+def test_decode_is_zero_copy():
+    data = bytearray(encode_pattern_track(PatternTrack.from_records(RECORDS)))
+    track = decode_pattern_track(data)
+    assert not track.timestamps.flags.owndata
+    assert not track.angles.flags.owndata
+
+
+def test_load_patterns_prefers_manifest_binary(tmp_path):
+    (tmp_path / "patterns.json").write_text(json.dumps(RECORDS[:1]))
+    (tmp_path / PATTERNS_BIN_NAME).write_bytes(encode_pattern_track(PatternTrack.from_records(RECORDS)))
+    manifest = {"version": "2.0", "files": {"patterns": "patterns.json", "patterns_bin": PATTERNS_BIN_NAME}}
+    (tmp_path / "manifest.json").write_text(json.dumps(manifest))
+
+    assert len(load_patterns(str(tmp_path / "patterns.json"))) == 3
+
+
+def test_load_patterns_falls_back_to_json(tmp_path):
+    (tmp_path / "patterns.json").write_text(json.dumps(RECORDS))
+    track = load_patterns(str(tmp_path / "patterns.json"))
+    assert track.joints == ["left_elbow", "right_elbow"]
+    assert len(track) == 3
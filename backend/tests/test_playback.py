@@ -0,0 +1,145 @@
+import numpy as np
+import pytest
+
+from backend.core.capture import CapturedFrame
+from backend.core.playback import AudioTrack, FrameScheduler, MediaClock, PlaybackClock, atempo_filter
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self):
+        return self.now
+
+
+class FakeReader:
+    """Кадры 30 fps; available - сколько кадров декодер успел подготовить"""
+
+    def __init__(self, n_frames, fps=30.0):
+        self.frames = [CapturedFrame(np.full((2, 2, 3), i % 256, np.uint8), 0.0, i * 1000.0 / fps, i + 1)
+                       for i in range(n_frames)]
+        self.available = n_frames
+        self.pos = 0
+        self.eof = False
+        self.seeks = []
+
+    def read_frame(self, timeout=None):
+        if self.pos >= len(self.frames):
+            self.eof = True
+            return None
+        if self.pos >= self.available:
+            return None
+        self.pos += 1
+        return self.frames[self.pos - 1]
+
+    def seek_time(self, t):
+        self.seeks.append(t)
+        self.pos = int(t * 30.0)
+        return self.read_frame()
+
+
+class FakePlayer:
+    def __init__(self, path, ff_opts):
+        self.path = path
+        self.ff_opts = ff_opts
+        self.pts = float('nan')
+        self.paused = ff_opts.get('paused')
+        self.closed = False
+
+    def get_pts(self):
+        return self.pts
+
+    def set_pause(self, paused):
+        self.paused = paused
+
+    def seek(self, pts, relative=True):
+        self.pts = pts
+
+    def close_player(self):
+        self.closed = True
+
+
+def test_media_clock_speed_pause_and_seek():
+    now = FakeClock()
+    clock = MediaClock(clock=now)
+    clock.start()
+    now.now += 2.0
+    assert clock.position() == pytest.approx(2.0)
+
+    clock.set_speed(0.5)
+    now.now += 2.0
+    assert clock.position() == pytest.approx(3.0)
+
+    clock.pause()
+    now.now += 5.0
+    assert clock.position() == pytest.approx(3.0)
+    clock.seek(10.0)
+    clock.start()
+    now.now += 1.0
+    assert clock.position() == pytest.approx(10.5)
+
+
+def test_atempo_chain_stays_in_filter_range():
+    assert atempo_filter(0.75) == "atempo=0.75"
+    assert atempo_filter(0.25) == "atempo=0.5,atempo=0.5"
+
+
+def test_audio_track_maps_tempo_adjusted_pts_to_level_time():
+    track = AudioTrack(FakePlayer, "level.mp4", speed=1.0)
+    assert track.player.ff_opts == {'vn': True, 'paused': True}
+    assert track.position() is None  # звук еще не пошел
+
+    track.set_speed(0.5, 4.0)
+    assert track.player.ff_opts == {'vn': True, 'paused': True, 'ss': 4.0, 'af': 'atempo=0.5'}
+    track.player.pts = 6.0  # 2 с реального времени после старта с 4.0
+    assert track.position() == pytest.approx(5.0)
+
+
+def test_playback_clock_follows_audio_until_it_stops():
+    now = FakeClock()
+    track = AudioTrack(FakePlayer, "level.mp4")
+    clock = PlaybackClock(track, clock=now)
+    clock.start()
+    assert not track.player.paused
+
+    now.now += 1.0
+    assert clock.position() == pytest.approx(1.0)  # звук еще не пошел - монотонные часы
+    track.player.pts = 0.9
+    assert clock.position() == pytest.approx(0.9)  # главный - звук
+
+    # Звук кончился раньше видео: часы идут дальше сами
+    now.now += 3.0
+    assert clock.position() == pytest.approx(3.9)
+
+
+def test_scheduler_holds_frames_at_half_speed():
+    reader = FakeReader(30)
+    scheduler = FrameScheduler(reader, 1 / 30.0)
+    shown = []
+    for tick in range(8):
+        # Тик чуть раньше середины между кадрами: на экране ближайший по времени кадр
+        item, skipped, late = scheduler.advance(max(tick / 30.0 * 0.5 - 0.001, 0.0))
+        assert skipped == 0 and not late
+        shown.append(None if item is None else int(item.frame[0, 0, 0]))
+    assert shown == [0, None, 1, None, 2, None, 3, None]
+
+
+def test_scheduler_skips_late_frames_and_reports_decoder_stalls():
+    reader = FakeReader(300)
+    scheduler = FrameScheduler(reader, 1 / 30.0)
+    assert int(scheduler.advance(0.0)[0].frame[0, 0, 0]) == 0
+
+    # Медленный тик: часы ушли на 5 кадров вперед
+    item, skipped, late = scheduler.advance(5 / 30.0)
+    assert int(item.frame[0, 0, 0]) == 5 and skipped == 4
+
+    # Декодер не успел - держим прежний кадр (кадр 6 уже был прочитан наперед)
+    reader.available = reader.pos
+    assert int(scheduler.advance(6 / 30.0)[0].frame[0, 0, 0]) == 6
+    assert scheduler.advance(7 / 30.0) == (None, 0, True)
+
+    # Большое отставание догоняется seek, а не декодированием
+    reader.available = 300
+    item, skipped, late = scheduler.advance(5.0)
+    assert reader.seeks == [5.0] and int(item.frame[0, 0, 0]) == 150
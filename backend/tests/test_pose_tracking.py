@@ -0,0 +1,94 @@
+import numpy as np
+
+from backend.core.pose_tracking import InferenceGovernor, LandmarkTracker, OneEuroFilter, PoseSample
+
+
+def make_sample(offset):
+    world = np.full((33, 3), offset, dtype=np.float32)
+    image = np.full((33, 3), 0.5 + offset, dtype=np.float32)
+    return PoseSample(world, image, np.ones(33, dtype=np.float32))
+
+
+def test_one_euro_passes_constant_signal():
+    f = OneEuroFilter()
+    for i in range(10):
+        out = f(i / 30.0, np.array([1.0, 2.0]))
+    assert np.allclose(out, [1.0, 2.0])
+    assert np.allclose(f.predict(1.0), [1.0, 2.0])
+
+
+def test_one_euro_extrapolates_linear_motion():
+    f = OneEuroFilter(min_cutoff=5.0, beta=1.0)
+    for i in range(60):
+        f(i / 30.0, np.array([i / 30.0]))
+    # Скорость ~1 ед/сек: прогноз на следующий кадр близок к истинному значению
+    assert abs(f.predict(60 / 30.0)[0] - 60 / 30.0) < 0.02
+
+
+def test_predict_horizon_is_bounded():
+    f = OneEuroFilter(min_cutoff=5.0, beta=1.0)
+    for i in range(30):
+        f(i / 30.0, np.array([i / 30.0]))
+    assert np.allclose(f.predict(100.0), f.predict(f.t + 0.25))
+
+
+def test_tracker_predicts_only_after_update():
+    tracker = LandmarkTracker()
+    assert tracker.predict(0.0) is None
+
+    tracker.update(0.0, make_sample(0.0))
+    predicted = tracker.predict(0.033)
+    assert predicted.predicted
+    assert predicted.world.shape == (33, 3)
+    assert predicted.image.shape == (33, 3)
+
+    tracker.reset()
+    assert tracker.predict(0.066) is None
+
+
+def feed(governor, ms, frames):
+    changes = []
+    for i in range(frames):
+        if governor.should_infer():
+            change = governor.record(ms, now=i / 30.0)
+            if change is not None:
+                changes.append(change)
+    return changes
+
+
+def test_governor_stays_full_when_fast():
+    governor = InferenceGovernor(budget_ms=16.0, settle_frames=5)
+    assert feed(governor, 5.0, 100) == []
+    assert governor.mode == "full"
+    assert governor.stride == 1
+
+
+def test_governor_raises_stride_then_drops_complexity():
+    governor = InferenceGovernor(budget_ms=16.0, max_stride=3, complexity=1, settle_frames=5)
+    feed(governor, 25.0, 30)
+    assert governor.mode == "stride"
+    assert governor.stride == 2
+
+    changes = feed(governor, 60.0, 200)
+    assert governor.stride == 3
+    assert changes == [0]
+    assert governor.mode == "lite"
+
+
+def test_governor_recovers_when_load_drops():
+    governor = InferenceGovernor(budget_ms=16.0, max_stride=3, complexity=1, settle_frames=5)
+    feed(governor, 60.0, 200)
+    assert governor.mode == "lite"
+
+    changes = feed(governor, 3.0, 300)
+    assert changes == [1]
+    assert governor.mode == "full"
+
+
+def test_governor_meta():
+    governor = InferenceGovernor()
+    assert governor.meta()["infer_ms"] is None
+    governor.should_infer()
+    governor.record(12.34, now=0.0)
+    meta = governor.meta()
+    assert meta == {"mode": "full", "stride": 1, "complexity": 1, "rate": 1, "infer_ms": 12.3}
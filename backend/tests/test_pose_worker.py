@@ -0,0 +1,128 @@
+import time
+
+import numpy as np
+import pytest
+
+from backend.core.pose_tracking import InferenceGovernor, LandmarkTracker, PoseSample
+from backend.core.pose_worker import InlinePoseBackend, PosePipeline, ProcessPoseBackend, shrink_to_height
+from backend.core.shm_transport import SharedFrameRing
+
+
+def fake_worker(requests, results, model_complexity):
+    # Вместо MediaPipe: "поза" - средняя яркость кадра и его высота
+    ring = None
+    while True:
+        message = requests.get()
+        if message is None:
+            break
+        if message[0] == "ring":
+            ring = SharedFrameRing.open(message[1])
+        elif message[0] == "frame":
+            _, seq, desc = message
+            frame = ring.read(desc)
+            value = float(frame.mean())
+            world = np.full((33, 3), value, dtype=np.float32)
+            image = np.full((33, 3), frame.shape[0], dtype=np.float32)
+            results.put((seq, PoseSample(world, image, np.ones(33, dtype=np.float32)), 1.0))
+    ring.close()
+
+
+class FakeEngine:
+    def __init__(self):
+        self.heights = []
+
+    def process_frame(self, frame, max_height=None):
+        self.heights.append(max_height)
+        return frame
+
+    def get_sample(self, frame):
+        return None if frame.mean() == 0 else PoseSample(np.zeros((33, 3)), np.zeros((33, 3)), np.ones(33))
+
+
+def collect_all(backend, count, timeout=20.0):
+    done = []
+    deadline = time.monotonic() + timeout
+    while len(done) < count:
+        assert time.monotonic() < deadline
+        done += backend.collect()
+        time.sleep(0.01)
+    return done
+
+
+def test_shrink_to_height_only_downscales():
+    frame = np.zeros((480, 640, 3), dtype=np.uint8)
+    assert shrink_to_height(frame, 240).shape == (240, 320, 3)
+    assert shrink_to_height(frame, 720) is frame
+    assert shrink_to_height(frame, None) is frame
+
+
+def test_inline_backend_returns_result_immediately():
+    engine = FakeEngine()
+    backend = InlinePoseBackend(engine, max_height=240)
+    backend.submit(1, np.zeros((4, 4, 3), dtype=np.uint8))
+    backend.submit(2, np.ones((4, 4, 3), dtype=np.uint8))
+    (seq1, sample1, _), (seq2, sample2, ms) = backend.collect()
+    assert (seq1, sample1) == (1, None)
+    assert seq2 == 2 and sample2 is not None and ms >= 0
+    assert backend.collect() == []
+    assert engine.heights == [240, 240]
+
+
+def test_process_backend_matches_results_by_sequence():
+    backend = ProcessPoseBackend(max_height=60, depth=2, target=fake_worker)
+    try:
+        backend.submit(10, np.full((120, 160, 3), 50, dtype=np.uint8))
+        backend.submit(11, np.full((120, 160, 3), 90, dtype=np.uint8))
+        # Глубина конвейера 2: третий кадр ждет, пока не придет результат
+        assert not backend.can_submit()
+
+        done = sorted(collect_all(backend, 2), key=lambda r: r[0])
+        assert [seq for seq, _, _ in done] == [10, 11]
+        assert done[0][1].world[0, 0] == pytest.approx(50)
+        assert done[1][1].world[0, 0] == pytest.approx(90)
+        # Кадр уменьшен до max_height до передачи в воркер
+        assert done[0][1].image[0, 0] == 60
+        assert backend.can_submit()
+    finally:
+        backend.close()
+
+
+def test_process_backend_reports_dead_worker():
+    backend = ProcessPoseBackend(depth=1, target=time.sleep)  # "воркер" падает на аргументах
+    try:
+        backend.submit(1, np.zeros((8, 8, 3), dtype=np.uint8))
+        backend.process.join(timeout=20)
+        with pytest.raises(RuntimeError):
+            backend.collect()
+    finally:
+        backend.close()
+
+
+def test_pipeline_maps_region_results_to_frame():
+    class RegionEngine(FakeEngine):
+        def get_sample(self, frame):
+            image = np.tile([0.5, 0.5, 0.0], (33, 1)).astype(np.float32)
+            return PoseSample(np.zeros((33, 3)), image, np.ones(33))
+
+    pipeline = PosePipeline(InlinePoseBackend(RegionEngine()), InferenceGovernor(), LandmarkTracker())
+    frame = np.ones((100, 200, 3), dtype=np.uint8)
+    sample = pipeline.process(frame, 0.0, region=(100, 0, 200, 100))
+    assert not sample.predicted
+    assert sample.image[0, 0] == 0.75
+    assert sample.image[0, 1] == 0.5
+
+
+def test_pipeline_predicts_when_governor_skips_frame():
+    governor = InferenceGovernor()
+    governor.infer_ms = 50.0
+    governor.stride = 2
+    pipeline = PosePipeline(InlinePoseBackend(FakeEngine()), governor, LandmarkTracker())
+    pipeline.set_frame_time(33.0)
+    frame = np.ones((10, 10, 3), dtype=np.uint8)
+
+    first = pipeline.process(frame, 0.0)  # кадр 1 - пропуск, трекеру нечего предсказывать
+    second = pipeline.process(frame, 0.033)
+    third = pipeline.process(frame, 0.066)
+    assert first is None
+    assert not second.predicted
+    assert third.predicted
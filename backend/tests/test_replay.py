@@ -0,0 +1,97 @@
+import json
+import zipfile
+
+import numpy as np
+
+from backend.benchmarks.synthetic import make_video
+from backend.core.geometry import calculate_angles_batch, DEFAULT_ANGLE_TABLE
+from backend.core.pose_tracking import PoseSample
+from backend.core.replay import ReplaySession, replay_many
+from backend.core.scoring import PERFECT
+
+FPS = 30.0
+
+
+def fixed_pose():
+    rng = np.random.default_rng(1)
+    return rng.normal(size=(33, 3)).astype(np.float32)
+
+
+class FixedPoseEngine:
+    """Вместо MediaPipe: на каждом кадре одна и та же поза"""
+
+    def __init__(self):
+        self.frames = 0
+
+    def process_frame(self, frame, max_height=None):
+        self.frames += 1
+        return frame
+
+    def get_sample(self, frame):
+        image = np.full((33, 3), 0.5, dtype=np.float32)
+        return PoseSample(fixed_pose(), image, np.ones(33, dtype=np.float32))
+
+    def draw_sample(self, frame, sample, min_visibility=0.5, scale=1.0):
+        pass
+
+
+def make_level(path, seconds=2.0, timeline=None):
+    # Эталон - та же поза, что выдает FixedPoseEngine: все кадры вне no_score_zone - PERFECT
+    angles = DEFAULT_ANGLE_TABLE.to_dict(calculate_angles_batch(fixed_pose(), DEFAULT_ANGLE_TABLE))
+    records = [{"timestamp": i / FPS, "angles": angles} for i in range(int(seconds * FPS))]
+    files = {"video": "video.mp4", "patterns": "patterns.json"}
+    path.mkdir()
+    (path / "patterns.json").write_text(json.dumps(records))
+    if timeline is not None:
+        files["timeline"] = "timeline.json"
+        (path / "timeline.json").write_text(json.dumps(timeline))
+    (path / "manifest.json").write_text(json.dumps({"version": "2.0", "files": files}))
+    make_video(str(path / "video.mp4"), frames=int(seconds * FPS), width=160, height=120, fps=FPS)
+    return path
+
+
+def read_log(path):
+    lines = [json.loads(line) for line in open(path)]
+    return lines[:-1], lines[-1]["summary"]
+
+
+def test_replay_scores_every_frame_and_writes_log(tmp_path):
+    timeline = {"tracks": [{"id": "zones", "events": [{"type": "no_score_zone", "time": 0.0, "duration": 0.5}]}]}
+    level = make_level(tmp_path / "level", timeline=timeline)
+    video = make_video(str(tmp_path / "user.mp4"), frames=45, width=160, height=120, fps=FPS)
+    engine = FixedPoseEngine()
+
+    summary = ReplaySession(str(level), video, str(tmp_path / "log.jsonl"), engine=engine).run()
+
+    frames, logged = read_log(tmp_path / "log.jsonl")
+    assert engine.frames == 45  # инференс на каждом кадре, без stride
+    assert summary["frames"] == logged["frames"] == len(frames) == 45
+    # 15 кадров в no_score_zone без оценки, остальные 30 - PERFECT
+    assert summary["ratings"] == {PERFECT: 30}
+    assert "rating" not in frames[0] and frames[-1]["rating"] == PERFECT
+    assert frames[-1]["score"] == summary["score"] > 0
+    assert frames[1]["time"] == round(1 / FPS, 3)
+    assert frames[0]["landmarks"][0] == [0.5, 0.5, 1.0]
+
+
+def test_replay_reads_mtp_archive_and_renders(tmp_path):
+    # Пути manifest вида "./assets/video.mp4" (как в levels/src.mtp) - через LevelCache
+    level = make_level(tmp_path / "level")
+    manifest = {"version": "2.0", "files": {"video": "./assets/video.mp4", "patterns": "./patterns.json"}}
+    mtp = tmp_path / "level.mtp"
+    with zipfile.ZipFile(mtp, "w") as zf:
+        zf.writestr("manifest.json", json.dumps(manifest))
+        zf.write(level / "patterns.json", "patterns.json")
+        zf.write(level / "video.mp4", "assets/video.mp4")
+    video = make_video(str(tmp_path / "user.mp4"), frames=10, width=160, height=120, fps=FPS)
+
+    summary = ReplaySession(str(mtp), video, render=True, engine=FixedPoseEngine(),
+                            cache_dir=str(tmp_path / "cache")).run()
+    assert summary["ratings"] == {PERFECT: 10}
+    assert summary["stages_ms"]["encode"]["count"] == 10
+
+
+def test_replay_many_reports_failed_recordings(tmp_path):
+    level = make_level(tmp_path / "level")
+    summaries = replay_many(str(level), [(str(tmp_path / "missing.mp4"), None)], workers=1)
+    assert "Cannot open video" in summaries[0]["error"]
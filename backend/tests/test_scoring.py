@@ -0,0 +1,78 @@
+import time
+
+import numpy as np
+
+from backend.core.pattern_index import PatternTimeline
+from backend.core.scoring import StreamingScorer, PERFECT, MISS
+
+FPS = 30.0
+JOINTS = ["left_elbow", "right_elbow"]
+
+
+def make_pattern(seconds=10.0):
+    ts = np.arange(0, seconds, 1 / FPS)
+    angles = np.stack([90 + 60 * np.sin(2 * np.pi * 0.5 * ts), 90 + 60 * np.cos(2 * np.pi * 0.5 * ts)], axis=1)
+    return PatternTimeline(ts.astype(np.float32), angles.astype(np.float32), JOINTS)
+
+
+def test_exact_copy_scores_perfect():
+    pattern = make_pattern()
+    scorer = StreamingScorer(pattern, JOINTS)
+    for i in range(60):
+        result = scorer.update(i / FPS, pattern.angles[i])
+    assert result["rating"] == PERFECT
+    assert scorer.streak == 60
+    assert scorer.score > 0
+
+
+def test_user_half_a_beat_behind_still_scores():
+    pattern = make_pattern()
+    scorer = StreamingScorer(pattern, JOINTS, max_lag=0.75)
+    delay = 12  # 0.4 с
+    ratings = []
+    for i in range(delay, 200):
+        result = scorer.update(i / FPS, pattern.angles[i - delay])
+        ratings.append(result["rating"])
+    assert ratings[-50:].count(MISS) == 0
+    assert result["lag"] > 0.3
+
+
+def test_wrong_pose_misses_and_breaks_streak():
+    pattern = make_pattern()
+    scorer = StreamingScorer(pattern, JOINTS)
+    for i in range(10):
+        scorer.update(i / FPS, pattern.angles[i])
+    result = scorer.update(10 / FPS, np.array([0.0, 180.0]))
+    result = scorer.update(11 / FPS, np.array([0.0, 180.0]))
+    assert result["rating"] == MISS
+    assert scorer.streak == 0
+    assert scorer.best_streak == 10
+
+
+def test_missing_joints_are_ignored():
+    pattern = make_pattern()
+    scorer = StreamingScorer(pattern, JOINTS + ["left_knee"])
+    result = scorer.update(0.0, np.array([pattern.angles[0][0], np.nan, 10.0]))
+    assert set(result["accuracy"]) == {"left_elbow"}
+
+
+def test_no_user_pose_resets_streak():
+    pattern = make_pattern()
+    scorer = StreamingScorer(pattern, JOINTS)
+    scorer.update(0.0, pattern.angles[0])
+    assert scorer.update(1 / FPS, None) is None
+    assert scorer.streak == 0
+
+
+def test_per_frame_cost_does_not_depend_on_level_length():
+    short = StreamingScorer(make_pattern(10), JOINTS)
+    long = StreamingScorer(make_pattern(600), JOINTS)
+
+    def run(scorer):
+        start = time.perf_counter()
+        for i in range(300):
+            scorer.update(i / FPS, scorer.patterns.angles[i])
+        return time.perf_counter() - start
+
+    run(short), run(long)  # прогрев
+    assert run(long) < run(short) * 3
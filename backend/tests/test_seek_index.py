@@ -0,0 +1,74 @@
+import zipfile
+
+import cv2
+import numpy as np
+
+from backend.benchmarks.synthetic import make_video
+from backend.core.capture import DecodedFrameCache, PrefetchReader
+from backend.core.level_cache import stored_member_span
+from backend.core.seek_index import (SeekIndex, build_seek_index, decode_seek_index, encode_seek_index)
+
+
+def test_encode_decode_round_trip():
+    index = SeekIndex([0.0, 0.04, 0.08, 0.12], [0, 2], 25.0)
+    decoded = decode_seek_index(encode_seek_index(index))
+    assert np.array_equal(decoded.timestamps, index.timestamps)
+    assert decoded.keyframes.tolist() == [0, 2]
+    assert decoded.fps == 25.0
+
+
+def test_frame_at_and_keyframe_before():
+    index = SeekIndex.from_fps(10, 25.0)
+    assert index.frame_at(0.0) == 0
+    assert index.frame_at(0.0799) == 2  # время команды округлено до мс
+    assert index.frame_at(0.079) == 1
+    assert index.frame_at(-1.0) == 0 and index.frame_at(100.0) == 9
+    assert index.keyframe_before(5) is None
+    assert SeekIndex(index.timestamps, [0, 4, 8], 25.0).keyframe_before(7) == 4
+
+
+def test_mp4_tables_match_decoder_timestamps(tmp_path):
+    path = make_video(str(tmp_path / "v.mp4"), frames=30, width=160, height=120)
+    index = build_seek_index(path)
+    assert len(index) == 30 and len(index.keyframes) >= 1 and index.keyframes[0] == 0
+
+    cap = cv2.VideoCapture(path)
+    decoded = []
+    while cap.read()[0]:
+        decoded.append(cap.get(cv2.CAP_PROP_POS_MSEC) / 1000.0)
+    cap.release()
+    assert np.allclose(index.timestamps, decoded, atol=1e-6)
+
+
+def test_index_of_stored_archive_member(tmp_path):
+    path = make_video(str(tmp_path / "v.mp4"), frames=12, width=160, height=120)
+    mtp = tmp_path / "level.mtp"
+    with zipfile.ZipFile(mtp, "w") as zf:
+        zf.writestr("manifest.json", "{}")
+        zf.write(path, "video.mp4", compress_type=zipfile.ZIP_STORED)
+        info = zf.getinfo("video.mp4")
+    offset, size = stored_member_span(str(mtp), info)
+    assert np.array_equal(build_seek_index(str(mtp), offset, size).timestamps, build_seek_index(path).timestamps)
+
+
+def test_seek_time_lands_on_exact_frame(tmp_path):
+    path = make_video(str(tmp_path / "v.mp4"), frames=40, width=160, height=120)
+    index = build_seek_index(path)
+    reader = PrefetchReader(cv2.VideoCapture(path), seek_index=index, frame_cache=DecodedFrameCache())
+
+    cap = cv2.VideoCapture(path)
+    frames = []
+    while True:
+        ret, frame = cap.read()
+        if not ret:
+            break
+        frames.append(frame)
+    cap.release()
+
+    for target in (31, 5, 17, 18, 0):
+        item = reader.seek_time(index.time_of(target))
+        assert item.pos_msec == index.time_of(target) * 1000.0
+        assert np.array_equal(item.frame, frames[target])
+    # Чтение продолжается со следующего кадра
+    assert np.array_equal(reader.read_frame(timeout=2.0).frame, frames[1])
+    reader.release()
@@ -0,0 +1,52 @@
+import numpy as np
+
+from backend.core.shm_transport import SharedFrameRing
+
+
+def test_frame_round_trip_through_shared_ring(tmp_path):
+    ring = SharedFrameRing(str(tmp_path / "ring.bin"), slot_count=4, max_width=64, max_height=48)
+    frame = np.random.randint(0, 255, (48, 64, 3), dtype=np.uint8)
+    desc = ring.write(frame)
+
+    reader = SharedFrameRing.open(ring.path)
+    assert reader.slot_count == 4
+    assert np.array_equal(reader.read(desc), frame)
+    reader.close()
+    ring.close()
+
+
+def test_overwritten_slot_is_rejected(tmp_path):
+    ring = SharedFrameRing(str(tmp_path / "ring.bin"), slot_count=2, max_width=8, max_height=8)
+    first = ring.write(np.zeros((8, 8, 3), dtype=np.uint8))
+    ring.write(np.ones((8, 8, 3), dtype=np.uint8))
+    ring.write(np.full((8, 8, 3), 2, dtype=np.uint8))
+    assert ring.read(first) is None
+    ring.close()
+
+
+def test_oversized_frame_is_not_written(tmp_path):
+    ring = SharedFrameRing(str(tmp_path / "ring.bin"), slot_count=2, max_width=8, max_height=8)
+    assert ring.write(np.zeros((16, 16, 3), dtype=np.uint8)) is None
+    ring.close()
+
+
+def _engine(shm_transport, ref_size=None):
+    from types import MethodType, SimpleNamespace
+
+    from backend.core.game_engine import GameEngine
+
+    cap_ref = SimpleNamespace(frame_size=ref_size) if ref_size else None
+    engine = SimpleNamespace(shm_transport=shm_transport, shm_ring=None, camera_size=(640, 480), cap_ref=cap_ref)
+    engine._shm_frame_size = MethodType(GameEngine._shm_frame_size, engine)
+    return engine, MethodType(GameEngine._set_transport, engine)
+
+
+def test_shm_handshake_is_off_by_default_and_sized_from_real_frames():
+    engine, set_transport = _engine(shm_transport=False)
+    assert set_transport("shm")["status"] == "error" and engine.shm_ring is None
+
+    # Захват 640x480 у уровня 1280x720 растягивается до 960x720 - слот под кадр уровня
+    engine, set_transport = _engine(shm_transport=True, ref_size=(1280, 720))
+    reply = set_transport("shm")
+    assert reply["shm"]["slots"] == 3 and reply["shm"]["slot_size"] == 1280 * 720 * 3
+    assert set_transport("jpeg")["mode"] == "jpeg" and engine.shm_ring is None
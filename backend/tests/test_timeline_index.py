@@ -0,0 +1,57 @@
+import json
+import random
+
+from backend.core.timeline_index import TimelineIndex
+
+
+def brute_force(events, t):
+    return [e for e in events if e.get("time", 0) <= t < e.get("time", 0) + e.get("duration", 0)]
+
+
+def make_events(n, seed=1):
+    rnd = random.Random(seed)
+    events = [
+        {"type": "image", "time": round(rnd.uniform(0, 60), 2), "duration": round(rnd.uniform(0, 5), 2), "id": i}
+        for i in range(n)
+    ]
+    events.sort(key=lambda e: e["time"])
+    return events
+
+
+def test_monotonic_playback_matches_window_rule():
+    events = make_events(200)
+    index = TimelineIndex(events)
+    t = 0.0
+    while t < 70:
+        assert index.active(t) == brute_force(events, t)
+        t += 1 / 30
+
+
+def test_seek_in_random_order_matches_window_rule():
+    events = make_events(200, seed=2)
+    index = TimelineIndex(events)
+    rnd = random.Random(3)
+    for _ in range(500):
+        t = rnd.uniform(-5, 70)
+        assert index.active(t) == brute_force(events, t)
+
+
+def test_boundaries_are_half_open():
+    index = TimelineIndex([{"time": 1.0, "duration": 2.0}])
+    assert index.active(0.99) == []
+    assert len(index.active(1.0)) == 1
+    assert len(index.active(2.99)) == 1
+    assert index.active(3.0) == []
+
+
+def test_active_json_fragment_is_reused():
+    events = [{"time": 0.0, "duration": 10.0, "asset": "a.png"}]
+    index = TimelineIndex(events)
+    first = index.active_json(1.0)
+    assert json.loads(first) == events
+    assert index.active_json(2.0) is first
+    assert index.active_json(11.0) == "[]"
+
+
+def test_empty_timeline():
+    assert TimelineIndex().active_json(0.0) == "[]"
@@ -0,0 +1,55 @@
+# tools/rederive.py
+"""
+Пересчет паттерна уровней из сохраненных landmarks (см. core/landmark_store.py).
+
+    python -m backend.tools.rederive level1.mtp level2.mtp
+    python -m backend.tools.rederive level.mtp --angles angles.json --out level_new.mtp
+    python -m backend.tools.rederive levels/*.mtp --max-error 1.0
+
+angles.json - своя таблица углов {"имя": [a, b, c], ...} с индексами точек
+MediaPipe (b - вершина угла; 33, 34, 35 - середины плеч, бедер, коленей);
+по умолчанию geometry.JOINT_ANGLES. --max-error сжимает паттерн до ключевых
+строк (core/pattern_keyframes.py). Видео не декодируется, инференса нет.
+"""
+import argparse
+import json
+import sys
+import time
+
+from backend.core.geometry import AngleTable, DEFAULT_ANGLE_TABLE
+from backend.core.mtp_writer import rederive_mtp
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Recompute level patterns from stored landmarks, without the video")
+    parser.add_argument("levels", nargs="+", help=".mtp archives with landmarks.bin")
+    parser.add_argument("--angles", help="JSON angle table {name: [a, b, c]} (default: geometry.JOINT_ANGLES)")
+    parser.add_argument("--out", help="output archive (one level only; default: replace in place)")
+    parser.add_argument("--max-error", type=float, default=None,
+                        help="compress patterns to keyframes within this many degrees (default: every frame)")
+    args = parser.parse_args(argv)
+    if args.out and len(args.levels) > 1:
+        parser.error("--out needs exactly one level")
+
+    table = DEFAULT_ANGLE_TABLE
+    if args.angles:
+        with open(args.angles, 'r') as f:
+            table = AngleTable(json.load(f))
+
+    failed = 0
+    for level in args.levels:
+        started = time.perf_counter()
+        try:
+            report = rederive_mtp(level, args.out, table, args.max_error)
+        except (OSError, ValueError) as e:
+            failed += 1
+            print(f"{level}: ERROR {e}")
+            continue
+        rows = f"{report['keyframes']} keyframes ({report['ratio']}x)" if args.max_error is not None \
+            else f"{report['frames']} frames"
+        print(f"{level}: {rows}, {len(table)} angles in {time.perf_counter() - started:.2f} s")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,48 @@
+# tools/replay.py
+"""
+Offline replay записей пользователя против уровня (см. core/replay.py).
+
+    python -m backend.tools.replay level.mtp session1.mp4 session2.mp4 --out logs/ --workers 4
+
+На каждую запись пишется logs/<имя записи>.jsonl, сводка печатается в консоль.
+"""
+import argparse
+import json
+import os
+import sys
+
+from backend.core.replay import replay_many
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Score recorded user videos against a level, faster than real time")
+    parser.add_argument("level", help=".mtp archive or unpacked level directory")
+    parser.add_argument("videos", nargs="+", help="recorded user videos")
+    parser.add_argument("--out", default=".", help="directory for per-recording JSONL logs")
+    parser.add_argument("--workers", type=int, default=None, help="parallel recordings (default: CPU count)")
+    parser.add_argument("--render", action="store_true", help="also draw skeletons and encode JPEG like the game")
+    parser.add_argument("--mirror", action="store_true", help="mirror frames (raw webcam recordings)")
+    parser.add_argument("--offset", type=float, default=0.0, help="level time (s) at the start of the recordings")
+    parser.add_argument("--model-complexity", type=int, default=1, choices=(0, 1, 2))
+    args = parser.parse_args(argv)
+
+    os.makedirs(args.out, exist_ok=True)
+    recordings = [(video, os.path.join(args.out, os.path.splitext(os.path.basename(video))[0] + ".jsonl"))
+                  for video in args.videos]
+    summaries = replay_many(args.level, recordings, workers=args.workers, render=args.render,
+                            mirror=args.mirror, offset=args.offset, model_complexity=args.model_complexity)
+
+    failed = 0
+    for summary in summaries:
+        if "error" in summary:
+            failed += 1
+            print(f"{summary['user_video']}: ERROR {summary['error']}")
+            continue
+        print(f"{summary['user_video']}: score {summary['score']}, best streak {summary['best_streak']}, "
+              f"{summary['frames']} frames at {summary['fps']} fps ({summary['realtime_factor']}x real time)")
+        print("  " + json.dumps(summary["ratings"]))
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,3 +1,4 @@
+import argparse
 import subprocess
 import sys
 import os
@@ -21,6 +22,13 @@ def run_command(command, cwd=None):
 
 
 def main():
+    parser = argparse.ArgumentParser(description="Motion Trainer test runner")
+    parser.add_argument("--bench", action="store_true",
+                        help="also run backend benchmarks and fail on regressions against the baseline")
+    parser.add_argument("--bench-threshold", type=float, default=0.2,
+                        help="allowed slowdown for --bench (0.2 = 20%%)")
+    args = parser.parse_args()
+
     print("=" * 40)
     print("🛡️  MOTION TRAINER: GLOBAL TEST RUNNER")
     print("=" * 40)
@@ -33,6 +41,12 @@ def main():
     if not run_command("python -m pytest", cwd="backend"):
         all_passed = False
 
+    # 1b. Бенчмарки горячих путей (сравнение с базой этой машины, см. backend/benchmarks/bench.py)
+    if args.bench:
+        print("--- ⏱️  BACKEND BENCHMARKS ---")
+        if not run_command(f"python -m backend.benchmarks.bench --check --threshold {args.bench_threshold}"):
+            all_passed = False
+
     # 2. C# Frontend Tests
     # Используем dotnet test, как указано в docs/frontend/testing.md
     print("--- 🔷 FRONTEND TESTS ---")